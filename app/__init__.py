@@ -1,18 +1,13 @@
 # app/__init__.py
 
-# Import all loaders so they're available when the package is imported
-from . import (
-    loader_bairro,
-    loader_condominio,
-    loader_distrito,
-    loader_imovel,
-    loader_logradouro,
-    loader_loteamento,
-    loader_secao,
-    loader_plantaValor
-)
+# Loaders are imported on demand (see app.registry) so that importing the
+# package stays cheap for the CLI, dry runs and worker subprocesses.
+__all__ = ['processar_cadastros']
 
-# Import and expose the main loader function
-from .loader import processar_cadastros
 
-__all__ = ['processar_cadastros']
+def __getattr__(name):
+    # Expose the main loader function without importing every loader up front
+    if name == 'processar_cadastros':
+        from .loader import processar_cadastros
+        return processar_cadastros
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,299 @@
+# app/async_loader.py
+"""
+Asynchronous load pipeline on psycopg's AsyncConnection.
+
+The synchronous loaders read, transform, execute and wait for one chunk at a
+time. Here the stages overlap:
+
+- files are read (and their encoding fixed) in a worker thread, the next file
+  while the current one is loading;
+- the producer transforms records and routes every row to a lane by the hash of
+  its primary key;
+- each lane owns one AsyncConnection and writes its chunks in order, so several
+  chunks are in flight at once while all versions of the same id are still
+  applied in input order.
+
+Files are loaded one entity at a time, in the FK dependency order of
+app.registry. Counting matches each loader's load_from_iterable: records the
+transform or the constraint precheck (app.validation) rejects are skipped; a
+failed chunk of a batched loader counts nothing; per-row loaders (imóvel,
+pessoa) retry a failed chunk row by row and count the failing rows as skipped.
+Repeated ids within a chunk are collapsed as in app.pipeline, and the imóvel
+self references are applied in a second pass as in app.loader_imovel.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import registry
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize, make_sizer
+from .maintenance import write_stats
+from .pipeline import collapse_rows
+from .registry import LoaderSpec
+from .utils import fix_encoding_in_dict
+from .validation import split_valid
+
+Row = Dict[str, Any]
+
+# Registros transformados entre duas devoluções do controle ao event loop
+_YIELD_EVERY = 200
+
+
+def _read_records(json_path: str | Path) -> List[Dict[str, Any]]:
+    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
+    data = fix_encoding_in_dict(data)
+    if not isinstance(data, dict) or "content" not in data:
+        raise ValueError("Invalid JSON format: expected object with 'content' array")
+    return data["content"]
+
+
+def _compiled_upsert(model, columns: Tuple[str, ...], schema: Optional[str]) -> str:
+    """SQL text (psycopg paramstyle) of the cached upsert statement of app.upsert."""
+    from sqlalchemy.dialects.postgresql import psycopg
+
+    from .database import get_settings
+    from .models import DEFAULT_SCHEMA
+    from .upsert import upsert_statement
+
+    kw: Dict[str, Any] = {}
+    if schema and schema != DEFAULT_SCHEMA:
+        kw = {"schema_translate_map": {DEFAULT_SCHEMA: schema}, "render_schema_translate": True}
+    stmt = upsert_statement(model, columns, keep_newest=get_settings().keep_newest)
+    return str(stmt.compile(dialect=psycopg.dialect(), column_keys=list(columns), **kw))
+
+
+class _Writer:
+    """Writes one entity's chunks on an AsyncConnection."""
+
+    def __init__(self, spec: LoaderSpec, schema: Optional[str]) -> None:
+        self.spec = spec
+        self.model = spec.model_class()
+        self.schema = schema
+        self._sql: Dict[Tuple[str, ...], str] = {}
+        # FKs que o loader anula quando o pai não existe (ex.: imóvel)
+        self.safe_foreign_keys = getattr(spec.load(), "SAFE_FOREIGN_KEYS", {})
+        # Autorreferências gravadas depois de todas as linhas (ex.: imóvel principal)
+        self.defers_self_references = hasattr(spec.load(), "SELF_REFERENCES")
+        self.deferred: Dict[Any, Tuple[Any, ...]] = {}
+
+    def sql(self, columns: Tuple[str, ...]) -> str:
+        if columns not in self._sql:
+            self._sql[columns] = _compiled_upsert(self.model, columns, self.schema)
+        return self._sql[columns]
+
+    async def _null_missing_parents(self, conn, rows: List[Row]) -> None:
+        for column, parent in self.safe_foreign_keys.items():
+            ids = list({row[column] for row in rows if row.get(column)})
+            if not ids:
+                continue
+            table = parent.__table__
+            name = f'"{self.schema or table.schema}"."{table.name}"'
+            cur = await conn.execute(f"SELECT id FROM {name} WHERE id = ANY(%s)", (ids,))
+            existing = {r[0] for r in await cur.fetchall()}
+            for row in rows:
+                if row.get(column) and row[column] not in existing:
+                    row[column] = None
+
+    async def _execute(self, conn, rows: List[Row]) -> int:
+        """Upsert `rows`; returns how many were written (psycopg sums executemany rowcounts)."""
+        from .upsert import group_rows
+
+        groups = group_rows(self.model, rows)
+        written = 0
+        async with conn.cursor() as cur:
+            for columns, group in groups.items():
+                await cur.executemany(self.sql(columns), group)
+                written += max(cur.rowcount, 0)
+        return written
+
+    async def write(self, conn, rows: List[Row]) -> Tuple[int, int]:
+        """Write one chunk; returns (ok, failed rows counted as skipped)."""
+        if self.defers_self_references:
+            self.spec.load().defer_self_references(rows, self.deferred)
+        try:
+            async with conn.transaction():
+                await self._null_missing_parents(conn, rows)
+                written = await self._execute(conn, rows)
+            return written, 0
+        except Exception as e:
+            print(f"Error writing {self.model.__tablename__} chunk: {str(e)}")
+            if not self.spec.per_row:
+                return 0, 0
+
+        # Loaders por registro: uma transação por linha, como no modo síncrono
+        ok = failed = 0
+        for row in rows:
+            try:
+                async with conn.transaction():
+                    await self._null_missing_parents(conn, [row])
+                    ok += await self._execute(conn, [row])
+            except Exception as e:
+                print(f"Error processing {self.model.__tablename__} record {row.get('id', 'unknown')}: {str(e)}")
+                failed += 1
+        return ok, failed
+
+    async def apply_self_references(self, conn) -> None:
+        """Second pass: the deferred self references, with the set-based steps of app.loader_imovel."""
+        if not self.deferred:
+            return
+        module = self.spec.load()
+        params = module.self_reference_params(self.deferred)
+
+        def _sql(statement: str) -> str:
+            return module.self_reference_sql(statement, self.schema)
+
+        try:
+            async with conn.transaction():
+                async with conn.cursor() as cur:
+                    for statement in module.SELF_REFERENCE_BEFORE:
+                        await cur.execute(_sql(statement), params if "%(" in statement else None)
+                    await cur.execute(_sql(module.SELF_REFERENCE_UPDATE), params)
+                    updated = cur.rowcount
+                    for statement in module.SELF_REFERENCE_AFTER:
+                        await cur.execute(_sql(statement), params if "%(" in statement else None)
+                    await cur.execute(_sql(module.SELF_REFERENCE_PENDING))
+                    (pending,) = await cur.fetchone()
+            write_stats.record(self.model.__table__.name, updated, schema=self.schema)
+            module.report_self_references(updated, pending)
+        except Exception as e:
+            print(f"Error applying {self.model.__tablename__} self references: {str(e)}")
+
+
+async def _connect(connections: int, schema: Optional[str]):
+    import psycopg
+
+    from .database import current_schema, get_settings
+
+    settings = get_settings()
+    schema = schema or current_schema()
+    conns = []
+    for _ in range(connections):
+        conn = await psycopg.AsyncConnection.connect(
+            settings.conn_str(), prepare_threshold=settings.prepare_threshold
+        )
+        if schema:
+            await conn.execute(f'SET search_path TO "{schema}", public')
+            await conn.commit()
+        conns.append(conn)
+    return conns
+
+
+async def load_async(
+    spec: LoaderSpec,
+    records: Iterable[Dict[str, Any]],
+    conns: Sequence[Any],
+    chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE,
+    schema: Optional[str] = None,
+) -> Tuple[int, int]:
+    """Load `records` with `spec`'s transform over `conns`. Returns (successes, skipped)."""
+    from .database import current_schema
+
+    writer = _Writer(spec, schema or current_schema())
+    sizer = make_sizer(chunk_size)
+    process = spec.process_record
+    key = [c.name for c in writer.model.__table__.primary_key.columns]
+
+    lanes: List[asyncio.Queue] = [asyncio.Queue(maxsize=2) for _ in conns]
+    totals = {"ok": 0, "skipped": 0, "collapsed": 0}
+
+    async def _lane(queue: asyncio.Queue, conn) -> None:
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                return
+            start = time.perf_counter()
+            ok, failed = await writer.write(conn, rows)
+            sizer.observe(rows, time.perf_counter() - start, failed=len(rows) - ok)
+            totals["ok"] += ok
+            totals["skipped"] += failed
+
+    async def _put(lane: int, rows: List[Row]) -> None:
+        # Um id cai sempre na mesma fila, então as repetições estão no mesmo lote
+        valid, rejected = split_valid(writer.model, rows)
+        for i, reason in rejected.items():
+            print(f"Rejected {writer.model.__tablename__} record {rows[i].get('id', 'unknown')}: {reason}")
+        totals["skipped"] += len(rejected)
+        rows, collapsed = collapse_rows(writer.model, valid)
+        totals["collapsed"] += collapsed
+        totals["skipped"] += collapsed
+        if rows:
+            await lanes[lane].put(rows)
+
+    tasks = [asyncio.create_task(_lane(q, c)) for q, c in zip(lanes, conns)]
+    buffers: List[List[Row]] = [[] for _ in conns]
+    try:
+        for i, rec in enumerate(records, 1):
+            try:
+                row = process(rec)
+            except Exception as e:
+                print(f"Error processing record: {str(e)}")
+                row = None
+            if not row:
+                totals["skipped"] += 1
+            else:
+                lane = hash(tuple(row.get(k) for k in key)) % len(lanes)
+                buffers[lane].append(row)
+                if len(buffers[lane]) >= sizer.size:
+                    await _put(lane, buffers[lane])
+                    buffers[lane] = []
+            if i % _YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+        for lane, rows in enumerate(buffers):
+            if rows:
+                await _put(lane, rows)
+        for queue in lanes:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    await writer.apply_self_references(conns[0])
+    write_stats.record(writer.model.__table__.name, totals["ok"], schema=writer.schema)
+
+    if totals["collapsed"]:
+        print(f"Collapsed {totals['collapsed']} duplicate {writer.model.__tablename__} records (same id in a chunk)")
+    return totals["ok"], totals["skipped"]
+
+
+async def load_files_async(
+    paths: Sequence[str | Path],
+    connections: int = 4,
+    chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE,
+    schema: Optional[str] = None,
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Load JSON exports asynchronously, parents before children (by export name).
+
+    Returns {path: (successes, skipped)}.
+    """
+    paths = registry.sort_exports(paths)
+    loop = asyncio.get_running_loop()
+    pending = loop.run_in_executor(None, _read_records, paths[0]) if paths else None
+
+    results: Dict[str, Tuple[int, int]] = {}
+    conns = await _connect(connections, schema)
+    try:
+        for i, path in enumerate(paths):
+            records = await pending
+            # Lê o próximo arquivo enquanto este carrega
+            if i + 1 < len(paths):
+                pending = loop.run_in_executor(None, _read_records, paths[i + 1])
+            spec = registry.detect(records[0]) if records else None
+            if spec is None:
+                if records:
+                    raise ValueError(f"Could not determine appropriate loader for {path}")
+                results[str(path)] = (0, 0)
+                continue
+            ok, skipped = await load_async(spec, records, conns, chunk_size=chunk_size, schema=schema)
+            print(f"Processed {ok} records successfully, skipped {skipped} records")
+            results[str(path)] = (ok, skipped)
+    finally:
+        for conn in conns:
+            await conn.close()
+    return results
@@ -0,0 +1,73 @@
+# app/chunking.py
+"""
+Chunk sizing for the loaders.
+
+A loader takes `chunk_size` as a number of records, as "auto", or as a
+ChunkSizer. In auto mode the size is recomputed after every chunk from the
+observed write latency, targeting `target_seconds` per commit. It is capped by
+the payload size (a big imóvel row weighs much more than a secao row) and
+halved when too many rows of a chunk fail.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Union
+
+DEFAULT_CHUNK_SIZE = 500
+AUTO = "auto"
+
+
+@dataclass
+class ChunkSizer:
+    size: int = DEFAULT_CHUNK_SIZE
+    adaptive: bool = False
+    target_seconds: float = 1.0  # duração desejada de cada commit
+    min_size: int = 50
+    max_size: int = 20000
+    max_bytes: int = 16 * 1024 * 1024  # teto aproximado de payload por lote
+    max_error_rate: float = 0.1
+    history: List[int] = field(default_factory=list)
+
+    def observe(self, rows: List[Dict[str, Any]], seconds: float, failed: int = 0) -> int:
+        """Record one written chunk and return the size for the next one."""
+        n = len(rows)
+        if not self.adaptive or n == 0:
+            return self.size
+
+        ideal = n / max(seconds, 1e-3) * self.target_seconds
+
+        # Estimativa barata do tamanho de uma linha, pela primeira do lote
+        row_bytes = sum(len(str(v)) for v in rows[0].values()) or 1
+        ideal = min(ideal, self.max_bytes / row_bytes)
+
+        if failed / n > self.max_error_rate:
+            ideal = min(ideal, self.size / 2)
+
+        # No máximo dobra ou reduz à metade a cada lote
+        ideal = max(self.size / 2, min(self.size * 2, ideal))
+        self.size = int(max(self.min_size, min(self.max_size, ideal)))
+        self.history.append(self.size)
+        return self.size
+
+
+ChunkSize = Union[int, str, ChunkSizer]
+
+
+def parse_chunk_size(value: str) -> Union[int, str]:
+    """argparse type: a positive integer or 'auto'."""
+    if value == AUTO:
+        return AUTO
+    size = int(value)
+    if size <= 0:
+        raise ValueError("chunk size must be positive")
+    return size
+
+
+def make_sizer(chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE, target_seconds: float = 1.0) -> ChunkSizer:
+    """ChunkSizer for a loader's `chunk_size` argument (an existing sizer is reused as is)."""
+    if isinstance(chunk_size, ChunkSizer):
+        return chunk_size
+    if chunk_size == AUTO:
+        return ChunkSizer(adaptive=True, target_seconds=target_seconds)
+    return ChunkSizer(size=int(chunk_size))
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+daemon.py — Carga contínua de arquivos que chegam numa pasta de entrada
+
+Um único processo fica de pé: o interpretador, o SQLAlchemy, a engine, a
+conexão fixa e os caches de FK (ex.: ids de bairro/logradouro já confirmados
+pelo loader de imóveis) continuam quentes de um arquivo para o outro. Cada
+.json que chega à pasta é roteado por app.registry.detect, pelo primeiro
+registro, e, ao final, movido para done/ ou failed/.
+
+Um arquivo só é carregado depois de ficar --settle segundos sem mudar de
+tamanho; quem gera os arquivos pode também gravá-los com outro nome e
+renomeá-los para .json ao terminar.
+
+Depois de cada arquivo, as tabelas gravadas recebem ANALYZE (ou VACUUM
+(ANALYZE)) por app.maintenance, como ao final de uma carga do app.main.
+
+Status dos jobs em http://127.0.0.1:<porta>/status (e /jobs/<id>).
+
+Uso:
+    python3 -m app.daemon --inbox /dados/inbox --port 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shutil
+import signal
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.maintenance import DEFAULT_VACUUM_THRESHOLD
+
+LOG = logging.getLogger("app.daemon")
+
+# Jobs mantidos em memória para o endpoint de status
+MAX_JOBS = 500
+
+
+@dataclass
+class Job:
+    id: int
+    file: str
+    status: str = "queued"  # queued | running | done | failed
+    loader: Optional[str] = None
+    ok: Optional[int] = None
+    skipped: Optional[int] = None
+    error: Optional[str] = None
+    queued_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    seconds: Optional[float] = None
+
+
+class JobRegistry:
+    """Jobs recentes, compartilhados entre o laço de carga e o servidor HTTP."""
+
+    def __init__(self, max_jobs: int = MAX_JOBS) -> None:
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Job] = {}
+        self._next_id = 1
+        self.max_jobs = max_jobs
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+
+    def add(self, file: Path) -> Job:
+        with self._lock:
+            job = Job(id=self._next_id, file=file.name)
+            self._next_id += 1
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                del self._jobs[next(iter(self._jobs))]
+            return job
+
+    def update(self, job: Job, **changes: Any) -> None:
+        with self._lock:
+            for key, value in changes.items():
+                setattr(job, key, value)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return asdict(job) if job else None
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = [asdict(j) for j in self._jobs.values()]
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"started_at": self.started_at, "counts": counts, "jobs": jobs[::-1]}
+
+
+def _handler(jobs: JobRegistry):
+    class StatusHandler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Any) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            path = self.path.rstrip("/")
+            if path in ("", "/status"):
+                self._send(200, jobs.summary())
+            elif path.startswith("/jobs/") and path[6:].isdigit():
+                job = jobs.get(int(path[6:]))
+                self._send(200 if job else 404, job or {"error": "job não encontrado"})
+            else:
+                self._send(404, {"error": "use /status ou /jobs/<id>"})
+
+        def log_message(self, fmt: str, *args: Any) -> None:
+            LOG.debug("http: " + fmt, *args)
+
+    return StatusHandler
+
+
+def start_status_server(jobs: JobRegistry, host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _handler(jobs))
+    threading.Thread(target=server.serve_forever, name="status-http", daemon=True).start()
+    LOG.info("Status em http://%s:%d/status", host, server.server_address[1])
+    return server
+
+
+class Inbox:
+    """Pasta de entrada com subpastas done/ e failed/."""
+
+    def __init__(self, path: Path, done: Optional[Path] = None, failed: Optional[Path] = None, settle: float = 2.0):
+        self.path = path
+        self.done = done or path / "done"
+        self.failed = failed or path / "failed"
+        self.settle = settle
+        self._sizes: Dict[Path, Tuple[int, float]] = {}
+        for d in (self.path, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+
+    def ready(self) -> List[Path]:
+        """Arquivos .json estáveis há pelo menos `settle` segundos, mais antigos primeiro."""
+        now = time.monotonic()
+        ready: List[Path] = []
+        seen = set()
+        stats = []
+        for file in self.path.glob("*.json"):
+            try:
+                stats.append((file.stat(), file))
+            except FileNotFoundError:
+                continue  # movido ou apagado durante a varredura
+        for stat, file in sorted(stats, key=lambda item: item[0].st_mtime):
+            seen.add(file)
+            size = stat.st_size
+            last = self._sizes.get(file)
+            if last is None or last[0] != size:
+                self._sizes[file] = (size, now)
+            elif now - last[1] >= self.settle:
+                ready.append(file)
+        for gone in set(self._sizes) - seen:
+            del self._sizes[gone]
+        return ready
+
+    def move(self, file: Path, ok: bool) -> Path:
+        target_dir = self.done if ok else self.failed
+        target = target_dir / file.name
+        if target.exists():
+            target = target_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.name}"
+        shutil.move(str(file), str(target))
+        self._sizes.pop(file, None)
+        return target
+
+
+def load_file(file: Path) -> Tuple[str, Optional[Tuple[int, int]]]:
+    """
+    Carrega um arquivo pelo loader que app.registry.detect escolhe a partir do
+    primeiro registro; os mesmos registros seguem para o loader, sem reler o arquivo.
+    """
+    from app import registry
+    from app.database import peek, read_export
+
+    first, records = peek(read_export(file, fix_encoding=True))
+    if first is None:
+        raise ValueError("No content found in JSON file")
+    spec = registry.detect(first)
+    if spec is None:
+        raise ValueError("Could not determine appropriate loader for the given JSON structure")
+    ok, skipped = spec.load_from_iterable(records)
+    print(f"Processed {ok} records successfully, skipped {skipped} records")
+    return spec.module, (ok, skipped)
+
+
+def run_daemon(
+    inbox: Inbox,
+    jobs: JobRegistry,
+    poll: float = 2.0,
+    stop: Optional[threading.Event] = None,
+    maintenance: bool = True,
+    vacuum_threshold: float = DEFAULT_VACUUM_THRESHOLD,
+) -> None:
+    """Laço principal: carrega os arquivos prontos até `stop` ser sinalizado."""
+    from app.database import release_pinned_connections
+    from app.maintenance import maintain_tables, write_stats
+
+    stop = stop or threading.Event()
+    LOG.info("Aguardando arquivos em %s", inbox.path)
+    try:
+        while not stop.is_set():
+            for file in inbox.ready():
+                if stop.is_set():
+                    break
+                job = jobs.add(file)
+                start = time.time()
+                jobs.update(job, status="running", started_at=datetime.now().isoformat(timespec="seconds"))
+                LOG.info("Job %d: carregando %s", job.id, file.name)
+                try:
+                    loader, result = load_file(file)
+                    ok, skipped = result or (None, None)
+                    jobs.update(job, status="done", loader=loader, ok=ok, skipped=skipped)
+                    inbox.move(file, ok=True)
+                    LOG.info("Job %d: %s concluído (ok=%s, skipped=%s).", job.id, file.name, ok, skipped)
+                except Exception as exc:
+                    jobs.update(job, status="failed", error=str(exc))
+                    inbox.move(file, ok=False)
+                    LOG.exception("Job %d: %s falhou: %s", job.id, file.name, exc)
+                finally:
+                    jobs.update(
+                        job,
+                        finished_at=datetime.now().isoformat(timespec="seconds"),
+                        seconds=round(time.time() - start, 3),
+                    )
+                # Também após uma falha: os lotes já gravados ficam no banco
+                written = write_stats.drain()
+                if maintenance:
+                    maintain_tables(written, vacuum_threshold, logger=LOG)
+            stop.wait(poll)
+    finally:
+        release_pinned_connections()
+        LOG.info("Daemon encerrado.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.daemon", description="Carga contínua de uma pasta de entrada.")
+    p.add_argument("--inbox", required=True, help="Pasta observada")
+    p.add_argument("--done", default=None, help="Destino dos arquivos carregados (default: <inbox>/done)")
+    p.add_argument("--failed", default=None, help="Destino dos arquivos com erro (default: <inbox>/failed)")
+    p.add_argument("--schema", default=None, help="Schema de destino (default: PGSCHEMA)")
+    p.add_argument("--poll", type=float, default=2.0, help="Intervalo entre varreduras, em segundos")
+    p.add_argument("--settle", type=float, default=2.0, help="Segundos sem mudança até o arquivo ser carregado")
+    p.add_argument(
+        "--vacuum-threshold",
+        type=float,
+        default=DEFAULT_VACUUM_THRESHOLD,
+        help="Após cada arquivo, as tabelas gravadas recebem ANALYZE; as que têm tuplas mortas "
+        "acima dessa fração das vivas recebem VACUUM (ANALYZE) (default: %(default)s)",
+    )
+    p.add_argument("--no-maintenance", action="store_true", help="Não roda ANALYZE/VACUUM após cada arquivo")
+    p.add_argument("--host", default="127.0.0.1", help="Endereço do endpoint de status")
+    p.add_argument("--port", type=int, default=8765, help="Porta do endpoint de status (0 desliga)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    from app.database import use_schema
+
+    inbox = Inbox(
+        Path(args.inbox),
+        Path(args.done) if args.done else None,
+        Path(args.failed) if args.failed else None,
+        settle=args.settle,
+    )
+    jobs = JobRegistry()
+    server = start_status_server(jobs, args.host, args.port) if args.port else None
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    try:
+        with use_schema(args.schema):
+            run_daemon(
+                inbox, jobs, poll=args.poll, stop=stop,
+                maintenance=not args.no_maintenance, vacuum_threshold=args.vacuum_threshold,
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,372 @@
 # app/database.py
 from __future__ import annotations
 
+import itertools
+import json
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple
 
-from sqlalchemy import create_engine, text, event
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
-
-# Carrega as variáveis do arquivo .env
-load_dotenv()
+if TYPE_CHECKING:
+    import psycopg
+    from sqlalchemy.engine import Connection, Engine
+    from sqlalchemy.orm import sessionmaker
 
 
 @dataclass(frozen=True)
 class Settings:
-    host: str = os.getenv("PGHOST")
-    port: int = int(os.getenv("PGPORT"))
-    user: str = os.getenv("PGUSER")
-    password: str = os.getenv("PGPASSWORD")
-    dbname: str = os.getenv("PGDATABASE")
-    schema: str = os.getenv("PGSCHEMA")
+    host: str = "localhost"
+    port: int = 5432
+    user: Optional[str] = None
+    password: Optional[str] = None
+    dbname: Optional[str] = None
+    schema: Optional[str] = None
+    # Execuções de uma mesma query antes do psycopg prepará-la no servidor
+    # (None desliga; necessário atrás de pgbouncer em modo transaction)
+    prepare_threshold: Optional[int] = 1
+    # Upserts só substituem a linha gravada por uma de dh_operacao igual ou
+    # mais nova (default: a última linha carregada vence)
+    keep_newest: bool = False
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Lê as configurações do ambiente (carregando o .env, se existir)."""
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        return cls(
+            host=os.getenv("PGHOST") or cls.host,
+            port=int(os.getenv("PGPORT") or cls.port),
+            user=os.getenv("PGUSER"),
+            password=os.getenv("PGPASSWORD"),
+            dbname=os.getenv("PGDATABASE"),
+            schema=os.getenv("PGSCHEMA"),
+            prepare_threshold=_threshold_or_none(os.getenv("PG_PREPARE_THRESHOLD"), cls.prepare_threshold),
+            keep_newest=(os.getenv("UPSERT_KEEP_NEWEST") or "").lower() in ("1", "true", "on", "yes"),
+        )
 
     @property
     def url(self) -> str:
         return f"postgresql+psycopg://{self.user}:{self.password}@{self.host}:{self.port}/{self.dbname}"
 
+    def conn_str(self, dbname: Optional[str] = None) -> str:
+        db = dbname or self.dbname
+        return f"dbname={db} user={self.user} password={self.password} host={self.host} port={self.port}"
+
+
+def _threshold_or_none(value: Optional[str], default: Optional[int]) -> Optional[int]:
+    if value is None or value == "":
+        return default
+    if value.lower() in ("none", "off"):
+        return None
+    return int(value)
 
-SETTINGS = Settings()
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings do processo, lidas do ambiente na primeira chamada."""
+    return Settings.from_env()
 
 
 def make_engine(schema: Optional[str] = None) -> Engine:
-    schema = schema or SETTINGS.schema
+    from sqlalchemy import create_engine, event
+
+    settings = get_settings()
+    schema = schema or settings.schema
 
     engine: Engine = create_engine(
-        SETTINGS.url,
+        settings.url,
         echo=False,
         future=True,
         pool_pre_ping=True,
+        connect_args={"prepare_threshold": settings.prepare_threshold},
     )
 
     # ✅ forma correta de registrar o hook de conexão
     @event.listens_for(engine, "connect")
     def _set_search_path(dbapi_conn, connection_record):  # type: ignore[override]
-        with dbapi_conn.cursor() as cur:
-            cur.execute(f'SET search_path TO "{schema}", public')
+        # Roda uma única vez por conexão física; fora de transação, para que
+        # um rollback posterior não desfaça o SET
+        autocommit = dbapi_conn.autocommit
+        dbapi_conn.autocommit = True
+        try:
+            connection_record.info["search_path"] = _apply_search_path(dbapi_conn, schema)
+        finally:
+            dbapi_conn.autocommit = autocommit
+
+    # Os modelos qualificam as tabelas com DEFAULT_SCHEMA; em outro schema as
+    # mesmas instruções são reescritas para ele
+    from .models import DEFAULT_SCHEMA
+
+    if schema and schema != DEFAULT_SCHEMA:
+        engine = engine.execution_options(schema_translate_map={DEFAULT_SCHEMA: schema})
 
     return engine
 
 
-engine: Engine = make_engine()
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def _apply_search_path(dbapi_conn, schema: Optional[str]) -> str:
+    """Check that `schema` exists, put it first in the search_path and return the result."""
+    with dbapi_conn.cursor() as cur:
+        if schema:
+            cur.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s", (schema,))
+            if cur.fetchone() is None:
+                raise RuntimeError(f'Schema "{schema}" não existe no banco')
+            cur.execute(f'SET search_path TO "{schema}", public')
+        cur.execute("SHOW search_path")
+        return cur.fetchone()[0]
+
+
+# Engines por schema (um schema por município), com descarte LRU
+ENGINE_CACHE_SIZE = 16
+
+_engines: "OrderedDict[Optional[str], Engine]" = OrderedDict()
+_sessionmakers: Dict[Optional[str], "sessionmaker"] = {}
+_engines_lock = threading.RLock()
+_active_schema: ContextVar[Optional[str]] = ContextVar("active_schema", default=None)
+
+
+def current_schema() -> Optional[str]:
+    """Schema of the current context (see use_schema), else PGSCHEMA."""
+    return _active_schema.get() or get_settings().schema
+
+
+def target_schema(schema: Optional[str] = None) -> str:
+    """`schema`, else current_schema(), else the models' DEFAULT_SCHEMA (where they write with PGSCHEMA unset)."""
+    from .models import DEFAULT_SCHEMA
+
+    return schema or current_schema() or DEFAULT_SCHEMA
+
+
+def connect(dbname: Optional[str] = None, autocommit: bool = True) -> "psycopg.Connection":
+    """Plain psycopg connection for the server-side tools (COPY, DDL, reports)."""
+    import psycopg
+
+    return psycopg.connect(get_settings().conn_str(dbname), autocommit=autocommit)
+
+
+def read_export(path: Path, fix_encoding: bool = False) -> Iterator[Dict[str, Any]]:
+    """Records of an export: .ndjson streamed line by line, .json read whole (its `content`)."""
+    if fix_encoding:
+        from .utils import fix_encoding_in_dict
+
+    def records() -> Iterator[Dict[str, Any]]:
+        if path.suffix == ".ndjson":
+            with path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+            return
+        yield from json.loads(path.read_text(encoding="utf-8")).get("content") or []
+
+    for record in records():
+        yield fix_encoding_in_dict(record) if fix_encoding else record
+
+
+def peek(records: Iterator[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    """First record (for registry.detect) and an iterator that still yields it."""
+    first = next(records, None)
+    if first is None:
+        return None, iter(())
+    return first, itertools.chain((first,), records)
+
+
+@contextmanager
+def use_schema(schema: Optional[str]) -> Iterator[Optional[str]]:
+    """Route get_engine()/get_sessionmaker() without arguments to `schema` inside the block."""
+    token = _active_schema.set(schema)
+    try:
+        yield schema
+    finally:
+        _active_schema.reset(token)
+
+
+def get_engine(schema: Optional[str] = None) -> Engine:
+    """
+    Engine (and pool) of `schema`, default current_schema().
+
+    Engines are cached per schema, so loading many municipalities in one process
+    reuses warm pools. At most ENGINE_CACHE_SIZE engines are kept; the least
+    recently used one is disposed when a new schema needs room.
+    """
+    schema = schema or current_schema()
+    with _engines_lock:
+        engine = _engines.get(schema)
+        if engine is not None:
+            _engines.move_to_end(schema)
+            return engine
+
+        engine = make_engine(schema)
+        _engines[schema] = engine
+        while len(_engines) > ENGINE_CACHE_SIZE:
+            old_schema, old_engine = _engines.popitem(last=False)
+            _sessionmakers.pop(old_schema, None)
+            _forget_checked(old_engine)
+            # Conexões em uso continuam válidas; só o pool ocioso é fechado
+            old_engine.dispose()
+        return engine
+
+
+def cached_engines() -> Dict[Optional[str], Engine]:
+    """Snapshot of the engine cache, least recently used first."""
+    with _engines_lock:
+        return dict(_engines)
+
+
+def dispose_engines() -> None:
+    """Dispose every cached engine and empty the cache."""
+    with _engines_lock:
+        for engine in _engines.values():
+            _forget_checked(engine)
+            engine.dispose()
+        _engines.clear()
+        _sessionmakers.clear()
+
+
+def get_sessionmaker(schema: Optional[str] = None) -> sessionmaker:
+    """Fábrica de sessões ligada à engine do schema (padrão: current_schema())."""
+    from sqlalchemy.orm import sessionmaker
+
+    schema = schema or current_schema()
+    with _engines_lock:
+        engine = get_engine(schema)
+        factory = _sessionmakers.get(schema)
+        if factory is None or factory.kw["bind"] is not engine:
+            factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+            _sessionmakers[schema] = factory
+        return factory
+
+
+# Conexões fixas por thread (uma por worker), indexadas pela engine
+_pinned = threading.local()
+
+
+def pinned_connection(engine: Optional[Engine] = None) -> Connection:
+    """
+    Long-lived connection of the current thread for `engine` (default engine).
+
+    The pool checkout (and its pre-ping `SELECT 1`) happens only when the
+    connection is first opened or has to be reopened after an error; every
+    other call reuses the same connection. Callers own transaction boundaries.
+    """
+    engine = engine or get_engine()
+    conns: Dict[int, Tuple[Engine, Connection]] = _pinned.__dict__.setdefault("conns", {})
+    pinned_engine, conn = conns.get(id(engine), (None, None))
+    if conn is not None and (pinned_engine is not engine or conn.closed or conn.invalidated):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        conn = None
+    if conn is None:
+        conn = engine.connect()
+        conns[id(engine)] = (engine, conn)
+    return conn
+
+
+def release_pinned_connections() -> None:
+    """Return the current thread's pinned connections to their pools."""
+    conns: Dict[int, Tuple[Engine, Connection]] = _pinned.__dict__.get("conns", {})
+    for _, conn in conns.values():
+        try:
+            conn.close()
+        except Exception:
+            pass
+    conns.clear()
+
+
+def __getattr__(name: str):
+    # SETTINGS, engine e SessionLocal continuam disponíveis, mas só são
+    # construídos quando alguém os usa pela primeira vez.
+    if name == "SETTINGS":
+        return get_settings()
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Engines cujo schema já foi verificado: (id da engine, schema) -> search_path
+_checked_schemas: Dict[Tuple[int, Optional[str]], str] = {}
+_checked_lock = threading.Lock()
 
 
 def check_schema(conn, schema: Optional[str] = None) -> None:
-    """Verifica e ajusta o search path do banco de dados.
-    
+    """Verifica o search path do banco de dados (uma vez por engine e schema).
+
+    O search_path é definido pelo hook `connect` de make_engine em cada conexão
+    física; aqui só se confirma o resultado. Chamadas repetidas para a mesma
+    engine não custam nenhuma ida ao banco.
+
     Args:
         conn: Uma conexão SQLAlchemy (Engine, Connection, Session)
-        schema: Schema para configurar no search_path
+        schema: Schema esperado no início do search_path
     """
-    # Se é uma session, pegamos a conexão
-    if hasattr(conn, 'connection'):
-        conn = conn.connection()
-    
-    # Se é uma engine, abrimos uma conexão
-    if hasattr(conn, 'connect'):
-        conn = conn.connect()
-    
-    # Define o schema
-    schema = schema or SETTINGS.schema
-    
-    # Mostra o search_path atual
-    sp = conn.execute(text("SHOW search_path")).scalar_one()
+    from sqlalchemy import text
+    from sqlalchemy.engine import Connection, Engine
+
+    schema = schema or current_schema()
+
+    if isinstance(conn, Engine):
+        engine = conn
+    elif isinstance(conn, Connection):
+        engine = conn.engine
+    else:
+        # Session: usa a engine em que ela está ligada
+        engine = conn.get_bind()
+        engine = engine.engine if isinstance(engine, Connection) else engine
+
+    key = (id(engine), schema)
+    if key in _checked_schemas:
+        return
+
+    with _checked_lock:
+        if key in _checked_schemas:
+            return
+
+        def _verify(c: Connection) -> str:
+            sp = c.execute(text("SHOW search_path")).scalar_one()
+            if schema and sp.split(",")[0].strip().strip('"') != schema:
+                # Engine criada fora de make_engine: ajusta só esta conexão
+                c.execute(text(f'SET search_path TO "{schema}", public'))
+                sp = c.execute(text("SHOW search_path")).scalar_one()
+            return sp
+
+        if isinstance(conn, Engine):
+            # Conexão própria, devolvida ao pool ao final
+            with engine.connect() as c:
+                sp = _verify(c)
+                c.commit()
+        elif isinstance(conn, Connection):
+            sp = _verify(conn)
+        else:
+            sp = _verify(conn.connection())
+
+        _checked_schemas[key] = sp
     print(f"[database] search_path atual: {sp}")
-    
-    # Define o search_path se necessário
-    if schema:
-        conn.execute(text(f'SET search_path TO "{schema}", public'))
-        conn.commit()
\ No newline at end of file
+
+
+def check_connection_leaks(engine: Optional[Engine] = None) -> int:
+    """
+    Number of connections of `engine` (default: every cached engine) still checked out.
+
+    Meant to be called once all work is done (after release_pinned_connections):
+    anything above zero is a connection some code path opened and never closed.
+    Does not build any engine if nothing used one.
+    """
+    if engine is None:
+        return sum(check_connection_leaks(e) for e in cached_engines().values())
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return checkedout() if checkedout else 0
+
+
+def _forget_checked(engine: Engine) -> None:
+    with _checked_lock:
+        for key in [k for k in _checked_schemas if k[0] == id(engine)]:
+            del _checked_schemas[key]
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+indexes.py — Índices secundários fora do caminho da carga
+
+Numa recarga completa cada linha gravada atualiza também todos os índices
+secundários da tabela. Com --rebuild-indexes o app.main:
+
+1. lê as definições dos índices no catálogo (pg_get_indexdef) e as grava na
+   tabela de controle index_backup, na mesma transação em que os remove;
+2. carrega os arquivos;
+3. recria os índices em paralelo, cada um na sua conexão, apagando a linha
+   de index_backup de cada índice pronto, e roda ANALYZE nas tabelas.
+
+Só entram índices que não sustentam constraints: chaves primárias e UNIQUE
+(usadas pelo ON CONFLICT e pela integridade) ficam onde estão.
+
+Se a carga morrer no meio, as definições continuam em index_backup e os
+índices podem ser recriados depois:
+
+Uso:
+    python3 -m app.indexes status  [--schema imobiliario]
+    python3 -m app.indexes rebuild [--schema imobiliario] [--jobs 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import sql
+
+from .database import connect, target_schema
+
+LOG = logging.getLogger("app.indexes")
+
+BACKUP_TABLE = "index_backup"
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    table_name  TEXT        NOT NULL,
+    index_name  TEXT        NOT NULL,
+    definition  TEXT        NOT NULL,
+    dropped_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (index_name)
+)
+"""
+
+# Índices secundários das tabelas: fora PK e índices de constraints (UNIQUE, EXCLUDE)
+_SECONDARY_INDEXES = """
+SELECT t.relname, i.relname, pg_get_indexdef(i.oid)
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname = %s
+  AND t.relname = ANY(%s)
+  AND NOT x.indisprimary
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+ORDER BY t.relname, i.relname
+"""
+
+IndexDef = Tuple[str, str, str]  # (tabela, índice, CREATE INDEX ...)
+
+
+def _table(schema: str) -> sql.Composed:
+    return sql.SQL("{}.{}").format(sql.Identifier(schema), sql.Identifier(BACKUP_TABLE))
+
+
+def model_tables() -> List[str]:
+    """Tabelas dos modelos de app.models (as que os loaders gravam)."""
+    from .models import Base
+
+    return sorted(table.name for table in Base.metadata.sorted_tables)
+
+
+def ensure_backup_table(conn: psycopg.Connection, schema: str) -> None:
+    """Cria a tabela de controle, se não existir. Idempotente."""
+    conn.execute(sql.SQL(_DDL).format(table=_table(schema)))
+
+
+def secondary_indexes(conn: psycopg.Connection, schema: str, tables: Sequence[str]) -> List[IndexDef]:
+    return conn.execute(_SECONDARY_INDEXES, (schema, list(tables))).fetchall()
+
+
+def pending_indexes(conn: psycopg.Connection, schema: str) -> List[IndexDef]:
+    """Índices removidos e ainda não recriados (de uma carga em curso ou interrompida)."""
+    ensure_backup_table(conn, schema)
+    return conn.execute(
+        sql.SQL("SELECT table_name, index_name, definition FROM {} ORDER BY table_name, index_name").format(
+            _table(schema)
+        )
+    ).fetchall()
+
+
+def drop_indexes(
+    schema: Optional[str] = None, tables: Optional[Iterable[str]] = None, logger: Optional[logging.Logger] = None
+) -> List[IndexDef]:
+    """
+    Remove os índices secundários de `tables` (default: todas as tabelas dos
+    modelos), guardando as definições em index_backup na mesma transação.
+    """
+    log = logger or LOG
+    schema = target_schema(schema)
+    with connect() as conn:
+        ensure_backup_table(conn, schema)
+        with conn.transaction():
+            defs = secondary_indexes(conn, schema, list(tables or model_tables()))
+            for table, index, definition in defs:
+                conn.execute(
+                    sql.SQL(
+                        "INSERT INTO {} (table_name, index_name, definition) VALUES (%s, %s, %s) "
+                        "ON CONFLICT (index_name) DO NOTHING"
+                    ).format(_table(schema)),
+                    (table, index, definition),
+                )
+                conn.execute(sql.SQL("DROP INDEX {}.{}").format(sql.Identifier(schema), sql.Identifier(index)))
+    for table, index, _ in defs:
+        log.info("Índice removido: %s.%s (%s)", schema, index, table)
+    return defs
+
+
+def _if_not_exists(definition: str) -> str:
+    """CREATE [UNIQUE] INDEX nome ... -> CREATE [UNIQUE] INDEX IF NOT EXISTS nome ..."""
+    head, sep, rest = definition.partition(" INDEX ")
+    if rest.startswith("IF NOT EXISTS "):
+        return definition
+    return f"{head}{sep}IF NOT EXISTS {rest}"
+
+
+def _create_index(schema: str, index: IndexDef, log: logging.Logger) -> float:
+    """Cria um índice na sua própria conexão e tira-o de index_backup."""
+    table, name, definition = index
+    start = time.time()
+    with connect() as conn:
+        conn.execute(_if_not_exists(definition))
+        conn.execute(sql.SQL("DELETE FROM {} WHERE index_name = %s").format(_table(schema)), (name,))
+    elapsed = time.time() - start
+    log.info("Índice recriado: %s.%s (%s) em %.2fs", schema, name, table, elapsed)
+    return elapsed
+
+
+def rebuild_indexes(
+    schema: Optional[str] = None, jobs: int = 4, analyze: bool = True, logger: Optional[logging.Logger] = None
+) -> int:
+    """
+    Recria todos os índices pendentes em index_backup, até `jobs` em paralelo,
+    e roda ANALYZE nas tabelas afetadas. Retorna quantos índices foram recriados.
+    """
+    log = logger or LOG
+    schema = target_schema(schema)
+    with connect() as conn:
+        pending = pending_indexes(conn, schema)
+    if not pending:
+        return 0
+
+    log.info("Recriando %d índice(s) em %s com até %d conexões...", len(pending), schema, jobs)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(pending)))) as pool:
+        futures = [(index, pool.submit(_create_index, schema, index, log)) for index in pending]
+        for (table, name, _), future in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                failed += 1
+                log.error("Falha ao recriar %s.%s (%s): %s", schema, name, table, exc)
+
+    if analyze:
+        with connect() as conn:
+            for table in sorted({table for table, _, _ in pending}):
+                conn.execute(sql.SQL("ANALYZE {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+        log.info("ANALYZE concluído em %s.", schema)
+
+    if failed:
+        raise RuntimeError(f"{failed} índice(s) não foram recriados; veja {schema}.{BACKUP_TABLE}")
+    return len(pending)
+
+
+@contextmanager
+def indexes_deferred(
+    schema: Optional[str] = None, jobs: int = 4, analyze: bool = True, logger: Optional[logging.Logger] = None
+) -> Iterator[List[IndexDef]]:
+    """
+    Remove os índices secundários na entrada e recria-os na saída, mesmo se a
+    carga falhar. As conexões fixas dos loaders são liberadas antes, para que
+    nenhuma transação aberta segure os locks que o CREATE INDEX precisa.
+    """
+    from .database import release_pinned_connections
+
+    log = logger or LOG
+    schema = target_schema(schema)
+    dropped = drop_indexes(schema, logger=log)
+    log.info("%d índice(s) secundário(s) removido(s) em %s até o fim da carga.", len(dropped), schema)
+    try:
+        yield dropped
+    finally:
+        release_pinned_connections()
+        rebuild_indexes(schema, jobs=jobs, analyze=analyze, logger=log)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.indexes", description="Índices secundários removidos durante cargas.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("status", help="Lista os índices removidos e ainda não recriados")
+    s.add_argument("--schema", default=None, help="Schema (default: PGSCHEMA)")
+
+    r = sub.add_parser("rebuild", help="Recria os índices pendentes (ex.: após uma carga interrompida)")
+    r.add_argument("--schema", default=None, help="Schema (default: PGSCHEMA)")
+    r.add_argument("--jobs", type=int, default=4, help="Índices criados em paralelo (default: 4)")
+    r.add_argument("--no-analyze", action="store_true", help="Não roda ANALYZE ao final")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    if args.command == "status":
+        schema = target_schema(args.schema)
+        with connect() as conn:
+            pending = pending_indexes(conn, schema)
+        if not pending:
+            print(f"Nenhum índice pendente em {schema}.")
+        for table, name, definition in pending:
+            print(f"{table:<15} {name:<40} {definition}")
+    else:
+        count = rebuild_indexes(args.schema, jobs=args.jobs, analyze=not args.no_analyze)
+        LOG.info("%d índice(s) recriado(s).", count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+integrity.py — Relatório de integridade referencial, no servidor
+
+Percorre todas as FKs declaradas em app.models e conta, com anti-joins
+(NOT EXISTS) executados no PostgreSQL, as linhas órfãs de cada uma: quantas
+linhas apontam para um pai inexistente, quantos ids distintos faltam e uma
+amostra deles. Nada além desses números trafega até o cliente.
+
+Dois modos:
+
+- db: confere as tabelas do schema entre si (ex.: depois de uma carga feita
+  com as FKs desligadas, ou num schema sombra);
+- file: confere exports ainda não carregados contra o banco. Os ids de cada
+  arquivo (chave primária e colunas de FK, já passados pelo _process_record
+  do loader) são enviados via COPY para uma tabela temporária por entidade, e
+  os anti-joins rodam contra ela. Um pai presente em outro arquivo da mesma
+  verificação (ou no próprio arquivo, nas auto-referências de imovel) conta
+  como existente. Arquivos .ndjson são lidos linha a linha; .json é lido
+  inteiro, como nos loaders.
+
+Uso:
+    python3 -m app.integrity db   [--schema imobiliario] [--sample 10]
+    python3 -m app.integrity file data/bairros.json data/imoveis.json [--schema imobiliario]
+
+Sai com código 1 se alguma FK tiver órfãos.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import sql
+
+from . import registry
+from .database import connect, peek, read_export, target_schema
+
+LOG = logging.getLogger("app.integrity")
+
+DEFAULT_SAMPLE = 5
+
+
+class ForeignKey(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]
+    parent: str
+    parent_columns: Tuple[str, ...]
+
+    def __str__(self) -> str:
+        return f"{self.table}({', '.join(self.columns)}) -> {self.parent}({', '.join(self.parent_columns)})"
+
+
+class Orphans(NamedTuple):
+    fk: ForeignKey
+    rows: int  # linhas que apontam para um pai inexistente
+    missing: int  # valores distintos da FK sem pai
+    sample: List[str]
+
+
+def foreign_keys(tables: Optional[Iterable[str]] = None) -> List[ForeignKey]:
+    """FKs declaradas em app.models (de `tables`, ou de todas as tabelas), pais antes dos filhos."""
+    from .models import Base
+
+    wanted = set(tables) if tables is not None else None
+    fks: List[ForeignKey] = []
+    for table in Base.metadata.sorted_tables:
+        if wanted is not None and table.name not in wanted:
+            continue
+        for constraint in sorted(table.foreign_key_constraints, key=lambda c: tuple(c.column_keys)):
+            fks.append(
+                ForeignKey(
+                    table.name,
+                    tuple(c.name for c in constraint.columns),
+                    constraint.referred_table.name,
+                    tuple(e.column.name for e in constraint.elements),
+                )
+            )
+    return fks
+
+
+def _cols(alias: str, columns: Sequence[str]) -> sql.Composable:
+    return sql.SQL(", ").join(sql.Identifier(alias, c) for c in columns)
+
+
+def _match(alias: str, columns: Sequence[str], child: str, child_columns: Sequence[str]) -> sql.Composable:
+    return sql.SQL(" AND ").join(
+        sql.SQL("{} = {}").format(sql.Identifier(alias, p), sql.Identifier(child, c))
+        for p, c in zip(columns, child_columns)
+    )
+
+
+def _orphans(
+    conn: psycopg.Connection, fk: ForeignKey, child: sql.Composable, parents: Sequence[sql.Composable], sample: int
+) -> Orphans:
+    """Anti-join de `child` contra cada tabela em `parents`; um só scan de `child`."""
+    absent = sql.SQL(" AND ").join(
+        sql.SQL("NOT EXISTS (SELECT 1 FROM {} p WHERE {})").format(
+            parent, _match("p", fk.parent_columns, "c", fk.columns)
+        )
+        for parent in parents
+    )
+    not_null = sql.SQL(" AND ").join(sql.SQL("{} IS NOT NULL").format(sql.Identifier("c", c)) for c in fk.columns)
+    key = _cols("c", fk.columns)
+    query = sql.SQL(
+        "WITH o AS MATERIALIZED (SELECT {key} FROM {child} c WHERE {not_null} AND {absent}) "
+        "SELECT (SELECT count(*) FROM o), "
+        "(SELECT count(DISTINCT ({okey})) FROM o), "
+        "ARRAY(SELECT k::text FROM (SELECT DISTINCT ({okey}) AS k FROM o ORDER BY 1 LIMIT %s) s)"
+    ).format(key=key, child=child, not_null=not_null, absent=absent, okey=_cols("o", fk.columns))
+    rows, missing, values = conn.execute(query, (sample,)).fetchone()
+    return Orphans(fk, rows, missing, list(values))
+
+
+def check_database(
+    schema: Optional[str] = None, tables: Optional[Iterable[str]] = None, sample: int = DEFAULT_SAMPLE
+) -> List[Orphans]:
+    """Órfãos de cada FK entre as tabelas do próprio schema."""
+    schema = target_schema(schema)
+    report: List[Orphans] = []
+    with connect() as conn:
+        for fk in foreign_keys(tables):
+            report.append(
+                _orphans(
+                    conn, fk,
+                    sql.Identifier(schema, fk.table),
+                    [sql.Identifier(schema, fk.parent)],
+                    sample,
+                )
+            )
+    return report
+
+
+# ==============================
+# Arquivos
+# ==============================
+def _file_table(table: str) -> sql.Composable:
+    return sql.Identifier("pg_temp", f"file_{table}")
+
+
+def _file_columns(model) -> Tuple[str, ...]:
+    """Chave primária e colunas de FK: o que os anti-joins leem do arquivo."""
+    table = model.__table__
+    names = [c.name for c in table.primary_key.columns]
+    for column in table.columns:
+        if column.foreign_keys and column.name not in names:
+            names.append(column.name)
+    return tuple(names)
+
+
+def _copy_file(conn: psycopg.Connection, schema: str, path: Path, created: Dict[str, Tuple[str, ...]]) -> Optional[str]:
+    """Envia os ids de `path` para pg_temp.file_<tabela> via COPY. Retorna a tabela."""
+    first, records = peek(read_export(path))
+    spec = registry.detect(first) if first else None
+    if spec is None:
+        LOG.warning("Ignorando %s: entidade não reconhecida.", path)
+        return None
+
+    model = spec.model_class()
+    table = model.__table__.name
+    process = spec.process_record
+    if table not in created:
+        columns = _file_columns(model)
+        # Mesmos tipos das colunas da tabela real, sem constraints
+        conn.execute(
+            sql.SQL("CREATE TEMP TABLE {} AS SELECT {} FROM {} WITH NO DATA").format(
+                _file_table(table), sql.SQL(", ").join(map(sql.Identifier, columns)), sql.Identifier(schema, table)
+            )
+        )
+        created[table] = columns
+    columns = created[table]
+
+    start = time.time()
+    copied = skipped = 0
+    with conn.cursor() as cur:
+        with cur.copy(
+            sql.SQL("COPY {} ({}) FROM STDIN").format(
+                _file_table(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+            )
+        ) as copy:
+            for raw in records:
+                row = process(raw)
+                if row is None:
+                    skipped += 1
+                    continue
+                copy.write_row(tuple(row.get(c) for c in columns))
+                copied += 1
+    LOG.info("%s: %d registro(s) de %s copiados em %.2fs (%d ignorados)", path, copied, table, time.time() - start, skipped)
+    return table
+
+
+
+def check_files(
+    paths: Sequence[str | Path], schema: Optional[str] = None, sample: int = DEFAULT_SAMPLE
+) -> List[Orphans]:
+    """
+    Órfãos que a carga de `paths` deixaria: FKs dos registros dos arquivos sem
+    pai nem no banco nem nos arquivos verificados.
+    """
+    schema = target_schema(schema)
+    created: Dict[str, Tuple[str, ...]] = {}
+    report: List[Orphans] = []
+    with connect() as conn:
+        for path in registry.sort_exports(paths):
+            _copy_file(conn, schema, Path(path), created)
+        for table in created:
+            conn.execute(sql.SQL("ANALYZE {}").format(_file_table(table)))
+
+        for fk in foreign_keys(created):
+            parents = [sql.Identifier(schema, fk.parent)]
+            if fk.parent in created:
+                parents.append(_file_table(fk.parent))
+            report.append(_orphans(conn, fk, _file_table(fk.table), parents, sample))
+    return report
+
+
+def print_report(report: Sequence[Orphans]) -> None:
+    for item in report:
+        if item.rows:
+            print(f"❌ {item.fk}: {item.rows} linha(s) órfã(s), {item.missing} id(s) faltando "
+                  f"(ex.: {', '.join(item.sample)})")
+        else:
+            print(f"✅ {item.fk}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.integrity", description="Integridade referencial das FKs de app.models.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    d = sub.add_parser("db", help="Confere as tabelas do schema entre si")
+    d.add_argument("--table", action="append", default=None, help="Só as FKs desta tabela (pode repetir)")
+
+    f = sub.add_parser("file", help="Confere exports (.json/.ndjson) contra o banco, antes da carga")
+    f.add_argument("paths", nargs="+", help="Arquivos de export")
+
+    for s in (d, f):
+        s.add_argument("--schema", default=None, help="Schema (default: PGSCHEMA)")
+        s.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help=f"Ids de exemplo por FK (default: {DEFAULT_SAMPLE})")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    start = time.time()
+    if args.command == "db":
+        report = check_database(args.schema, tables=args.table, sample=args.sample)
+    else:
+        report = check_files(args.paths, args.schema, sample=args.sample)
+    print_report(report)
+    LOG.info("%d FK(s) verificada(s) em %.2fs.", len(report), time.time() - start)
+    if any(item.rows for item in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
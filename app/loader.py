@@ -9,19 +9,12 @@ from __future__ import annotations
 import json
 import logging
 from pathlib import Path
-from typing import Any, Dict, Callable
+from typing import Any, Dict, Callable, Optional, Tuple
 from sqlalchemy.orm import Session
 
-# Import all specific loaders
-from .loader_bairro import processar_cadastros as processar_bairros
-from .loader_condominio import processar_cadastros as processar_condominios
-from .loader_distrito import processar_cadastros as processar_distritos
-from .loader_imovel import processar_cadastros as processar_imoveis
-from .loader_logradouro import processar_cadastros as processar_logradouros
-from .loader_pessoa import processar_cadastros as processar_pessoas
-from .loader_loteamento import processar_cadastros as processar_loteamentos
-from .loader_secao import processar_cadastros as processar_secoes
-from .loader_plantaValor import processar_cadastros as processar_planta_valores
+from . import registry
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize
+from .sinks import Sink
 from .utils import fix_encoding_in_dict
 
 # Set up logging
@@ -45,31 +38,19 @@ def _determine_loader(data: Dict[str, Any], json_path: str | Path) -> Callable:
     
     # Get the first record to analyze its structure
     sample = content[0]
-    
-    # Check for distinctive fields to determine the type
-    if "municipio" in sample and "zonaRural" in sample:
-        return processar_bairros
-    elif "tipoCondominio" in sample:
-        return processar_condominios
-    elif "tipoLogradouroDescricao" in sample and "tipoLogradouroAbreviatura" in sample:
-        return processar_logradouros
-    elif "matriculaImobiliaria" in sample and "nroDecretoAprovacao" in sample:
-        return processar_loteamentos
-    elif all(key in sample for key in ["id", "nome", "municipio"]) and "zonaRural" not in sample:
-        return processar_distritos
-    elif "inscricaoImobiliariaFormatada" in sample:
-        return processar_imoveis
-    elif "cpfCnpj" in sample or "tipoPessoa" in sample or "pessoaFisica" in sample:
-        return processar_pessoas
-    elif "nroSecao" in sample and "logradouro" in sample and "face" in sample:
-        return processar_secoes
-    elif any(key.startswith("planta") for key in sample.keys()):
-        return processar_planta_valores
-    
-    raise ValueError("Could not determine appropriate loader for the given JSON structure")
 
+    # Check for distinctive fields to determine the type (see app.registry)
+    spec = registry.detect(sample)
+    if spec is None:
+        raise ValueError("Could not determine appropriate loader for the given JSON structure")
+
+    # Only the selected loader module is imported
+    return spec.processar_cadastros
 
-def processar_cadastros(sess: Session, json_path: str) -> None:
+
+def processar_cadastros(
+    sess: Session, json_path: str, sink: Optional[Sink] = None, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE
+) -> Optional[Tuple[int, int]]:
     """
     Main entry point for loading cadastros from JSON file.
     This function determines the appropriate loader based on the JSON content
@@ -78,7 +59,12 @@ def processar_cadastros(sess: Session, json_path: str) -> None:
     Args:
         sess: SQLAlchemy Session for database operations
         json_path: Path to the JSON file containing cadastro data
+        sink: Where the loaded rows are written (default: PostgreSQL upsert)
+        chunk_size: Records per chunk, "auto" or a ChunkSizer (see app.chunking)
         
+    Returns:
+        The loader's (successes, skipped) counts
+
     Raises:
         ValueError: If the JSON file is invalid or if no appropriate loader is found
     """
@@ -94,8 +80,9 @@ def processar_cadastros(sess: Session, json_path: str) -> None:
         loader = _determine_loader(data, json_path)
         if loader:
             LOG.info(f"Using loader: {loader.__module__}")
-            loader(sess, json_path)
+            result = loader(sess, json_path, sink=sink, chunk_size=chunk_size)
             LOG.info("Loading completed successfully")
+            return result
         else:
             raise ValueError("No content found in JSON file")
             
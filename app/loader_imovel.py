@@ -4,14 +4,18 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal, engine, SETTINGS, check_schema
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize
+from .database import current_schema, target_schema
+from .maintenance import write_stats
 from .models import Base, Base, Municipio, Bairro, Condominio, Distrito, Logradouro, Loteamento, Imovel
+from .pipeline import load_chunks
+from .sinks import Sink, resolve_sink
+from .upsert import upsert_rows
 from .utils import fix_encoding_in_dict
 
 def _int_or_none(value) -> int | None:
@@ -64,6 +68,78 @@ def _datetime_or_none(value):
     return None
 
 
+# FKs anuladas (em vez de rejeitar o imóvel) quando o registro referenciado não existe
+SAFE_FOREIGN_KEYS = {
+    "bairro_id": Bairro,
+    "distrito_id": Distrito,
+    "logradouro_id": Logradouro,
+}
+
+
+# Autorreferências (imóvel -> imóvel): a unidade pode vir antes do imóvel
+# principal no export, ou em outro shard, tarefa ou arquivo da mesma carga.
+# Estas colunas são gravadas numa segunda passada, ao fim de cada chamada de
+# load_from_iterable (ver apply_self_references); a referência a um imóvel
+# ainda não carregado fica pendente em PENDING_TABLE e é refeita a cada
+# passada, até o imóvel chegar. Assim o resultado não depende da ordem.
+SELF_REFERENCES = ("id_imovel_principal", "id_imovel_englobado")
+
+PENDING_TABLE = "imovel_referencia_pendente"
+
+# Passos da segunda passada, com {imovel} e {pending} qualificados pelo schema
+# da carga (ver self_reference_sql). Passadas concorrentes (shards, workers)
+# se serializam no advisory lock, para não se travarem nas mesmas linhas.
+SELF_REFERENCE_BEFORE = (
+    "SELECT pg_advisory_xact_lock(hashtext('{pending}'))",
+    "CREATE TABLE IF NOT EXISTS {pending} ("
+    "id bigint PRIMARY KEY, id_imovel_principal bigint, id_imovel_englobado bigint)",
+    # As referências desta carga substituem as pendentes dos mesmos imóveis
+    "DELETE FROM {pending} WHERE id = ANY(%(ids)s::bigint[])",
+)
+
+SELF_REFERENCE_UPDATE = """
+UPDATE {imovel} AS i
+SET id_imovel_principal = p.id, id_imovel_englobado = e.id
+FROM (
+    SELECT * FROM unnest(%(ids)s::bigint[], %(principal)s::bigint[], %(englobado)s::bigint[])
+    UNION ALL
+    SELECT id, id_imovel_principal, id_imovel_englobado FROM {pending}
+) AS v(id, principal, englobado)
+LEFT JOIN {imovel} AS p ON p.id = v.principal
+LEFT JOIN {imovel} AS e ON e.id = v.englobado
+WHERE i.id = v.id
+  AND (i.id_imovel_principal, i.id_imovel_englobado) IS DISTINCT FROM (p.id, e.id)
+"""
+
+SELF_REFERENCE_AFTER = (
+    # Referências desta carga a imóveis que ainda não existem
+    """
+    INSERT INTO {pending} (id, id_imovel_principal, id_imovel_englobado)
+    SELECT v.id, v.principal, v.englobado
+    FROM unnest(%(ids)s::bigint[], %(principal)s::bigint[], %(englobado)s::bigint[]) AS v(id, principal, englobado)
+    WHERE EXISTS (SELECT 1 FROM {imovel} i WHERE i.id = v.id)
+      AND ((v.principal IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {imovel} p WHERE p.id = v.principal))
+        OR (v.englobado IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {imovel} e WHERE e.id = v.englobado)))
+    """,
+    # Pendências antigas que esta passada resolveu
+    """
+    DELETE FROM {pending} AS v
+    WHERE (v.id_imovel_principal IS NULL OR EXISTS (SELECT 1 FROM {imovel} p WHERE p.id = v.id_imovel_principal))
+      AND (v.id_imovel_englobado IS NULL OR EXISTS (SELECT 1 FROM {imovel} e WHERE e.id = v.id_imovel_englobado))
+    """,
+)
+
+SELF_REFERENCE_PENDING = "SELECT count(*) FROM {pending}"
+
+Deferred = Dict[Any, Tuple[Optional[int], ...]]
+
+
+# Ids de pais já confirmados, por (schema, modelo). Pais não são apagados
+# durante a carga, então o cache continua válido entre arquivos do mesmo processo
+# (ex.: o daemon); ids ausentes não entram, pois o pai pode chegar depois.
+_known_parent_ids: Dict[Tuple[Optional[str], type], Set[int]] = {}
+
+
 def _safe_foreign_key_id(sess: Session, model_class, ref_id: int) -> Optional[int]:
     """
     Safely check if a foreign key reference exists in the database.
@@ -71,14 +147,26 @@ def _safe_foreign_key_id(sess: Session, model_class, ref_id: int) -> Optional[in
     """
     if not ref_id:
         return None
-    
+
+    known = _known_parent_ids.setdefault((current_schema(), model_class), set())
+    if ref_id in known:
+        return ref_id
+
     try:
         exists = sess.query(model_class).filter(model_class.id == ref_id).first()
-        return ref_id if exists else None
+        if exists:
+            known.add(ref_id)
+            return ref_id
+        return None
     except Exception:
         return None
 
 
+def reset_foreign_key_cache() -> None:
+    """Forget the confirmed parent ids (e.g. after the parent tables were truncated)."""
+    _known_parent_ids.clear()
+
+
 def _process_record(raw: Dict[str, Any]) -> Dict[str, Any] | None:
     """Process a single Imovel record from the JSON."""
     if not raw:
@@ -137,67 +225,122 @@ def _process_record(raw: Dict[str, Any]) -> Dict[str, Any] | None:
         return None
 
 
-def _upsert_imovel(sess: Session, data: Dict[str, Any]) -> None:
+def _upsert_imovel(sess: Session, data: Dict[str, Any]) -> int:
     """Insert or update a Imovel record."""
     if not data:
-        return
+        return 0
 
     try:
         # Verificar e corrigir referências de chaves estrangeiras
-        data['bairro_id'] = _safe_foreign_key_id(sess, Bairro, data.get('bairro_id'))
-        data['distrito_id'] = _safe_foreign_key_id(sess, Distrito, data.get('distrito_id'))
-        data['logradouro_id'] = _safe_foreign_key_id(sess, Logradouro, data.get('logradouro_id'))
+        for column, model_class in SAFE_FOREIGN_KEYS.items():
+            data[column] = _safe_foreign_key_id(sess, model_class, data.get(column))
         
-        stmt = insert(Imovel).values(**data)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[Imovel.id],
-            set_=data
-        )
-        sess.execute(stmt)
+        return upsert_rows(sess, Imovel, [data])
     except Exception as e:
         print(f"Error upserting imovel: {str(e)}")
         print(f"Imovel data: {data}")
         raise
 
 
+def self_reference_sql(statement: str, schema: Optional[str] = None) -> str:
+    """`statement` (one of the SELF_REFERENCE_* steps) with the tables of `schema`."""
+    schema = target_schema(schema)
+    return statement.format(imovel=f'"{schema}"."{Imovel.__tablename__}"', pending=f'"{schema}"."{PENDING_TABLE}"')
+
+
+def defer_self_references(rows: List[Dict[str, Any]], deferred: Deferred) -> None:
+    """
+    Move the self references of `rows` into `deferred`, by id. Rows without
+    them are deferred too, so a reference removed in the export is cleared.
+    """
+    for row in rows:
+        deferred[row["id"]] = tuple(row.pop(column, None) for column in SELF_REFERENCES)
+
+
+def self_reference_params(deferred: Deferred) -> Dict[str, List[Any]]:
+    """Parameters of the SELF_REFERENCE_* steps: one array per column."""
+    ids = list(deferred)
+    return {
+        "ids": ids,
+        "principal": [deferred[i][0] for i in ids],
+        "englobado": [deferred[i][1] for i in ids],
+    }
+
+
+def report_self_references(updated: int, pending: int) -> None:
+    """Print the outcome of the second pass."""
+    print(
+        f"Applied self references of {updated} imoveis"
+        + (f" ({pending} waiting for imoveis not loaded yet)" if pending else "")
+    )
+
+
+def apply_self_references(sess: Session, deferred: Deferred, schema: Optional[str] = None) -> int:
+    """
+    Second pass of the imóvel load: write the deferred self references, plus
+    the pending ones whose target has arrived since, with set-based statements.
+    Returns how many imoveis were updated.
+    """
+    if not deferred:
+        return 0
+    conn = sess.connection()
+    params = self_reference_params(deferred)
+    for statement in SELF_REFERENCE_BEFORE:
+        conn.exec_driver_sql(self_reference_sql(statement, schema), params if "%(" in statement else None)
+    updated = conn.exec_driver_sql(self_reference_sql(SELF_REFERENCE_UPDATE, schema), params).rowcount
+    for statement in SELF_REFERENCE_AFTER:
+        conn.exec_driver_sql(self_reference_sql(statement, schema), params if "%(" in statement else None)
+    pending = conn.exec_driver_sql(self_reference_sql(SELF_REFERENCE_PENDING, schema)).scalar_one()
+    sess.commit()
+    write_stats.record(Imovel.__table__.name, updated, schema=schema)
+    report_self_references(updated, pending)
+    return updated
+
+
+class _DeferringSink(Sink):
+    """Wraps the postgres sink, holding the self references back (see SELF_REFERENCES)."""
+
+    def __init__(self, sink: Sink) -> None:
+        self.sink = sink
+        self.name = sink.name
+        self.deferred: Deferred = {}
+
+    def write(self, model, rows: List[Dict[str, Any]]) -> int:
+        defer_self_references(rows, self.deferred)
+        return self.sink.write(model, rows)
+
+    def close(self) -> None:
+        self.sink.close()
+
+
 def load_from_iterable(
-    records: Iterable[Dict[str, Any]], chunk_size: int = 500
+    records: Iterable[Dict[str, Any]], chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE, sink: Optional[Sink] = None
 ) -> Tuple[int, int]:
-    """Load records individually with separate transactions. Returns (successes, skipped)."""
-    ok = skipped = 0
+    """
+    Load records individually with separate transactions. Returns (successes, skipped).
 
-    try:
-        # Sanity check for schema
-        check_schema(engine, SETTINGS.schema)
-    except Exception as e:
-        print(f"Error checking schema: {str(e)}")
-        raise
+    When writing to the database the self references are applied afterwards,
+    so an imóvel never fails because its principal comes later in the input.
+    """
+    if sink is not None:
+        # Sinks de arquivo recebem as linhas completas
+        return load_chunks(records, _process_record, Imovel, sink, chunk_size, per_row=True)
 
-    for rec in records:
-        try:
-            processed_data = _process_record(rec)
-            if processed_data:
-                # Individual transaction for each record
-                with SessionLocal() as sess:
-                    try:
-                        _upsert_imovel(sess, processed_data)
-                        sess.commit()
-                        ok += 1
-                    except Exception as e:
-                        sess.rollback()
-                        print(f"Error processing individual record: {str(e)}")
-                        print(f"Imovel data: {processed_data}")
-                        skipped += 1
-            else:
-                skipped += 1
-        except Exception as e:
-            print(f"Error processing record: {str(e)}")
-            skipped += 1
+    out = _DeferringSink(resolve_sink(None, _upsert_imovel, per_row=True))
+    ok, skipped = load_chunks(records, _process_record, Imovel, out, chunk_size, per_row=True)
 
+    sess = out.sink.session
+    try:
+        apply_self_references(sess, out.deferred)
+    except Exception as e:
+        sess.rollback()
+        print(f"Error applying imovel self references: {str(e)}")
     return ok, skipped
 
 
-def processar_cadastros(sess: Session, json_path: str) -> None:
+def processar_cadastros(
+    sess: Session, json_path: str, sink: Optional[Sink] = None, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE
+) -> Tuple[int, int]:
     """
     Main entry point for loading imovels from JSON file.
     Compatible with the interface expected by main.py.
@@ -211,8 +354,9 @@ def processar_cadastros(sess: Session, json_path: str) -> None:
         
         if isinstance(data, dict) and "content" in data:
             records = data["content"]
-            ok, skipped = load_from_iterable(records)
+            ok, skipped = load_from_iterable(records, chunk_size=chunk_size, sink=sink)
             print(f"Processed {ok} records successfully, skipped {skipped} records")
+            return ok, skipped
         else:
             raise ValueError("Invalid JSON format: expected object with 'content' array")
     except Exception as e:
@@ -3,14 +3,16 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple, Optional
 
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal, engine, SETTINGS, check_schema
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize
 from .models import Base, Municipio, Loteamento
+from .pipeline import load_chunks
+from .sinks import Sink, resolve_sink
+from .upsert import upsert_rows
 from .utils import fix_encoding_in_dict
 
 def _int_or_none(value) -> int | None:
@@ -74,18 +76,13 @@ def _process_record(raw: Dict[str, Any]) -> Dict[str, Any] | None:
         return None
 
 
-def _upsert_loteamento(sess: Session, data: Dict[str, Any]) -> None:
+def _upsert_loteamento(sess: Session, data: Dict[str, Any]) -> int:
     """Insert or update a Loteamento record."""
     if not data:
-        return
+        return 0
 
     try:
-        stmt = insert(Loteamento).values(**data)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[Loteamento.id],
-            set_=data
-        )
-        sess.execute(stmt)
+        return upsert_rows(sess, Loteamento, [data])
     except Exception as e:
         print(f"Error upserting loteamento: {str(e)}")
         print(f"Loteamento data: {data}")
@@ -93,61 +90,16 @@ def _upsert_loteamento(sess: Session, data: Dict[str, Any]) -> None:
 
 
 def load_from_iterable(
-    records: Iterable[Dict[str, Any]], chunk_size: int = 500
+    records: Iterable[Dict[str, Any]], chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE, sink: Optional[Sink] = None
 ) -> Tuple[int, int]:
     """Load records in batches. Returns (successes, skipped)."""
-    ok = skipped = 0
+    out = resolve_sink(sink, _upsert_loteamento)
+    return load_chunks(records, _process_record, Loteamento, out, chunk_size)
 
-    try:
-        check_schema(engine, SETTINGS.schema)
-    except Exception as e:
-        print(f"Error checking schema: {str(e)}")
-        raise
-
-    buffer: List[Dict[str, Any]] = []
-
-    def _flush(chunk: List[Dict[str, Any]]) -> int:
-        success_count = 0
-        with SessionLocal() as sess:
-            for record in chunk:
-                try:
-                    processed_data = _process_record(record)
-                    if processed_data:
-                        _upsert_loteamento(sess, processed_data)
-                        success_count += 1
-                except Exception as e:
-                    print(f"Error processing record in chunk: {str(e)}")
-                    continue
 
-            try:
-                sess.commit()
-                return success_count
-            except Exception as e:
-                sess.rollback()
-                print(f"Error committing chunk: {str(e)}")
-                return 0
-
-    for rec in records:
-        try:
-            processed_rec = _process_record(rec)
-            if processed_rec:
-                buffer.append(rec)
-                if len(buffer) >= chunk_size:
-                    ok += _flush(buffer)
-                    buffer = []
-            else:
-                skipped += 1
-        except Exception as e:
-            print(f"Error processing record: {str(e)}")
-            skipped += 1
-
-    if buffer:
-        ok += _flush(buffer)
-
-    return ok, skipped
-
-
-def processar_cadastros(sess: Session, json_path: str) -> None:
+def processar_cadastros(
+    sess: Session, json_path: str, sink: Optional[Sink] = None, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE
+) -> Tuple[int, int]:
     """
     Main entry point for loading loteamentos from JSON file.
     Compatible with the interface expected by main.py.
@@ -160,8 +112,9 @@ def processar_cadastros(sess: Session, json_path: str) -> None:
         
         if isinstance(data, dict) and "content" in data:
             records = data["content"]
-            ok, skipped = load_from_iterable(records)
+            ok, skipped = load_from_iterable(records, chunk_size=chunk_size, sink=sink)
             print(f"Processed {ok} records successfully, skipped {skipped} records")
+            return ok, skipped
         else:
             raise ValueError("Invalid JSON format: expected object with 'content' array")
     except Exception as e:
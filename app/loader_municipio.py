@@ -6,11 +6,11 @@ from pathlib import Path
 from typing import Any, Dict, Iterable, List, Tuple, Set
 
 from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal, engine, SETTINGS, check_schema
+from .database import get_sessionmaker, check_schema
 from .models import Base, Municipio
+from .upsert import upsert_rows
 
 def _process_municipios_from_bairros(raw_data: Dict[str, Any]) -> Set[Dict[str, Any]]:
     """Extract unique municipalities from bairros data."""
@@ -62,38 +62,14 @@ def _process_municipios_from_bairros(raw_data: Dict[str, Any]) -> Set[Dict[str,
         for mun in municipios
     ]
 
-def _upsert_municipio(sess: Session, data: Dict[str, Any]) -> None:
+def _upsert_municipio(sess: Session, data: Dict[str, Any]) -> int:
     """Insert or update a Municipio record."""
     if not data:
-        return
+        return 0
 
     try:
-        stmt = insert(Municipio).values(
-            id=data["id"],
-            nome=data["nome"],
-            codigo_siafi=data["codigo_siafi"],
-            codigo_ibge=data["codigo_ibge"],
-            estado_id=data["estado_id"],
-            estado_nome=data["estado_nome"],
-            estado_uf=data["estado_uf"],
-            estado_codigo_ibge=data["estado_codigo_ibge"]
-        )
-
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[Municipio.codigo_siafi],  
-            set_={
-                "id": stmt.excluded.id,
-                "nome": stmt.excluded.nome,
-                "codigo_ibge": stmt.excluded.codigo_ibge,
-                "estado_id": stmt.excluded.estado_id,
-                "estado_nome": stmt.excluded.estado_nome,
-                "estado_uf": stmt.excluded.estado_uf,
-                "estado_codigo_ibge": stmt.excluded.estado_codigo_ibge
-            }
-        )
-
-        sess.execute(stmt)
-        
+        return upsert_rows(sess, Municipio, [data], conflict=["codigo_siafi"])
+
     except Exception as e:
         print(f"Error upserting municipio: {str(e)}")
         print(f"Municipio data: {data}")
@@ -120,6 +96,7 @@ def processar_cadastros_from_bairros(json_path: str | Path) -> None:
 
         print(f"Processing {len(municipios)} municipalities...")
         
+        SessionLocal = get_sessionmaker()
         successful_count = 0
         for mun in municipios:
             sess = SessionLocal()
@@ -4,13 +4,15 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, Iterable, List, Tuple, Optional
 
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
-from .database import SessionLocal, engine, SETTINGS, check_schema
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize
 from .models import Base, Pessoa
+from .pipeline import load_chunks
+from .sinks import Sink, resolve_sink
+from .upsert import upsert_rows
 from .utils import fix_encoding_in_dict
 
 def _int_or_none(value) -> int | None:
@@ -109,18 +111,13 @@ def _process_record(raw: Dict[str, Any]) -> Dict[str, Any] | None:
         return None
 
 
-def _upsert_pessoa(sess: Session, data: Dict[str, Any]) -> None:
+def _upsert_pessoa(sess: Session, data: Dict[str, Any]) -> int:
     """Insert or update a Pessoa record."""
     if not data:
-        return
+        return 0
 
     try:
-        stmt = insert(Pessoa).values(**data)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=[Pessoa.id],
-            set_=data
-        )
-        sess.execute(stmt)
+        return upsert_rows(sess, Pessoa, [data])
     except Exception as e:
         print(f"Error upserting pessoa: {str(e)}")
         print(f"Pessoa data: {data}")
@@ -128,45 +125,16 @@ def _upsert_pessoa(sess: Session, data: Dict[str, Any]) -> None:
 
 
 def load_from_iterable(
-    records: Iterable[Dict[str, Any]], chunk_size: int = 500
+    records: Iterable[Dict[str, Any]], chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE, sink: Optional[Sink] = None
 ) -> Tuple[int, int]:
     """Load records individually to prevent transaction cascade failures. Returns (successes, skipped)."""
-    ok = skipped = 0
+    out = resolve_sink(sink, _upsert_pessoa, per_row=True)
+    return load_chunks(records, _process_record, Pessoa, out, chunk_size, per_row=True)
 
-    try:
-        # Sanity check for schema
-        check_schema(engine, SETTINGS.schema)
-    except Exception as e:
-        print(f"Error checking schema: {str(e)}")
-        raise
-
-    for rec in records:
-        try:
-            # Process record
-            processed_data = _process_record(rec)
-            if not processed_data:
-                skipped += 1
-                continue
-
-            # Individual transaction for each record
-            with SessionLocal() as sess:
-                try:
-                    _upsert_pessoa(sess, processed_data)
-                    sess.commit()
-                    ok += 1
-                except Exception as e:
-                    sess.rollback()
-                    print(f"Error processing pessoa record {processed_data.get('id', 'unknown')}: {str(e)}")
-                    skipped += 1
-
-        except Exception as e:
-            print(f"Error processing record: {str(e)}")
-            skipped += 1
-
-    return ok, skipped
 
-
-def processar_cadastros(sess: Session, json_path: str) -> None:
+def processar_cadastros(
+    sess: Session, json_path: str, sink: Optional[Sink] = None, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE
+) -> Tuple[int, int]:
     """
     Main entry point for loading pessoas from JSON file.
     Compatible with the interface expected by main.py.
@@ -179,8 +147,9 @@ def processar_cadastros(sess: Session, json_path: str) -> None:
             records = data["content"]
             # Fix UTF-8 encoding issues in all records
             records = [fix_encoding_in_dict(record) for record in records]
-            ok, skipped = load_from_iterable(records)
+            ok, skipped = load_from_iterable(records, chunk_size=chunk_size, sink=sink)
             print(f"Processed {ok} records successfully, skipped {skipped} records")
+            return ok, skipped
         else:
             raise ValueError("Invalid JSON format: expected object with 'content' array")
     except Exception as e:
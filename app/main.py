@@ -11,6 +11,32 @@ Uso:
 
     # ambos
     python3 -m app.main --json data/cadastros.json --bci data/bci.json
+
+    # só parse/transformação (descarta as linhas) ou CSV para psql \copy
+    python3 -m app.main --json data/imoveis.json --dry-run
+    python3 -m app.main --json data/imoveis.json --sink null
+    python3 -m app.main --json data/imoveis.json --sink csv --sink-dir output/
+
+    # vários municípios (um schema cada) no mesmo processo, reaproveitando os pools
+    python3 -m app.main --json data/{schema}/imoveis.json --schema pr_londrina --schema pr_cornelio
+
+    # pipeline assíncrono (leitura, transformação e lotes em paralelo)
+    python3 -m app.main --json data/imoveis.json --async --connections 4
+
+    # um arquivo grande dividido por hash do id entre 4 processos
+    python3 -m app.main --json data/imoveis.json --shards 4
+
+    # recarga completa: índices secundários removidos e recriados (em paralelo) no fim
+    python3 -m app.main --json data/imoveis.json --rebuild-indexes --index-jobs 4
+
+    # VACUUM (ANALYZE) só quando a carga regravar 50%+ de uma tabela (default: 20%)
+    python3 -m app.main --json data/imoveis.json --vacuum-threshold 0.5
+
+    # lote ajustado durante a carga para ~2s por commit
+    python3 -m app.main --json data/imoveis.json --chunk-size auto --target-commit-seconds 2
+
+    # com profiling (pstats em logs/ e/ou relatório do tracemalloc no log)
+    python3 -m app.main --json data/imoveis.json --profile cprofile --profile tracemalloc
 """
 
 from __future__ import annotations
@@ -19,11 +45,16 @@ import argparse
 import logging
 import sys
 import time
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from pathlib import Path
 from typing import Callable, Optional
 
+from app.chunking import DEFAULT_CHUNK_SIZE, ChunkSize, make_sizer, parse_chunk_size
+from app.maintenance import DEFAULT_VACUUM_THRESHOLD
+from app.profiling import PROFILE_MODES, profile_stage
+from app.sinks import SINK_KINDS, make_sink
+
 # ==============================
 # Logging
 # ==============================
@@ -153,6 +184,17 @@ def _resolve_bci_loader() -> Callable:
     return load_bci_json  # esperado: func(session, path[, chunk_size])
 
 
+def _run_async(json_path: str, connections: int, schema: Optional[str], chunk_size: ChunkSize) -> None:
+    """Carrega um export pelo pipeline assíncrono (app.async_loader)."""
+    import asyncio
+
+    from app.async_loader import load_files_async
+
+    asyncio.run(
+        load_files_async([json_path], connections=connections, chunk_size=chunk_size, schema=schema)
+    )
+
+
 # ==============================
 # CLI
 # ==============================
@@ -165,9 +207,95 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--bci", help="Caminho para bci.json")
     p.add_argument(
         "--chunk-size",
+        type=parse_chunk_size,
+        default=None,
+        help="Registros por lote, em todos os loaders, ou 'auto' para ajustar o lote "
+        "durante a carga (default: 500; BCI: 5000)",
+    )
+    p.add_argument(
+        "--target-commit-seconds",
+        type=float,
+        default=1.0,
+        help="Duração alvo de cada commit com --chunk-size auto (default: 1.0)",
+    )
+    p.add_argument(
+        "--schema",
+        action="append",
+        default=[],
+        help="Schema de destino (default: PGSCHEMA). Pode ser repetido para carregar "
+        "vários municípios no mesmo processo; '{schema}' em --json/--bci é "
+        "substituído pelo schema da vez.",
+    )
+    p.add_argument(
+        "--async",
+        action="store_true",
+        dest="use_async",
+        help="Carrega os cadastros pelo pipeline assíncrono (psycopg AsyncConnection), "
+        "com leitura, transformação e vários lotes em paralelo",
+    )
+    p.add_argument(
+        "--connections",
         type=int,
-        default=5000,
-        help="Tamanho do lote para UPSERT do BCI (default: 5000)",
+        default=4,
+        help="Conexões assíncronas usadas com --async (default: 4)",
+    )
+    p.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Divide os registros do arquivo por hash do id entre N processos, "
+        "cada um com sua conexão (default: 1)",
+    )
+    p.add_argument(
+        "--rebuild-indexes",
+        action="store_true",
+        help="Remove os índices secundários antes da carga e os recria em paralelo "
+        "ao final, seguido de ANALYZE (ver app.indexes)",
+    )
+    p.add_argument(
+        "--index-jobs",
+        type=int,
+        default=4,
+        help="Índices recriados em paralelo com --rebuild-indexes (default: 4)",
+    )
+    p.add_argument(
+        "--vacuum-threshold",
+        type=float,
+        default=DEFAULT_VACUUM_THRESHOLD,
+        help="Após a carga, as tabelas gravadas recebem ANALYZE; as que têm tuplas mortas "
+        "acima dessa fração das vivas recebem VACUUM (ANALYZE) (default: %(default)s)",
+    )
+    p.add_argument(
+        "--no-maintenance",
+        action="store_true",
+        help="Não roda ANALYZE/VACUUM nas tabelas gravadas ao final da carga",
+    )
+    p.add_argument(
+        "--sink",
+        choices=SINK_KINDS,
+        default="postgres",
+        help="Destino das linhas carregadas (default: postgres). 'null' descarta, "
+        "'csv'/'parquet' gravam arquivos em --sink-dir.",
+    )
+    p.add_argument(
+        "--dry-run",
+        action="store_const",
+        const="null",
+        dest="sink",
+        help="Lê e transforma os registros sem gravar nada (equivale a --sink null)",
+    )
+    p.add_argument(
+        "--sink-dir",
+        default="output",
+        help="Diretório de saída dos sinks csv/parquet (default: output)",
+    )
+    p.add_argument(
+        "--profile",
+        action="append",
+        choices=PROFILE_MODES,
+        default=[],
+        help="Executa cada carga sob cProfile (.pstats em logs/) e/ou tracemalloc. "
+        "Pode ser repetido.",
     )
     p.add_argument(
         "-v",
@@ -190,7 +318,8 @@ def main() -> None:
     LOG.info("Iniciando carga...")
 
     # resolve sessões e loaders mantendo o padrão que já funciona
-    session_ctx = _get_session_ctx()
+    # (sinks offline não precisam de sessão nem de engine)
+    session_ctx = _get_session_ctx() if args.sink == "postgres" else nullcontext
     cadastro_loader: Optional[Callable] = None
     if args.json:
         cadastro_loader = _resolve_cadastro_loader()
@@ -201,26 +330,89 @@ def main() -> None:
     if not args.json and not args.bci:
         LOG.warning("Nada a fazer: informe --json e/ou --bci.")
         return
+    if (args.use_async or args.shards > 1 or args.rebuild_indexes) and args.sink != "postgres":
+        LOG.error(
+            "--async/--shards/--rebuild-indexes gravam direto no PostgreSQL; não combinam com --sink %s.",
+            args.sink,
+        )
+        sys.exit(2)
+    if args.use_async and args.shards > 1:
+        LOG.error("Use --async ou --shards, não ambos.")
+        sys.exit(2)
+
+    from app.database import use_schema
 
+    # sem --schema: uma única rodada no schema do PGSCHEMA
+    schemas = args.schema or [None]
+    sink = None
     try:
-        with session_ctx() as session:
-            # 1) CADASTROS (mantém seu fluxo atual)
-            if args.json and cadastro_loader:
-                LOG.info("Carregando cadastros de: %s", args.json)
-                cadastro_loader(session, args.json)
-                session.commit()
-                LOG.info("Cadastros: commit concluído.")
-
-            # 2) BCI (novo fluxo)
-            if args.bci and bci_loader:
-                LOG.info("Carregando BCI de: %s (chunk=%d)", args.bci, args.chunk_size)
-                lidos, upsertados = bci_loader(
-                    session, args.bci, chunk_size=args.chunk_size
-                )
-                session.commit()
-                LOG.info(
-                    "BCI: lidos=%d, upsertados=%d. Commit concluído.", lidos, upsertados
+        for schema in schemas:
+            json_path = args.json.format(schema=schema) if args.json and schema else args.json
+            bci_path = args.bci.format(schema=schema) if args.bci and schema else args.bci
+            sink_dir = Path(args.sink_dir) / schema if len(schemas) > 1 else Path(args.sink_dir)
+            if schema:
+                LOG.info("Schema: %s", schema)
+
+            sink = make_sink(args.sink, sink_dir)
+            if args.rebuild_indexes:
+                from app.indexes import indexes_deferred
+
+                # o ANALYZE fica para a manutenção pós-carga, quando ela roda
+                index_ctx = lambda: indexes_deferred(  # noqa: E731
+                    jobs=args.index_jobs, analyze=args.no_maintenance, logger=LOG
                 )
+            else:
+                index_ctx = nullcontext
+            with use_schema(schema), index_ctx(), session_ctx() as session:
+                # 1) CADASTROS (mantém seu fluxo atual)
+                if json_path and cadastro_loader:
+                    LOG.info("Carregando cadastros de: %s", json_path)
+                    with profile_stage(Path(json_path).stem, args.profile, logger=LOG):
+                        # um sizer novo por arquivo: o lote ideal muda por entidade
+                        chunk_size = make_sizer(
+                            args.chunk_size or DEFAULT_CHUNK_SIZE, args.target_commit_seconds
+                        )
+                        if args.use_async:
+                            _run_async(json_path, args.connections, schema, chunk_size)
+                        elif args.shards > 1:
+                            from app.sharded import load_file_sharded
+
+                            load_file_sharded(json_path, args.shards, chunk_size=chunk_size, schema=schema)
+                        elif sink is not None:
+                            cadastro_loader(session, json_path, sink=sink, chunk_size=chunk_size)
+                        else:
+                            cadastro_loader(session, json_path, chunk_size=chunk_size)
+                    if chunk_size.adaptive and chunk_size.history:
+                        LOG.info(
+                            "Lote automático: %d registros (mín. %d, máx. %d).",
+                            chunk_size.size, min(chunk_size.history), max(chunk_size.history),
+                        )
+                    if session is not None:
+                        session.commit()
+                        LOG.info("Cadastros: commit concluído.")
+
+                # 2) BCI (novo fluxo)
+                if bci_path and bci_loader:
+                    bci_chunk = args.chunk_size if isinstance(args.chunk_size, int) else 5000
+                    LOG.info("Carregando BCI de: %s (chunk=%d)", bci_path, bci_chunk)
+                    with profile_stage(Path(bci_path).stem, args.profile, logger=LOG):
+                        lidos, upsertados = bci_loader(
+                            session, bci_path, chunk_size=bci_chunk
+                        )
+                    session.commit()
+                    LOG.info(
+                        "BCI: lidos=%d, upsertados=%d. Commit concluído.", lidos, upsertados
+                    )
+
+            if sink is not None:
+                sink.close()
+                sink = None
+
+            # 3) ANALYZE / VACUUM (ANALYZE) nas tabelas gravadas
+            if args.sink == "postgres" and not args.no_maintenance:
+                from app.maintenance import maintain_tables, write_stats
+
+                maintain_tables(write_stats.drain(), args.vacuum_threshold, logger=LOG)
 
     except KeyboardInterrupt:
         LOG.error("Execução interrompida pelo usuário (CTRL+C).")
@@ -229,6 +421,14 @@ def main() -> None:
         LOG.exception("Falha na execução: %s", exc)
         sys.exit(1)
     finally:
+        if sink is not None:
+            sink.close()
+        from app.database import check_connection_leaks, release_pinned_connections
+
+        release_pinned_connections()
+        leaked = check_connection_leaks()
+        if leaked:
+            LOG.warning("%d conexão(ões) com o banco não foram devolvidas ao pool.", leaked)
         elapsed = time.time() - start
         LOG.info("Finalizado em %.2fs.", elapsed)
 
@@ -0,0 +1,111 @@
+# app/maintenance.py
+"""
+Post-load ANALYZE / VACUUM of the tables a load touched.
+
+The writers (PostgresSink, the async pipeline, the sharded loader) record how
+many rows they upserted per table. After a load (and after each file in
+app.daemon, or when app.worker runs out of tasks) the caller drains those
+counts into maintain_tables: every touched table gets an ANALYZE, so the
+planner sees the new data, and a table whose dead tuples reach
+VACUUM_BASE_ROWS plus `vacuum_threshold` times its live tuples (the same form
+as autovacuum's trigger) gets VACUUM (ANALYZE) instead, to clear what
+ON CONFLICT DO UPDATE left behind. Appends of new rows leave no dead tuples
+and only get the ANALYZE.
+
+Dead and live tuples come from pg_stat_user_tables. A backend publishes its
+counters when it goes idle, at most once a second, so the last chunks of a
+load may be missing from them; autovacuum still covers whatever falls short.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+LOG = logging.getLogger("app.maintenance")
+
+# Tuplas mortas, como fração das vivas, a partir da qual o ANALYZE vira VACUUM (ANALYZE)
+DEFAULT_VACUUM_THRESHOLD = 0.2
+# Mínimo de linhas, como autovacuum_vacuum_threshold, para tabelas pequenas
+VACUUM_BASE_ROWS = 50
+
+TableKey = Tuple[Optional[str], str]  # (schema, tabela)
+
+
+class WriteStats:
+    """Rows upserted per (schema, table) since the last drain; thread-safe."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rows: Counter = Counter()
+
+    def record(self, table: str, rows: int, schema: Optional[str] = None) -> None:
+        if rows <= 0:
+            return
+        if schema is None:
+            from .database import current_schema
+
+            schema = current_schema()
+        with self._lock:
+            self._rows[(schema, table)] += rows
+
+    def drain(self) -> Dict[TableKey, int]:
+        with self._lock:
+            rows, self._rows = dict(self._rows), Counter()
+        return rows
+
+
+write_stats = WriteStats()
+
+
+def _tuples(conn, schema: str, table: str) -> Tuple[int, int]:
+    """(vivas, mortas) da tabela segundo pg_stat_user_tables."""
+    row = conn.execute(
+        "SELECT n_live_tup, n_dead_tup FROM pg_stat_user_tables WHERE schemaname = %s AND relname = %s",
+        (schema, table),
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+def maintain_tables(
+    written: Dict[TableKey, int],
+    vacuum_threshold: float = DEFAULT_VACUUM_THRESHOLD,
+    logger: Optional[logging.Logger] = None,
+) -> Dict[TableKey, str]:
+    """
+    ANALYZE every table in `written`, or VACUUM (ANALYZE) when its dead tuples
+    are above `vacuum_threshold` of the live ones. Returns the command run per table.
+    """
+    from psycopg import sql
+
+    from .database import connect, target_schema
+
+    log = logger or LOG
+    done: Dict[TableKey, str] = {}
+    if not written:
+        return done
+
+    # VACUUM não roda dentro de transação
+    with connect() as conn:
+        for (schema, table), rows in sorted(written.items(), key=lambda item: (item[0][0] or "", item[0][1])):
+            schema = target_schema(schema)
+            live, dead = _tuples(conn, schema, table)
+            vacuum = dead >= VACUUM_BASE_ROWS + vacuum_threshold * live
+            command = "VACUUM (ANALYZE)" if vacuum else "ANALYZE"
+            start = time.time()
+            try:
+                conn.execute(
+                    sql.SQL(command + " {}.{}").format(sql.Identifier(schema), sql.Identifier(table))
+                )
+            except Exception as exc:
+                log.warning("%s %s.%s falhou: %s", command, schema, table, exc)
+                continue
+            done[(schema, table)] = command
+            log.info(
+                "%s %s.%s: %d linhas gravadas, %d tuplas mortas para %d vivas, em %.2fs",
+                command, schema, table, rows, dead, live, time.time() - start,
+            )
+    return done
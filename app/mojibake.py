@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+mojibake.py — Auditoria e correção, no servidor, de texto com encoding duplo
+
+Registros carregados antes do fix_encoding_in_dict (app.utils) ainda têm
+texto UTF-8 que foi lido como Latin-1 e regravado: "ConceiÃ§Ã£o" em vez
+de "Conceição". Aqui as colunas de texto de todos os
+modelos de app.models são varridas no próprio PostgreSQL:
+
+- audit: um scan por tabela conta, por coluna, os valores com cara de
+  encoding duplo (regex MOJIBAKE_PATTERN: um caractere de U+00C2 a U+00DF
+  seguido de um de U+0080 a U+00BF, que é como os bytes de um caractere
+  UTF-8 de dois bytes aparecem lidos como Latin-1) e quantos deles têm
+  conserto;
+- repair: corrige com convert_from(convert_to(col, 'LATIN1'), 'UTF8'), em
+  lotes paginados pela chave primária (keyset), um lote por transação e com
+  lock_timeout, para que nenhum lote segure locks por muito tempo.
+
+O conserto roda dentro de uma função temporária (pg_temp) que devolve o valor
+original quando a volta não é possível (caractere fora do Latin-1, bytes que
+não formam UTF-8 válido), então texto legítimo que só se parece com
+mojibake fica como está.
+
+Uso:
+    python3 -m app.mojibake audit  [--schema imobiliario] [--table pessoa]
+    python3 -m app.mojibake repair [--schema imobiliario] [--table pessoa] [--batch-size 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import errors, sql
+
+from .database import connect, target_schema
+
+LOG = logging.getLogger("app.mojibake")
+
+MOJIBAKE_PATTERN = r"[\u00C2-\u00DF][\u0080-\u00BF]"
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_LOCK_TIMEOUT = "2s"
+# Tentativas de um lote que esbarrou em lock antes de desistir da tabela
+LOCK_RETRIES = 5
+
+_FIX_FUNCTION = """
+CREATE OR REPLACE FUNCTION pg_temp.fix_mojibake(value text) RETURNS text
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    RETURN convert_from(convert_to(value, 'LATIN1'), 'UTF8');
+EXCEPTION WHEN others THEN
+    RETURN value;
+END
+$$
+"""
+_FIX = sql.SQL("pg_temp.fix_mojibake")
+
+
+class TextColumns(NamedTuple):
+    table: str
+    key: Tuple[str, ...]
+    columns: Tuple[str, ...]
+
+
+class ColumnCount(NamedTuple):
+    table: str
+    column: str
+    suspect: int  # valores que casam com MOJIBAKE_PATTERN
+    fixed: int  # (audit) consertáveis; (repair) corrigidos
+
+
+def text_columns(tables: Optional[Iterable[str]] = None) -> List[TextColumns]:
+    """Colunas de texto (String/Text) de cada tabela de app.models."""
+    from sqlalchemy import String
+
+    from .models import Base
+
+    wanted = set(tables) if tables is not None else None
+    found: List[TextColumns] = []
+    for table in Base.metadata.sorted_tables:
+        if wanted is not None and table.name not in wanted:
+            continue
+        columns = tuple(c.name for c in table.columns if isinstance(c.type, String) and not c.primary_key)
+        if columns:
+            found.append(TextColumns(table.name, tuple(c.name for c in table.primary_key.columns), columns))
+    return found
+
+
+def _connect() -> psycopg.Connection:
+    conn = connect()
+    conn.execute(_FIX_FUNCTION)
+    return conn
+
+
+def _suspect(column: str, alias: Optional[str] = None) -> sql.Composable:
+    ident = sql.Identifier(alias, column) if alias else sql.Identifier(column)
+    return sql.SQL("{} ~ {}").format(ident, sql.Literal(MOJIBAKE_PATTERN))
+
+
+def _fixable(column: str, alias: Optional[str] = None) -> sql.Composable:
+    ident = sql.Identifier(alias, column) if alias else sql.Identifier(column)
+    return sql.SQL("({} AND {}({}) <> {})").format(_suspect(column, alias), _FIX, ident, ident)
+
+
+def audit_table(conn: psycopg.Connection, schema: str, target: TextColumns) -> List[ColumnCount]:
+    """Um scan de `target`: valores suspeitos e consertáveis por coluna."""
+    counts = sql.SQL(", ").join(
+        sql.SQL("count(*) FILTER (WHERE {}), count(*) FILTER (WHERE {})").format(_suspect(c), _fixable(c))
+        for c in target.columns
+    )
+    row = conn.execute(
+        sql.SQL("SELECT {} FROM {}").format(counts, sql.Identifier(schema, target.table))
+    ).fetchone()
+    return [
+        ColumnCount(target.table, column, row[2 * i], row[2 * i + 1]) for i, column in enumerate(target.columns)
+    ]
+
+
+def audit(schema: Optional[str] = None, tables: Optional[Iterable[str]] = None) -> List[ColumnCount]:
+    schema = target_schema(schema)
+    report: List[ColumnCount] = []
+    with _connect() as conn:
+        for target in text_columns(tables):
+            report.extend(audit_table(conn, schema, target))
+    return report
+
+
+def _repair_batch(schema: str, target: TextColumns, batch_size: int, first: bool) -> sql.Composed:
+    """
+    Um lote: as próximas `batch_size` chaves depois de %(last_N)s (ou as
+    primeiras, se `first`) e o UPDATE só das linhas com algo a corrigir.
+    Devolve quantas linhas mudaram, a última chave do lote e quantos valores
+    foram corrigidos por coluna.
+    """
+    table = sql.Identifier(schema, target.table)
+    key = sql.SQL(", ").join(map(sql.Identifier, target.key))
+    last = sql.SQL(", ").join(sql.Placeholder(f"last_{i}") for i in range(len(target.key)))
+    flags = sql.SQL(", ").join(
+        sql.SQL("{} AS {}").format(_fixable(c), sql.Identifier(f"fix_{c}")) for c in target.columns
+    )
+    any_flag = sql.SQL(" OR ").join(sql.Identifier("b", f"fix_{c}") for c in target.columns)
+    assignments = sql.SQL(", ").join(
+        sql.SQL("{col} = CASE WHEN {flag} THEN {fix}(t.{col}) ELSE t.{col} END").format(
+            col=sql.Identifier(c), flag=sql.Identifier("b", f"fix_{c}"), fix=_FIX
+        )
+        for c in target.columns
+    )
+    match = sql.SQL(" AND ").join(
+        sql.SQL("t.{k} = b.{k}").format(k=sql.Identifier(k)) for k in target.key
+    )
+    sums = sql.SQL(", ").join(
+        sql.SQL("count(*) FILTER (WHERE {})").format(sql.Identifier(f"fix_{c}")) for c in target.columns
+    )
+    return sql.SQL(
+        "WITH b AS MATERIALIZED ("
+        "  SELECT {key}, {flags} FROM {table}"
+        "  {where}"
+        "  ORDER BY {key} LIMIT {limit}"
+        "), u AS ("
+        "  UPDATE {table} t SET {assignments} FROM b WHERE {match} AND ({any_flag}) RETURNING 1"
+        ") "
+        "SELECT (SELECT count(*) FROM u), "
+        "(SELECT ARRAY[{last_key}] FROM b ORDER BY {key_desc} LIMIT 1), "
+        "{sums} FROM b"
+    ).format(
+        key=key, flags=flags, table=table, limit=sql.Literal(batch_size),
+        where=sql.SQL("") if first else sql.SQL("WHERE ({}) > ({})").format(key, last),
+        assignments=assignments, match=match, any_flag=any_flag,
+        last_key=sql.SQL(", ").join(sql.SQL("{}::text").format(sql.Identifier(k)) for k in target.key),
+        key_desc=sql.SQL(", ").join(sql.SQL("{} DESC").format(sql.Identifier(k)) for k in target.key),
+        sums=sums,
+    )
+
+
+def repair_table(
+    conn: psycopg.Connection,
+    schema: str,
+    target: TextColumns,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pause: float = 0.0,
+    logger: Optional[logging.Logger] = None,
+) -> List[ColumnCount]:
+    """Corrige `target` lote a lote; cada lote é uma transação (autocommit)."""
+    log = logger or LOG
+    query = _repair_batch(schema, target, batch_size, first=True)
+    fixed: Dict[str, int] = dict.fromkeys(target.columns, 0)
+    params: Dict[str, object] = {}
+    last_key = None
+    batches = retries = 0
+    start = time.time()
+    while True:
+        try:
+            rows, last_key, *counts = conn.execute(query, params).fetchone()
+        except errors.LockNotAvailable:
+            retries += 1
+            if retries > LOCK_RETRIES:
+                log.error("%s: lote após %s desistiu depois de %d esperas por lock.", target.table, last_key, LOCK_RETRIES)
+                break
+            log.warning("%s: lote esbarrou em lock; nova tentativa (%d/%d).", target.table, retries, LOCK_RETRIES)
+            time.sleep(pause or 1.0)
+            continue
+        retries = 0
+        if last_key is None:
+            break
+        batches += 1
+        for column, count in zip(target.columns, counts):
+            fixed[column] += count
+        if rows:
+            log.debug("%s: lote %d até %s, %d linha(s) corrigida(s).", target.table, batches, "/".join(last_key), rows)
+        query = _repair_batch(schema, target, batch_size, first=False)
+        params = {f"last_{i}": value for i, value in enumerate(last_key)}
+        if pause:
+            time.sleep(pause)
+
+    log.info("%s: %d valor(es) corrigido(s) em %d lote(s), %.2fs.", target.table, sum(fixed.values()), batches, time.time() - start)
+    return [ColumnCount(target.table, column, fixed[column], fixed[column]) for column in target.columns]
+
+
+def repair(
+    schema: Optional[str] = None,
+    tables: Optional[Iterable[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    lock_timeout: str = DEFAULT_LOCK_TIMEOUT,
+    pause: float = 0.0,
+    logger: Optional[logging.Logger] = None,
+) -> List[ColumnCount]:
+    schema = target_schema(schema)
+    report: List[ColumnCount] = []
+    with _connect() as conn:
+        conn.execute(sql.SQL("SET lock_timeout = {}").format(sql.Literal(lock_timeout)))
+        for target in text_columns(tables):
+            report.extend(repair_table(conn, schema, target, batch_size, pause, logger))
+    return report
+
+
+def print_report(report: Sequence[ColumnCount], repaired: bool = False) -> None:
+    label = "corrigidos" if repaired else "consertáveis"
+    shown = [item for item in report if item.suspect or item.fixed]
+    if not shown:
+        print("Nenhum valor com encoding duplo encontrado.")
+    for item in shown:
+        if repaired:
+            print(f"{item.table:<15} {item.column:<40} {item.fixed:>8} {label}")
+        else:
+            print(f"{item.table:<15} {item.column:<40} {item.suspect:>8} suspeitos {item.fixed:>8} {label}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.mojibake", description="Texto com encoding duplo (UTF-8 lido como Latin-1).")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    a = sub.add_parser("audit", help="Conta os valores suspeitos por tabela e coluna")
+    r = sub.add_parser("repair", help="Corrige os valores em lotes")
+    r.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Linhas por lote (default: {DEFAULT_BATCH_SIZE})")
+    r.add_argument("--lock-timeout", default=DEFAULT_LOCK_TIMEOUT, help=f"lock_timeout de cada lote (default: {DEFAULT_LOCK_TIMEOUT})")
+    r.add_argument("--pause", type=float, default=0.0, help="Segundos de pausa entre lotes (default: 0)")
+
+    for s in (a, r):
+        s.add_argument("--schema", default=None, help="Schema (default: PGSCHEMA)")
+        s.add_argument("--table", action="append", default=None, help="Só esta tabela (pode repetir)")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    start = time.time()
+    if args.command == "audit":
+        print_report(audit(args.schema, args.table))
+    else:
+        report = repair(args.schema, args.table, args.batch_size, args.lock_timeout, args.pause)
+        print_report(report, repaired=True)
+    LOG.info("Concluído em %.2fs.", time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
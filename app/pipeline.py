@@ -0,0 +1,190 @@
+# app/pipeline.py
+"""
+Chunked load loop shared by the entity loaders.
+
+Every record goes through the loader's transform exactly once. The resulting
+row is kept in a Chunk together with a lightweight reference to its input
+record (position and id), and the chunk is handed to the sink as is. The refs
+are only used to say which input records were affected when a chunk fails.
+
+Before a chunk is written, rows that the constraint precheck of app.validation
+refuses are taken out of it and counted as skipped, so a single bad value does
+not cost the rest of the chunk.
+
+A chunk writes at most one row per primary key. Overlapping API pages often
+repeat an id; once the precheck has run, the repeated versions are collapsed,
+keeping the one with the newest dh_operacao (dhOperacao) when both have it and
+the last one seen otherwise, so a chunk never writes the same row twice and an
+invalid newer version does not hide a valid older one. Across chunks the same
+rule is applied by the destination: the upsert of app.upsert skips versions
+older than the stored row, and the file sinks keep one row per key.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize, ChunkSizer, make_sizer
+from .sinks import Sink
+from .validation import compile_validator
+
+Row = Dict[str, Any]
+
+# Coluna que data a versão de um registro (dhOperacao da API)
+VERSION_COLUMN = "dh_operacao"
+
+
+class RecordRef(NamedTuple):
+    index: int  # posição do registro na entrada
+    id: Any  # "id" do registro bruto, se houver
+
+
+def primary_key(model) -> Tuple[str, ...]:
+    return tuple(c.name for c in model.__table__.primary_key.columns)
+
+
+def _supersedes(row: Row, current: Row) -> bool:
+    """Whether `row` replaces `current`, an earlier version of the same id."""
+    new, old = row.get(VERSION_COLUMN), current.get(VERSION_COLUMN)
+    if new is not None and old is not None:
+        return new >= old
+    return True
+
+
+@dataclass
+class Chunk:
+    key: Tuple[str, ...] = ()  # colunas da PK; vazio desliga a deduplicação
+    rows: List[Row] = field(default_factory=list)
+    refs: List[RecordRef] = field(default_factory=list)
+
+    def add(self, row: Row, ref: RecordRef) -> None:
+        self.rows.append(row)
+        self.refs.append(ref)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def describe(self, limit: int = 5) -> str:
+        """Short description of the input records in the chunk, for error messages."""
+        if not self.refs:
+            return "no records"
+        ids = ", ".join(str(ref.id) for ref in self.refs[:limit])
+        more = f", ... (+{len(self.refs) - limit})" if len(self.refs) > limit else ""
+        return f"records #{self.refs[0].index}-#{self.refs[-1].index} (ids {ids}{more})"
+
+    def without(self, positions) -> "Chunk":
+        """Copy of the chunk without the rows at `positions`."""
+        kept = Chunk(self.key)
+        for i, (row, ref) in enumerate(zip(self.rows, self.refs)):
+            if i not in positions:
+                kept.add(row, ref)
+        return kept
+
+    def collapse(self) -> Tuple["Chunk", int]:
+        """Copy of the chunk with one row per primary key (see _supersedes); returns (chunk, collapsed)."""
+        if not self.key:
+            return self, 0
+        kept = Chunk(self.key)
+        positions: Dict[Tuple[Any, ...], int] = {}
+        for row, ref in zip(self.rows, self.refs):
+            pk = tuple(row.get(k) for k in self.key)
+            if None not in pk:
+                pos = positions.get(pk)
+                if pos is not None:
+                    if _supersedes(row, kept.rows[pos]):
+                        kept.rows[pos] = row
+                        kept.refs[pos] = ref
+                    continue
+                positions[pk] = len(kept)
+            kept.add(row, ref)
+        return kept, len(self) - len(kept)
+
+
+def collapse_rows(model, rows: Sequence[Row]) -> Tuple[List[Row], int]:
+    """Rows with repeated primary keys collapsed as in a Chunk; returns (rows, collapsed)."""
+    chunk = Chunk(primary_key(model))
+    for i, row in enumerate(rows):
+        chunk.add(row, RecordRef(i, row.get("id")))
+    collapsed, count = chunk.collapse()
+    return collapsed.rows, count
+
+
+def drop_invalid(model, chunk: Chunk) -> Tuple[Chunk, int]:
+    """Remove the rows refused by the constraint precheck; returns (chunk, rejected)."""
+    rejected = compile_validator(model).reject(chunk.rows)
+    for i, reason in rejected.items():
+        ref = chunk.refs[i]
+        print(f"Rejected {model.__tablename__} record #{ref.index} (id {ref.id}): {reason}")
+    if not rejected:
+        return chunk, 0
+    return chunk.without(rejected), len(rejected)
+
+
+def write_chunk(out: Sink, model, chunk: Chunk, sizer: ChunkSizer) -> int:
+    """Hand `chunk` to the sink, feed the sizer and return how many rows were written."""
+    start = time.perf_counter()
+    written = out.write(model, chunk.rows)
+    sizer.observe(chunk.rows, time.perf_counter() - start, failed=len(chunk) - written)
+    if written < len(chunk):
+        print(f"{len(chunk) - written} {model.__tablename__} rows not written from {chunk.describe()}")
+    return written
+
+
+def load_chunks(
+    records: Iterable[Dict[str, Any]],
+    process: Callable[[Dict[str, Any]], Optional[Row]],
+    model,
+    out: Sink,
+    chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE,
+    per_row: bool = False,
+) -> Tuple[int, int]:
+    """
+    Transform `records` with `process` and write them in chunks. Returns (successes, skipped).
+
+    Records the transform or the constraint precheck rejects are skipped. With
+    `per_row` (loaders whose sink commits row by row) rows the sink could not
+    write are skipped as well; for batched loaders a failed chunk simply counts
+    no successes. Repeated ids collapsed within a chunk count as skipped too.
+    """
+    ok = skipped = collapsed = 0
+    sizer = make_sizer(chunk_size)
+    key = primary_key(model)
+    chunk = Chunk(key)
+
+    def _flush() -> None:
+        nonlocal ok, skipped, collapsed
+        valid, rejected = drop_invalid(model, chunk)
+        skipped += rejected
+        valid, repeated = valid.collapse()
+        collapsed += repeated
+        skipped += repeated
+        if not valid:
+            return
+        written = write_chunk(out, model, valid, sizer)
+        ok += written
+        if per_row:
+            skipped += len(valid) - written
+
+    for index, rec in enumerate(records):
+        try:
+            row = process(rec)
+        except Exception as e:
+            print(f"Error processing record: {str(e)}")
+            row = None
+        if not row:
+            skipped += 1
+            continue
+
+        chunk.add(row, RecordRef(index, rec.get("id") if isinstance(rec, dict) else None))
+        if len(chunk) >= sizer.size:
+            _flush()
+            chunk = Chunk(key)
+
+    if chunk:
+        _flush()
+
+    if collapsed:
+        print(f"Collapsed {collapsed} duplicate {model.__tablename__} records (same id in a chunk)")
+    return ok, skipped
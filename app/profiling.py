@@ -0,0 +1,107 @@
+# app/profiling.py
+"""
+Profiling hooks for loader runs.
+
+Wraps a stage (usually the load of one entity) in cProfile and/or tracemalloc,
+so slow or memory hungry loads can be diagnosed without patching the loaders.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+LOG = logging.getLogger(__name__)
+
+
+def _log_cprofile(profiler: cProfile.Profile, name: str, out_dir: Path, top: int, log: logging.Logger) -> Path:
+    """Dump the .pstats file for the stage and log the most expensive calls."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = out_dir / f"profile_{stamp}_{name}.pstats"
+    profiler.dump_stats(str(path))
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    log.info("[profile] %s: cProfile salvo em %s\n%s", name, path, stream.getvalue())
+    return path
+
+
+def _log_tracemalloc(
+    before: tracemalloc.Snapshot, name: str, top: int, log: logging.Logger
+) -> None:
+    """Log peak traced memory and the allocation sites that grew the most."""
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    diffs = after.compare_to(before, "lineno")[:top]
+
+    lines = [f"  {stat}" for stat in diffs]
+    log.info(
+        "[profile] %s: tracemalloc pico=%.1f MiB atual=%.1f MiB\n%s",
+        name,
+        peak / (1024 * 1024),
+        current / (1024 * 1024),
+        "\n".join(lines),
+    )
+
+
+@contextmanager
+def profile_stage(
+    name: str,
+    modes: Optional[Iterable[str]],
+    out_dir: str | Path = "logs",
+    top: int = 25,
+    logger: Optional[logging.Logger] = None,
+) -> Iterator[None]:
+    """
+    Profile the wrapped block according to `modes`.
+
+    Args:
+        name: Stage name, used in log lines and in the .pstats file name
+        modes: Any combination of PROFILE_MODES; empty/None disables profiling
+        out_dir: Directory where .pstats files are written
+        top: Number of functions / allocation sites reported
+        logger: Logger used for the reports (defaults to this module's logger)
+    """
+    modes = set(modes or ())
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s): {', '.join(sorted(unknown))}")
+
+    log = logger or LOG
+    out_path = Path(out_dir)
+
+    before: Optional[tracemalloc.Snapshot] = None
+    started_tracemalloc = False
+    if "tracemalloc" in modes:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+    profiler: Optional[cProfile.Profile] = None
+    if "cprofile" in modes:
+        out_path.mkdir(parents=True, exist_ok=True)
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _log_cprofile(profiler, name, out_path, top, log)
+        if before is not None:
+            _log_tracemalloc(before, name, top, log)
+            if started_tracemalloc:
+                tracemalloc.stop()
@@ -0,0 +1,555 @@
+# -*- coding: utf-8 -*-
+"""
+reconcile.py — Conferência pós-carga: arquivo x banco, por hash agregado
+
+Os contadores ok/skipped dos loaders dizem quantos registros foram enviados,
+não se o banco ficou igual ao arquivo. Aqui cada entidade é resumida, dos dois
+lados, por (quantidade de linhas, soma dos hashes das linhas):
+
+- no cliente, os registros são lidos em streaming, passam pelo mesmo caminho
+  da carga (fix_encoding_in_dict, _process_record do loader, precheck de
+  app.validation) e cada linha vira um texto canônico cujo md5 entra numa
+  soma corrente; nada é guardado por id;
+- no servidor, o mesmo texto canônico é montado em SQL e a soma sai de um
+  único scan da tabela.
+
+A soma (mod 2^64) dos primeiros 64 bits de cada md5 não depende da ordem das
+linhas. Se os resumos divergem, --drill-down divide a faixa de ids em baldes,
+compara os baldes (a cada rodada, um scan da tabela e uma releitura dos
+arquivos, só nas faixas divergentes) e desce até faixas pequenas, onde lista
+os ids que faltam, sobram ou diferem.
+
+Um id repetido no arquivo entra na soma corrente uma vez por versão, e o
+resumo do arquivo diverge do banco. O --drill-down leva essas faixas até a
+comparação id a id, que fica com a versão mais nova (a regra de
+app.pipeline._supersedes, que o upsert mantém entre chunks com
+UPSERT_KEEP_NEWEST), e desconta as versões substituídas do resumo.
+
+Só entram as colunas que o loader grava (as chaves da primeira linha
+processada), menos as que ele resolve contra o banco na gravação
+(SAFE_FOREIGN_KEYS de app.loader_imovel, anuladas quando o pai não existe, e
+SELF_REFERENCES, pendentes até o imóvel chegar); essas ficam com o app.integrity. Com --subset o banco é restrito aos ids dos arquivos (enviados
+via COPY para uma tabela temporária), para conferir uma carga incremental.
+
+Uso:
+    python3 -m app.reconcile data/bairros.json data/imoveis.json [--schema imobiliario]
+    python3 -m app.reconcile /tmp/exports/imoveis/ --subset --drill-down
+
+Sai com código 1 se alguma entidade divergir.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import sys
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import sql
+from sqlalchemy import CHAR, Boolean, Date, DateTime, Integer, Numeric, String
+
+from . import registry
+from .database import connect, peek, read_export, target_schema
+from .pipeline import VERSION_COLUMN, _supersedes
+from .validation import compile_validator
+
+LOG = logging.getLogger("app.reconcile")
+
+NULL = "\\N"
+SEPARATOR = "\x1f"
+MODULUS = 2**64
+DEFAULT_BUCKETS = 16
+# Faixas com até tantas linhas são comparadas id a id
+DEFAULT_MAX_ROWS = 50
+
+
+# ==============================
+# Forma canônica
+# ==============================
+def _canonical_sql(column) -> sql.Composable:
+    """Texto canônico de `column` em SQL; tem de bater com _canonical_value."""
+    ident = sql.Identifier(column.name)
+    type_ = column.type
+    if isinstance(type_, Boolean):
+        expr = sql.SQL("CASE WHEN {0} THEN 't' WHEN NOT {0} THEN 'f' END").format(ident)
+    elif isinstance(type_, DateTime):
+        expr = sql.SQL("""to_char({}, 'YYYY-MM-DD"T"HH24:MI:SS.US')""").format(ident)
+    elif isinstance(type_, Date):
+        expr = sql.SQL("to_char({}, 'YYYY-MM-DD')").format(ident)
+    elif isinstance(type_, Numeric) and not isinstance(type_, Integer) and type_.scale is None:
+        expr = sql.SQL("trim_scale({})::text").format(ident)
+    else:
+        # numeric(p, s) vira texto já com a escala; char(n) perde os espaços finais
+        expr = sql.SQL("{}::text").format(ident)
+    return sql.SQL("coalesce({}, {})").format(expr, sql.Literal(NULL))
+
+
+def _canonical_value(column, value: Any) -> str:
+    """Texto canônico de `value` como o servidor o guardaria em `column`."""
+    if value is None:
+        return NULL
+    type_ = column.type
+    if isinstance(type_, Boolean):
+        return "t" if value else "f"
+    if isinstance(type_, (DateTime, Date)) and isinstance(value, str):
+        # Texto ISO, como o servidor aceitaria na gravação
+        value = datetime.fromisoformat(value)
+    if isinstance(type_, DateTime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    if isinstance(type_, Date):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(type_, Integer):
+        return str(int(value))
+    if isinstance(type_, Numeric):
+        number = Decimal(str(value))
+        if type_.scale is None:
+            return format(number.normalize(), "f")
+        return str(number.quantize(Decimal(1).scaleb(-type_.scale), rounding=ROUND_HALF_UP))
+    if isinstance(type_, CHAR):
+        return str(value).rstrip(" ")
+    if isinstance(type_, String):
+        return str(value)
+    return str(value)
+
+
+def _hash(text: str) -> int:
+    """Primeiros 64 bits do md5, com sinal (como o bit(64)::bigint do servidor)."""
+    value = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:16], 16)
+    return value - MODULUS if value >= MODULUS // 2 else value
+
+
+_HASH_SQL = "('x' || substr(md5({}), 1, 16))::bit(64)::bigint"
+
+
+class Digest(NamedTuple):
+    rows: int
+    total: int  # soma dos hashes mod 2^64
+
+    def __str__(self) -> str:
+        return f"{self.rows} linha(s), hash {self.total:016x}"
+
+
+# ==============================
+# Cliente
+# ==============================
+def _expand(paths: Sequence[str | Path]) -> List[Path]:
+    found: List[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            found.extend(sorted(x for x in p.rglob("*") if x.suffix in (".json", ".ndjson")))
+        else:
+            found.append(p)
+    return found
+
+
+@dataclass
+class Entity:
+    """
+    Lado do cliente de uma tabela: resumo corrente (linhas, soma dos hashes)
+    e faixa de ids, sem guardar nada por id; os arquivos lidos ficam anotados
+    para o --drill-down relê-los.
+    """
+
+    spec: registry.LoaderSpec
+    columns: Tuple[str, ...] = ()
+    rows: int = 0
+    total: int = 0
+    lo: Optional[int] = None
+    hi: Optional[int] = None
+    paths: List[Path] = field(default_factory=list)
+    skipped: int = 0
+
+    def __post_init__(self) -> None:
+        self.table = self.spec.model_class().__table__
+        self.validator = compile_validator(self.spec.model_class())
+        # Colunas que o loader resolve contra o banco na gravação (FK para um
+        # pai inexistente vira NULL): o arquivo não diz o valor final
+        module = self.spec.load()
+        self.resolved = tuple(getattr(module, "SAFE_FOREIGN_KEYS", ())) + tuple(getattr(module, "SELF_REFERENCES", ()))
+
+    @property
+    def key(self) -> str:
+        return self.table.primary_key.columns[0].name
+
+    def hash_row(self, row: Dict[str, Any]) -> Tuple[int, Any, int]:
+        """(id, versão, hash) da linha processada."""
+        table = self.table
+        if not self.columns:
+            self.columns = tuple(c.name for c in table.columns if c.name in row and c.name not in self.resolved)
+        text = SEPARATOR.join(_canonical_value(table.columns[c], row.get(c)) for c in self.columns)
+        return int(row[self.key]), row.get(VERSION_COLUMN), _hash(text)
+
+    def hashed(self, records: Iterable[Dict[str, Any]], path: Path, first_pass: bool = False) -> Iterator[Tuple[int, Any, int]]:
+        """
+        (id, versão, hash) das linhas que o loader gravaria de `records`. Só na
+        primeira leitura os registros recusados contam como ignorados.
+        """
+        process = self.spec.process_record
+        for raw in records:
+            try:
+                row = process(raw)
+            except Exception:
+                row = None
+            if row is None or self.validator.check(row) is not None:
+                self.skipped += first_pass
+                continue
+            try:
+                yield self.hash_row(row)
+            except (TypeError, ValueError, AttributeError) as e:
+                # Valor que não tem forma canônica: conta como ignorado, não derruba a conferência
+                if first_pass:
+                    LOG.warning("%s: registro %s ignorado: %s", path, row.get(self.key), e)
+                    self.skipped += 1
+
+    def add(self, pk: int, hash_: int) -> None:
+        self.rows += 1
+        self.total = (self.total + hash_) % MODULUS
+        self.lo = pk if self.lo is None else min(self.lo, pk)
+        self.hi = pk if self.hi is None else max(self.hi, pk)
+
+    def scan(self) -> Iterator[Tuple[int, Any, int]]:
+        """Relê os arquivos da entidade: (id, versão, hash) de cada linha, na ordem da carga."""
+        for path in self.paths:
+            yield from self.hashed(read_export(path, fix_encoding=True), path)
+
+    def digest(self) -> Digest:
+        return Digest(self.rows, self.total)
+
+
+def client_digests(paths: Sequence[str | Path]) -> Dict[str, Entity]:
+    """Lê os arquivos em streaming e monta, por tabela, o lado do cliente da conferência."""
+    entities: Dict[str, Entity] = {}
+    for path in registry.sort_exports(_expand(paths)):
+        path = Path(path)
+        first, records = peek(read_export(path, fix_encoding=True))
+        spec = registry.detect(first) if first else None
+        if spec is None:
+            LOG.warning("Ignorando %s: entidade não reconhecida.", path)
+            continue
+        entity = entities.setdefault(spec.model_class().__table__.name, Entity(spec))
+        if len(entity.table.primary_key.columns) != 1:
+            LOG.warning("Ignorando %s: %s não tem chave primária simples.", path, entity.table.name)
+            continue
+
+        entity.paths.append(path)
+        start = time.time()
+        before = entity.rows + entity.skipped
+        for pk, _, hash_ in entity.hashed(records, path, first_pass=True):
+            entity.add(pk, hash_)
+        count = entity.rows + entity.skipped - before
+        LOG.info("%s: %d registro(s) de %s lidos em %.2fs.", path, count, entity.table.name, time.time() - start)
+    return entities
+
+
+# ==============================
+# Servidor
+# ==============================
+_SUBSET = sql.Identifier("pg_temp", "reconcile_ids")
+
+
+def _load_subset(conn: psycopg.Connection, entity: Entity) -> None:
+    """Ids dos arquivos numa tabela temporária (via COPY, relendo os arquivos), para --subset."""
+    conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(_SUBSET))
+    conn.execute(sql.SQL("CREATE TEMP TABLE {} (id bigint)").format(_SUBSET))
+    with conn.cursor() as cur:
+        with cur.copy(sql.SQL("COPY {} (id) FROM STDIN").format(_SUBSET)) as copy:
+            for pk, _, _ in entity.scan():
+                copy.write_row((pk,))
+    conn.execute(sql.SQL("ANALYZE {}").format(_SUBSET))
+
+
+def _row_hash(entity: Entity) -> sql.Composable:
+    text = sql.SQL("concat_ws({}, {})").format(
+        sql.Literal(SEPARATOR),
+        sql.SQL(", ").join(_canonical_sql(entity.table.columns[c]) for c in entity.columns),
+    )
+    return sql.SQL(_HASH_SQL).format(text)
+
+
+def _where(entity: Entity, subset: bool) -> sql.Composable:
+    if not subset:
+        return sql.SQL("")
+    return sql.SQL("WHERE {} IN (SELECT id FROM {})").format(sql.Identifier(entity.key), _SUBSET)
+
+
+def server_digest(conn: psycopg.Connection, schema: str, entity: Entity, subset: bool = False) -> Digest:
+    """Contagem e soma dos hashes da tabela, num único scan."""
+    rows, total = conn.execute(
+        sql.SQL("SELECT count(*), coalesce(sum({}::numeric), 0) FROM {} {}").format(
+            _row_hash(entity), sql.Identifier(schema, entity.table.name), _where(entity, subset)
+        )
+    ).fetchone()
+    return Digest(rows, int(total) % MODULUS)
+
+
+def _in_ranges(schema: str, entity: Entity, subset: bool) -> sql.Composable:
+    """Linhas da tabela dentro das faixas [lo, hi) de %(lo)s/%(hi)s, com a largura de balde %(w)s."""
+    key = sql.Identifier("t", entity.key)
+    return sql.SQL(
+        "unnest(%(lo)s::bigint[], %(hi)s::bigint[], %(w)s::bigint[]) AS r(lo, hi, w) "
+        "JOIN {t} AS t ON {k} >= r.lo AND {k} < r.hi{subset}"
+    ).format(
+        t=sql.Identifier(schema, entity.table.name),
+        k=key,
+        subset=sql.SQL(" AND {} IN (SELECT id FROM {})").format(key, _SUBSET) if subset else sql.SQL(""),
+    )
+
+
+Bounds = List[Tuple[int, int, int]]  # (lo, hi, largura do balde)
+
+
+def _bounds(ranges: Sequence[Tuple[int, int]], buckets: int) -> Bounds:
+    return [(lo, hi, max(1, -(-(hi - lo) // buckets))) for lo, hi in sorted(ranges)]
+
+
+def _split(bounds: Bounds, found: Dict[int, Digest]) -> Dict[Tuple[int, int], Digest]:
+    """Resumo de cada balde, a partir dos resumos por início de balde em `found`."""
+    digests: Dict[Tuple[int, int], Digest] = {}
+    for lo, hi, width in bounds:
+        for start in range(lo, hi, width):
+            digests[(start, min(start + width, hi))] = found.get(start, Digest(0, 0))
+    return digests
+
+
+def _client_buckets(entity: Entity, bounds: Bounds) -> Dict[Tuple[int, int], Digest]:
+    """Resumo de cada balde do lado do cliente, numa releitura dos arquivos."""
+    starts = [lo for lo, _, _ in bounds]
+    sums: Dict[int, Tuple[int, int]] = {}
+    for pk, _, hash_ in entity.scan():
+        i = bisect_right(starts, pk) - 1
+        if i < 0 or pk >= bounds[i][1]:
+            continue
+        lo, _, width = bounds[i]
+        start = lo + (pk - lo) // width * width
+        rows, total = sums.get(start, (0, 0))
+        sums[start] = (rows + 1, (total + hash_) % MODULUS)
+    return _split(bounds, {start: Digest(*value) for start, value in sums.items()})
+
+
+def _server_buckets(
+    conn: psycopg.Connection, schema: str, entity: Entity, bounds: Bounds, subset: bool
+) -> Dict[Tuple[int, int], Digest]:
+    """Resumo de cada balde das faixas em `bounds`, num scan."""
+    result = conn.execute(
+        sql.SQL("SELECT r.lo + (({k} - r.lo) / r.w) * r.w AS b, count(*), sum({h}::numeric) FROM {r} GROUP BY b").format(
+            k=sql.Identifier("t", entity.key), h=_row_hash(entity), r=_in_ranges(schema, entity, subset)
+        ),
+        {"lo": [b[0] for b in bounds], "hi": [b[1] for b in bounds], "w": [b[2] for b in bounds]},
+    ).fetchall()
+    return _split(bounds, {start: Digest(rows, int(total) % MODULUS) for start, rows, total in result})
+
+
+def _merge(ranges: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+class RowDiff(NamedTuple):
+    missing: List[int]  # no arquivo, não no banco
+    extra: List[int]  # no banco, não no arquivo
+    changed: List[int]  # nos dois, com conteúdo diferente
+    repeated: List[int]  # mais de uma versão no arquivo
+    superseded: Digest  # resumo das versões substituídas, a descontar do arquivo
+
+
+def _latest(entity: Entity, ranges: Sequence[Tuple[int, int]]) -> Tuple[Dict[int, int], List[int], Digest]:
+    """
+    Hash da versão mais nova de cada id dentro de `ranges` (a regra de
+    app.pipeline._supersedes), os ids repetidos e o resumo das versões
+    substituídas. Só as faixas pedidas ficam em memória.
+    """
+    starts = [lo for lo, _ in ranges]
+    latest: Dict[int, Tuple[Any, int]] = {}
+    repeated = set()
+    rows = total = 0
+    for pk, version, hash_ in entity.scan():
+        i = bisect_right(starts, pk) - 1
+        if i < 0 or pk >= ranges[i][1]:
+            continue
+        current = latest.get(pk)
+        if current is None:
+            latest[pk] = (version, hash_)
+            continue
+        repeated.add(pk)
+        rows += 1
+        if _supersedes({VERSION_COLUMN: version}, {VERSION_COLUMN: current[0]}):
+            total += current[1]
+            latest[pk] = (version, hash_)
+        else:
+            total += hash_
+    return {pk: h for pk, (_, h) in latest.items()}, sorted(repeated), Digest(rows, total % MODULUS)
+
+
+def drill_down(
+    conn: psycopg.Connection,
+    schema: str,
+    entity: Entity,
+    subset: bool = False,
+    buckets: int = DEFAULT_BUCKETS,
+    max_rows: int = DEFAULT_MAX_ROWS,
+) -> RowDiff:
+    """
+    Estreita as faixas de ids divergentes, rodada a rodada, e compara id a id
+    as faixas que ficaram pequenas.
+
+    Cada rodada relê os arquivos somando só os baldes das faixas divergentes;
+    os hashes por id são guardados só para as faixas pequenas, numa última
+    releitura. Ids repetidos no arquivo também divergem no resumo corrente e
+    acabam nessas faixas, onde vale a versão mais nova.
+    """
+    key = sql.Identifier(entity.key)
+    table = sql.Identifier(schema, entity.table.name)
+    lo, hi = conn.execute(
+        sql.SQL("SELECT min({k}), max({k}) FROM {t} {w}").format(k=key, t=table, w=_where(entity, subset))
+    ).fetchone()
+    lo = min([v for v in (lo, entity.lo) if v is not None], default=0)
+    hi = max([v for v in (hi, entity.hi) if v is not None], default=0) + 1
+
+    pending = [(lo, hi)]
+    small: List[Tuple[int, int]] = []
+    rounds = 0
+    while pending:
+        rounds += 1
+        bounds = _bounds(pending, buckets)
+        clients = _client_buckets(entity, bounds)
+        differing = []
+        for (start, stop), server in _server_buckets(conn, schema, entity, bounds, subset).items():
+            client = clients[(start, stop)]
+            if client == server:
+                continue
+            if max(client.rows, server.rows) <= max_rows or stop - start <= 1:
+                small.append((start, stop))
+            else:
+                differing.append((start, stop))
+        LOG.info("%s: rodada %d, %d faixa(s) divergente(s), %d pequena(s).", entity.table.name, rounds, len(differing), len(small))
+        pending = differing
+
+    if not small:
+        return RowDiff([], [], [], [], Digest(0, 0))
+    small = _merge(small)
+    server_rows = dict(
+        conn.execute(
+            sql.SQL("SELECT {k}, {h} FROM {r}").format(
+                k=sql.Identifier("t", entity.key), h=_row_hash(entity), r=_in_ranges(schema, entity, subset)
+            ),
+            {"lo": [lo for lo, _ in small], "hi": [hi for _, hi in small], "w": [1] * len(small)},
+        ).fetchall()
+    )
+    client_rows, repeated, superseded = _latest(entity, small)
+    return RowDiff(
+        missing=sorted(set(client_rows) - set(server_rows)),
+        extra=sorted(set(server_rows) - set(client_rows)),
+        changed=sorted(pk for pk in client_rows.keys() & server_rows.keys() if client_rows[pk] != server_rows[pk]),
+        repeated=repeated,
+        superseded=superseded,
+    )
+
+
+# ==============================
+# Conferência
+# ==============================
+class Result(NamedTuple):
+    table: str
+    client: Digest
+    server: Digest
+    skipped: int
+    diff: Optional[RowDiff]
+
+    @property
+    def ok(self) -> bool:
+        return self.client == self.server
+
+
+def reconcile(
+    paths: Sequence[str | Path],
+    schema: Optional[str] = None,
+    subset: bool = False,
+    drill: bool = False,
+    buckets: int = DEFAULT_BUCKETS,
+    max_rows: int = DEFAULT_MAX_ROWS,
+) -> List[Result]:
+    schema = target_schema(schema)
+    results: List[Result] = []
+    entities = client_digests(paths)
+    with connect() as conn:
+        for name, entity in entities.items():
+            if not entity.columns:
+                continue
+            if entity.resolved:
+                LOG.info("%s: fora do hash (resolvidas na gravação): %s", name, ", ".join(entity.resolved))
+            if subset:
+                _load_subset(conn, entity)
+            start = time.time()
+            server = server_digest(conn, schema, entity, subset)
+            client = entity.digest()
+            LOG.info("%s: resumo do servidor em %.2fs.", name, time.time() - start)
+            diff = None
+            if drill and client != server:
+                diff = drill_down(conn, schema, entity, subset, buckets, max_rows)
+                # Sem as versões substituídas de ids repetidos, o arquivo fica como a carga o deixaria
+                client = Digest(client.rows - diff.superseded.rows, (client.total - diff.superseded.total) % MODULUS)
+            results.append(Result(name, client, server, entity.skipped, diff))
+    return results
+
+
+def _ids(values: Sequence[int], limit: int = 20) -> str:
+    shown = ", ".join(map(str, values[:limit]))
+    return shown + (f" … (+{len(values) - limit})" if len(values) > limit else "")
+
+
+def print_report(results: Sequence[Result]) -> None:
+    for item in results:
+        skipped = f" ({item.skipped} registro(s) ignorados pelo loader)" if item.skipped else ""
+        if item.ok:
+            print(f"✅ {item.table}: {item.client}{skipped}")
+        else:
+            print(f"❌ {item.table}: arquivo {item.client} x banco {item.server}{skipped}")
+        if item.diff and not item.ok:
+            if item.diff.missing:
+                print(f"   faltam no banco: {_ids(item.diff.missing)}")
+            if item.diff.extra:
+                print(f"   sobram no banco: {_ids(item.diff.extra)}")
+            if item.diff.changed:
+                print(f"   diferentes: {_ids(item.diff.changed)}")
+        if item.diff and item.diff.repeated:
+            print(f"   repetidos no arquivo (conferida a versão mais nova): {_ids(item.diff.repeated)}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.reconcile", description="Confere o banco contra os arquivos carregados.")
+    p.add_argument("paths", nargs="+", help="Arquivos (.json/.ndjson) ou diretórios de export")
+    p.add_argument("--schema", default=None, help="Schema (default: PGSCHEMA)")
+    p.add_argument("--subset", action="store_true", help="Compara só os ids presentes nos arquivos (carga incremental)")
+    p.add_argument("--drill-down", action="store_true", help="Localiza os ids divergentes por faixas de id")
+    p.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help=f"Baldes por faixa a cada rodada (default: {DEFAULT_BUCKETS})")
+    p.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help=f"Linhas de uma faixa comparada id a id (default: {DEFAULT_MAX_ROWS})")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    start = time.time()
+    results = reconcile(args.paths, args.schema, args.subset, args.drill_down, args.buckets, args.max_rows)
+    print_report(results)
+    LOG.info("%d entidade(s) conferida(s) em %.2fs.", len(results), time.time() - start)
+    if not all(item.ok for item in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
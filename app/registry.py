@@ -0,0 +1,112 @@
+# app/registry.py
+"""
+Registry of the entity loaders.
+
+Describes every loader without importing it, so callers only pay for the loader
+modules (and SQLAlchemy models) they actually use.
+"""
+
+from __future__ import annotations
+
+import importlib
+from dataclasses import dataclass
+from types import ModuleType
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+@dataclass(frozen=True)
+class LoaderSpec:
+    name: str  # nome curto da entidade (ex.: "bairro")
+    module: str  # módulo do loader (ex.: "app.loader_bairro")
+    model: str  # nome da classe em app.models
+    export: str  # nome do export em data/ (ex.: "bairros")
+    per_row: bool = False  # uma transação por registro (falhas contam como skipped)
+
+    def load(self) -> ModuleType:
+        """Import (once) and return the loader module."""
+        return importlib.import_module(self.module)
+
+    @property
+    def processar_cadastros(self) -> Callable:
+        return self.load().processar_cadastros
+
+    @property
+    def load_from_iterable(self) -> Callable:
+        return self.load().load_from_iterable
+
+    @property
+    def process_record(self) -> Callable:
+        """The loader's record transform (raw JSON record -> row dict or None)."""
+        return self.load()._process_record
+
+    def model_class(self):
+        from . import models
+
+        return getattr(models, self.model)
+
+
+# Ordem de dependência das FKs: pais antes dos filhos
+LOADERS: Dict[str, LoaderSpec] = {
+    spec.name: spec
+    for spec in [
+        LoaderSpec("bairro", "app.loader_bairro", "Bairro", "bairros"),
+        LoaderSpec("condominio", "app.loader_condominio", "Condominio", "condominios"),
+        LoaderSpec("distrito", "app.loader_distrito", "Distrito", "distritos"),
+        LoaderSpec("logradouro", "app.loader_logradouro", "Logradouro", "logradouros"),
+        LoaderSpec("loteamento", "app.loader_loteamento", "Loteamento", "loteamentos"),
+        LoaderSpec("secao", "app.loader_secao", "Secao", "secoes"),
+        LoaderSpec("pessoa", "app.loader_pessoa", "Pessoa", "pessoas", per_row=True),
+        LoaderSpec("plantaValor", "app.loader_plantaValor", "PlantaValor", "planta-valores"),
+        LoaderSpec("imovel", "app.loader_imovel", "Imovel", "imoveis", per_row=True),
+    ]
+}
+
+
+def get_loader(name: str) -> LoaderSpec:
+    try:
+        return LOADERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown loader: {name} (expected one of {', '.join(LOADERS)})")
+
+
+def dependency_order() -> List[str]:
+    return list(LOADERS)
+
+
+def sort_exports(paths: Iterable[str | Path]) -> List[str | Path]:
+    """
+    Export files in FK dependency order, by export name (e.g. bairros.json);
+    unknown names go last. The loader itself is still chosen by content.
+    """
+    order = dependency_order()
+    exports = {spec.export: spec.name for spec in LOADERS.values()}
+
+    def _rank(path: str | Path) -> int:
+        name = exports.get(Path(path).stem)
+        return order.index(name) if name else len(order)
+
+    return sorted(paths, key=_rank)
+
+
+def detect(sample: Dict[str, Any]) -> Optional[LoaderSpec]:
+    """Pick the loader for a record based on its distinctive fields."""
+    if "municipio" in sample and "zonaRural" in sample:
+        return LOADERS["bairro"]
+    elif "tipoCondominio" in sample:
+        return LOADERS["condominio"]
+    elif "tipoLogradouroDescricao" in sample and "tipoLogradouroAbreviatura" in sample:
+        return LOADERS["logradouro"]
+    elif "matriculaImobiliaria" in sample and "nroDecretoAprovacao" in sample:
+        return LOADERS["loteamento"]
+    elif all(key in sample for key in ["id", "nome", "municipio"]) and "zonaRural" not in sample:
+        return LOADERS["distrito"]
+    elif "inscricaoImobiliariaFormatada" in sample:
+        return LOADERS["imovel"]
+    elif "cpfCnpj" in sample or "tipoPessoa" in sample or "pessoaFisica" in sample:
+        return LOADERS["pessoa"]
+    elif "nroSecao" in sample and "logradouro" in sample and "face" in sample:
+        return LOADERS["secao"]
+    elif any(key.startswith("planta") for key in sample.keys()):
+        return LOADERS["plantaValor"]
+    return None
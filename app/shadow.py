@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+shadow.py — Recarga completa num schema sombra, trocado de uma vez
+
+Em vez de regravar as tabelas do schema em uso (leitores veem a carga pela
+metade e disputam locks com ela), a recarga vai para um schema sombra:
+
+1. prepare: cria o schema sombra a partir de sql/schema_auxiliar.sql, com
+   tabelas UNLOGGED e sem os índices secundários (as definições ficam em
+   index_backup, ver app.indexes), e copia do schema em uso as tabelas que
+   não têm loader (municipio, face);
+2. a carga roda no schema sombra (app.main --schema <sombra>, app.worker,
+   ou o comando run abaixo);
+3. swap: torna as tabelas LOGGED, cria os índices em paralelo, roda ANALYZE
+   em todas as tabelas do sombra, copia os GRANTs e, numa única transação,
+   renomeia o schema em uso para <schema>_old e o sombra para <schema>.
+   Tabelas do schema antigo que o DDL não define (ex.: load_task) passam para
+   o novo na mesma transação.
+
+Leitores continuam vendo o schema antigo, inteiro, até o commit do swap.
+
+O swap se recusa a trocar se alguma tabela com loader estiver vazia no sombra
+e com linhas no schema em uso (carga parcial, ex.: `run` com só parte dos
+arquivos); --allow-partial troca mesmo assim. O `run` ignora exports vazios
+e desiste antes do swap se um arquivo deixar de gravar mais que --max-skipped
+dos seus registros (a carga fica no sombra, para inspeção ou abort).
+
+Uso:
+    # tudo de uma vez: prepare, carga dos arquivos (pais antes dos filhos) e swap
+    python3 -m app.shadow run data/*.json --schema imobiliario
+
+    # em etapas
+    python3 -m app.shadow prepare --schema imobiliario
+    python3 -m app.main --json data/bairros.json --schema imobiliario_shadow
+    python3 -m app.shadow swap --schema imobiliario
+
+    # desiste da carga sombra
+    python3 -m app.shadow abort --schema imobiliario
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import sql
+
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize, parse_chunk_size
+from .database import connect, target_schema
+
+LOG = logging.getLogger("app.shadow")
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+SQL_SCHEMA_PATH = PROJECT_ROOT / os.getenv("SQL_SCHEMA_PATH", "sql/schema_auxiliar.sql")
+
+SHADOW_SUFFIX = "_shadow"
+OLD_SUFFIX = "_old"
+
+# Fração de registros de um arquivo não gravados (rejeitados, duplicados ou em
+# lotes que falharam) acima da qual o run desiste do swap
+DEFAULT_MAX_SKIPPED = 0.05
+
+
+def shadow_name(live: str) -> str:
+    return f"{live}{SHADOW_SUFFIX}"
+
+
+def _schema_exists(conn: psycopg.Connection, schema: str) -> bool:
+    return conn.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s", (schema,)).fetchone() is not None
+
+
+def _tables(conn: psycopg.Connection, schema: str) -> List[Tuple[str, str]]:
+    """(tabela, relpersistence) das tabelas de `schema`."""
+    return conn.execute(
+        "SELECT c.relname, c.relpersistence FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE n.nspname = %s AND c.relkind = 'r' ORDER BY c.relname",
+        (schema,),
+    ).fetchall()
+
+
+def shadow_ddl(shadow: str, sql_path: Optional[Path] = None) -> str:
+    """DDL de sql/schema_auxiliar.sql apontado para `shadow`, com tabelas UNLOGGED."""
+    from .models import DEFAULT_SCHEMA
+
+    ddl = (sql_path or SQL_SCHEMA_PATH).read_text(encoding="utf-8")
+    ddl = re.sub(rf"\b{re.escape(DEFAULT_SCHEMA)}\b", sql.Identifier(shadow).as_string(None), ddl)
+    return re.sub(r"\bCREATE\s+TABLE\b", "CREATE UNLOGGED TABLE", ddl, flags=re.IGNORECASE)
+
+
+def loaded_tables() -> List[str]:
+    """Tabelas dos modelos com loader: as que a carga no sombra preenche."""
+    from . import registry
+
+    return sorted({spec.model_class().__table__.name for spec in registry.LOADERS.values()})
+
+
+def copied_tables() -> List[str]:
+    """Tabelas dos modelos sem loader (ex.: municipio): vêm do schema em uso."""
+    from .models import Base
+
+    loaded = set(loaded_tables())
+    return [t.name for t in Base.metadata.sorted_tables if t.name not in loaded]
+
+
+def prepare(live: Optional[str] = None, copy: Optional[Sequence[str]] = None) -> str:
+    """Cria (do zero) o schema sombra de `live`. Retorna o nome do schema sombra."""
+    from .database import make_engine
+    from .indexes import drop_indexes
+    from .models import Base
+
+    live = target_schema(live)
+    shadow = shadow_name(live)
+    copy = list(copied_tables() if copy is None else copy)
+
+    with connect() as conn:
+        if not _schema_exists(conn, live):
+            raise RuntimeError(f"Schema {live} não existe")
+        conn.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(shadow)))
+        conn.execute(shadow_ddl(shadow))
+
+    # Tabelas dos modelos que o DDL não cria (ex.: planta_valores)
+    engine = make_engine(shadow)  # traduz DEFAULT_SCHEMA para o sombra
+    try:
+        Base.metadata.create_all(engine, checkfirst=True)
+    finally:
+        engine.dispose()
+
+    # Índices secundários só no swap; as definições ficam em <sombra>.index_backup
+    drop_indexes(shadow)
+
+    with connect() as conn, conn.transaction():
+        existing = {name for name, _ in _tables(conn, live)}
+        for table in copy:
+            if table not in existing:
+                LOG.warning("Tabela %s.%s não existe; nada a copiar.", live, table)
+                continue
+            cur = conn.execute(
+                sql.SQL("INSERT INTO {}.{} SELECT * FROM {}.{}").format(
+                    sql.Identifier(shadow), sql.Identifier(table), sql.Identifier(live), sql.Identifier(table)
+                )
+            )
+            LOG.info("Copiadas %d linhas de %s.%s", cur.rowcount, live, table)
+
+    LOG.info("Schema sombra %s pronto.", shadow)
+    return shadow
+
+
+def _set_logged(conn: psycopg.Connection, shadow: str) -> None:
+    """UNLOGGED -> LOGGED, pais antes dos filhos (tabela LOGGED não referencia UNLOGGED)."""
+    from .models import Base
+
+    unlogged = {name for name, persistence in _tables(conn, shadow) if persistence == "u"}
+    ordered = [t.name for t in Base.metadata.sorted_tables if t.name in unlogged]
+    ordered += sorted(unlogged - set(ordered))
+    for table in ordered:
+        start = time.time()
+        conn.execute(sql.SQL("ALTER TABLE {}.{} SET LOGGED").format(sql.Identifier(shadow), sql.Identifier(table)))
+        LOG.info("%s.%s: SET LOGGED em %.2fs", shadow, table, time.time() - start)
+
+
+def _is_empty(conn: psycopg.Connection, schema: str, table: str) -> bool:
+    return not conn.execute(
+        sql.SQL("SELECT EXISTS (SELECT 1 FROM {}.{})").format(sql.Identifier(schema), sql.Identifier(table))
+    ).fetchone()[0]
+
+
+def partial_tables(conn: psycopg.Connection, live: str, shadow: str) -> List[str]:
+    """Tabelas com loader vazias no sombra e com linhas no schema em uso."""
+    live_tables = {name for name, _ in _tables(conn, live)}
+    shadow_tables = {name for name, _ in _tables(conn, shadow)}
+    return [
+        table for table in loaded_tables()
+        if table in shadow_tables and table in live_tables
+        and _is_empty(conn, shadow, table) and not _is_empty(conn, live, table)
+    ]
+
+
+def _analyze(conn: psycopg.Connection, schema: str) -> None:
+    """ANALYZE de todas as tabelas de `schema`, não só das que tinham índices secundários."""
+    start = time.time()
+    tables = [name for name, _ in _tables(conn, schema)]
+    for table in tables:
+        conn.execute(sql.SQL("ANALYZE {}.{}").format(sql.Identifier(schema), sql.Identifier(table)))
+    LOG.info("ANALYZE de %d tabela(s) de %s em %.2fs", len(tables), schema, time.time() - start)
+
+
+def _copy_grants(conn: psycopg.Connection, live: str, shadow: str) -> None:
+    """Replica no sombra os GRANTs do schema em uso e das suas tabelas."""
+    grants = conn.execute(
+        "SELECT a.privilege_type, COALESCE(r.rolname, 'PUBLIC') "
+        "FROM pg_namespace n, aclexplode(n.nspacl) a LEFT JOIN pg_roles r ON r.oid = a.grantee "
+        "WHERE n.nspname = %s",
+        (live,),
+    ).fetchall()
+    for privilege, grantee in grants:
+        conn.execute(
+            sql.SQL("GRANT {} ON SCHEMA {} TO {}").format(
+                sql.SQL(privilege), sql.Identifier(shadow),
+                sql.SQL("PUBLIC") if grantee == "PUBLIC" else sql.Identifier(grantee),
+            )
+        )
+
+    shadow_tables = {name for name, _ in _tables(conn, shadow)}
+    grants = conn.execute(
+        "SELECT c.relname, a.privilege_type, COALESCE(r.rolname, 'PUBLIC') "
+        "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace, aclexplode(c.relacl) a "
+        "LEFT JOIN pg_roles r ON r.oid = a.grantee "
+        "WHERE n.nspname = %s AND c.relkind = 'r'",
+        (live,),
+    ).fetchall()
+    for table, privilege, grantee in grants:
+        if table not in shadow_tables:
+            continue
+        conn.execute(
+            sql.SQL("GRANT {} ON {}.{} TO {}").format(
+                sql.SQL(privilege), sql.Identifier(shadow), sql.Identifier(table),
+                sql.SQL("PUBLIC") if grantee == "PUBLIC" else sql.Identifier(grantee),
+            )
+        )
+
+
+def swap(live: Optional[str] = None, jobs: int = 4, keep_old: bool = False, allow_partial: bool = False) -> None:
+    """
+    Finaliza o schema sombra de `live` e troca os dois numa única transação.
+    Sem `allow_partial`, recusa se a carga deixou vazia uma tabela que o
+    schema em uso tem preenchida (ver partial_tables).
+    """
+    from .database import dispose_engines
+    from .indexes import rebuild_indexes
+
+    live = target_schema(live)
+    shadow = shadow_name(live)
+    old = f"{live}{OLD_SUFFIX}"
+
+    # Conexões deste processo com search_path no sombra deixariam de valer
+    dispose_engines()
+
+    with connect() as conn:
+        if not _schema_exists(conn, shadow):
+            raise RuntimeError(f"Schema sombra {shadow} não existe; rode o prepare antes")
+        empty = partial_tables(conn, live, shadow)
+        if empty and not allow_partial:
+            raise RuntimeError(
+                f"Tabela(s) vazia(s) em {shadow} e preenchida(s) em {live}: {', '.join(empty)}. "
+                "Carregue os exports que faltam ou use --allow-partial."
+            )
+        if empty:
+            LOG.warning("Trocando com tabela(s) vazia(s) (--allow-partial): %s", ", ".join(empty))
+        _set_logged(conn, shadow)
+
+    rebuild_indexes(shadow, jobs=jobs, analyze=False, logger=LOG)
+
+    with connect() as conn:
+        _analyze(conn, shadow)
+        _copy_grants(conn, live, shadow)
+        conn.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(old)))
+
+        with conn.transaction():
+            shadow_tables = {name for name, _ in _tables(conn, shadow)}
+            carried = [name for name, _ in _tables(conn, live) if name not in shadow_tables]
+            conn.execute(sql.SQL("ALTER SCHEMA {} RENAME TO {}").format(sql.Identifier(live), sql.Identifier(old)))
+            for table in carried:
+                conn.execute(
+                    sql.SQL("ALTER TABLE {}.{} SET SCHEMA {}").format(
+                        sql.Identifier(old), sql.Identifier(table), sql.Identifier(shadow)
+                    )
+                )
+            conn.execute(sql.SQL("ALTER SCHEMA {} RENAME TO {}").format(sql.Identifier(shadow), sql.Identifier(live)))
+        LOG.info("Swap concluído: %s -> %s%s", shadow, live, f" (mantidas: {', '.join(carried)})" if carried else "")
+
+        if not keep_old:
+            conn.execute(sql.SQL("DROP SCHEMA {} CASCADE").format(sql.Identifier(old)))
+            LOG.info("Schema antigo %s removido.", old)
+        else:
+            LOG.info("Schema antigo mantido como %s.", old)
+
+
+def abort(live: Optional[str] = None) -> None:
+    shadow = shadow_name(target_schema(live))
+    with connect() as conn:
+        conn.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(shadow)))
+    LOG.info("Schema sombra %s removido.", shadow)
+
+
+class _Counted:
+    """Iterável que conta os registros que o loader consumiu, sem uma leitura extra do arquivo."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]]) -> None:
+        self.records = records
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for rec in self.records:
+            self.count += 1
+            yield rec
+
+
+def run(
+    paths: Sequence[str],
+    live: Optional[str] = None,
+    chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE,
+    jobs: int = 4,
+    keep_old: bool = False,
+    allow_partial: bool = False,
+    max_skipped: float = DEFAULT_MAX_SKIPPED,
+) -> None:
+    """
+    prepare, carga de `paths` no sombra (pais antes dos filhos) e swap.
+
+    Exports vazios são ignorados. Se um arquivo deixar de gravar mais que
+    `max_skipped` dos seus registros, o swap não acontece.
+    """
+    from . import registry
+    from .database import peek, read_export, release_pinned_connections, use_schema
+
+    live = target_schema(live)
+    shadow = prepare(live)
+    failed: List[str] = []
+    try:
+        with use_schema(shadow):
+            for path in registry.sort_exports(paths):
+                first, records = peek(read_export(Path(path), fix_encoding=True))
+                if first is None:
+                    LOG.warning("Ignorando %s: export vazio.", path)
+                    continue
+                spec = registry.detect(first)
+                if spec is None:
+                    raise ValueError(f"{path}: entidade não reconhecida")
+                LOG.info("Carregando %s em %s", path, shadow)
+                counted = _Counted(records)
+                ok, skipped = spec.load_from_iterable(counted, chunk_size=chunk_size)
+                print(f"Processed {ok} records successfully, skipped {skipped} records")
+                # Lotes que falharam inteiros não contam como ok nem como skipped
+                total = counted.count
+                lost = total - ok
+                if lost > total * max_skipped:
+                    LOG.error("%s: %d de %d registro(s) não gravados.", path, lost, total)
+                    failed.append(str(path))
+    except Exception:
+        LOG.error("Carga no sombra falhou; %s não foi alterado (descarte com: python -m app.shadow abort).", live)
+        raise
+    finally:
+        release_pinned_connections()
+    if failed:
+        raise RuntimeError(
+            f"Carga incompleta em {shadow} ({', '.join(failed)}); {live} não foi alterado "
+            "(descarte com: python -m app.shadow abort)."
+        )
+    swap(live, jobs=jobs, keep_old=keep_old, allow_partial=allow_partial)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.shadow", description="Recarga completa num schema sombra com troca atômica.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    def _common(sp: argparse.ArgumentParser) -> None:
+        sp.add_argument("--schema", default=None, help="Schema em uso (default: PGSCHEMA)")
+
+    r = sub.add_parser("run", help="prepare + carga dos arquivos + swap")
+    r.add_argument("paths", nargs="+")
+    _common(r)
+    r.add_argument("--chunk-size", type=parse_chunk_size, default=DEFAULT_CHUNK_SIZE, help="Registros por lote ou 'auto'")
+    r.add_argument("--jobs", type=int, default=4, help="Índices criados em paralelo (default: 4)")
+    r.add_argument("--keep-old", action="store_true", help="Mantém o schema anterior como <schema>_old")
+    r.add_argument(
+        "--max-skipped",
+        type=float,
+        default=DEFAULT_MAX_SKIPPED,
+        help=f"Fração de registros não gravados de um arquivo que cancela o swap (default: {DEFAULT_MAX_SKIPPED})",
+    )
+
+    pr = sub.add_parser("prepare", help="Cria o schema sombra vazio")
+    _common(pr)
+
+    s = sub.add_parser("swap", help="Finaliza o schema sombra e troca pelo schema em uso")
+    _common(s)
+    s.add_argument("--jobs", type=int, default=4, help="Índices criados em paralelo (default: 4)")
+    s.add_argument("--keep-old", action="store_true", help="Mantém o schema anterior como <schema>_old")
+
+    for sp in (r, s):
+        sp.add_argument(
+            "--allow-partial", action="store_true", help="Troca mesmo com tabelas vazias no sombra e preenchidas em uso"
+        )
+
+    a = sub.add_parser("abort", help="Remove o schema sombra")
+    _common(a)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    if args.command == "run":
+        run(
+            args.paths, args.schema, chunk_size=args.chunk_size, jobs=args.jobs, keep_old=args.keep_old,
+            allow_partial=args.allow_partial, max_skipped=args.max_skipped,
+        )
+    elif args.command == "prepare":
+        prepare(args.schema)
+    elif args.command == "swap":
+        swap(args.schema, jobs=args.jobs, keep_old=args.keep_old, allow_partial=args.allow_partial)
+    else:
+        abort(args.schema)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# app/sharded.py
+"""
+Sharded parallel load of a single entity.
+
+Records are partitioned by a stable hash of their `id` into N shards and every
+shard runs the entity's own load_from_iterable in a separate process, with its
+own connection. A given id always lands in the same shard, so its versions are
+applied in input order, and every batch is sorted by primary key before the
+upsert (see app.upsert.group_rows) so that concurrent ON CONFLICT upserts lock
+rows in the same order and cannot deadlock.
+
+The parent reads the export once and splits the records into one NDJSON file
+per shard in a temporary directory; each child streams only its own file.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import registry
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize
+from .maintenance import write_stats
+from .utils import fix_encoding_in_dict
+
+
+def shard_of(value: Any, shards: int) -> int:
+    """Shard of an id; the same in every process (unlike hash() of a str)."""
+    try:
+        return int(value) % shards
+    except (TypeError, ValueError):
+        return zlib.crc32(str(value).encode("utf-8")) % shards
+
+
+def _read_records(json_path: str | Path) -> List[Dict[str, Any]]:
+    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
+    data = fix_encoding_in_dict(data)
+    if not isinstance(data, dict) or "content" not in data:
+        raise ValueError("Invalid JSON format: expected object with 'content' array")
+    return data["content"]
+
+
+def _split_records(records: List[Dict[str, Any]], shards: int, out_dir: Path) -> List[Path]:
+    """Write `records` into one NDJSON file per shard, in input order; returns the paths."""
+    paths = [out_dir / f"shard-{shard}.ndjson" for shard in range(shards)]
+    files = [path.open("w", encoding="utf-8") for path in paths]
+    try:
+        for rec in records:
+            files[shard_of(rec.get("id"), shards)].write(json.dumps(rec, ensure_ascii=False) + "\n")
+    finally:
+        for fh in files:
+            fh.close()
+    return paths
+
+
+def _load_shard(loader: str, shard_path: str, chunk_size: ChunkSize, schema: Optional[str]) -> Tuple[int, int]:
+    """Child process: load the records of one shard file (already encoding-fixed)."""
+    from .database import read_export, release_pinned_connections, use_schema
+
+    spec = registry.get_loader(loader)
+    try:
+        with use_schema(schema):
+            return spec.load_from_iterable(read_export(Path(shard_path)), chunk_size=chunk_size)
+    finally:
+        release_pinned_connections()
+
+
+def load_file_sharded(
+    json_path: str | Path, shards: int = 4, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE, schema: Optional[str] = None
+) -> Tuple[int, int]:
+    """
+    Load one JSON export with `shards` parallel processes. Returns (successes, skipped).
+
+    The file is parsed once, here; each shard gets its own NDJSON slice, so
+    no child re-reads the whole export and no record lists are pickled.
+    """
+    records = _read_records(json_path)
+    if not records:
+        return 0, 0
+    spec = registry.detect(records[0])
+    if spec is None:
+        raise ValueError(f"Could not determine appropriate loader for {json_path}")
+
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="shards-") as tmp:
+        paths = _split_records(records, shards, Path(tmp))
+        del records
+        with ProcessPoolExecutor(max_workers=shards, mp_context=ctx) as pool:
+            futures = [pool.submit(_load_shard, spec.name, str(path), chunk_size, schema) for path in paths]
+            results = [f.result() for f in futures]
+
+    ok = sum(r[0] for r in results)
+    skipped = sum(r[1] for r in results)
+    # As contagens dos processos filhos não chegam ao write_stats deste processo
+    write_stats.record(spec.model_class().__table__.name, ok, schema=schema)
+    print(f"Processed {ok} records successfully, skipped {skipped} records ({shards} shards)")
+    return ok, skipped
@@ -0,0 +1,378 @@
+# app/sinks.py
+"""
+Output sinks for the loaders.
+
+The loaders parse and transform records and hand the resulting rows (dicts keyed
+by column name) to a sink, which decides where they go:
+
+- postgres: upsert into the database (default, current behaviour)
+- null:     discard the rows, for measuring parse/transform throughput alone
+- csv:      one CSV per table plus a copy.sql script for `psql \\copy` bulk loads
+- parquet:  one Parquet file per table (requires pyarrow)
+"""
+
+from __future__ import annotations
+
+import csv
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+SINK_KINDS = ("postgres", "null", "csv", "parquet")
+
+# Marcador de NULL nos CSVs; diferencia NULL de string vazia no COPY
+CSV_NULL = r"\N"
+
+Row = Dict[str, Any]
+Upsert = Callable[["Session", Row], int]
+
+
+def _row_columns(model, row: Row) -> List[str]:
+    """Columns of `model` present in `row`, in table order."""
+    return [c.name for c in model.__table__.columns if c.name in row]
+
+
+def _qualified_name(model) -> str:
+    table = model.__table__
+    return f"{table.schema}.{table.name}" if table.schema else table.name
+
+
+class Sink:
+    """Destination of the rows produced by a loader."""
+
+    name = "base"
+
+    def write(self, model, rows: List[Row]) -> int:
+        """Write `rows` of `model`; returns how many rows were written."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Flush and release any resource held by the sink."""
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class NullSink(Sink):
+    """Discards every row; only counts them."""
+
+    name = "null"
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+    def write(self, model, rows: List[Row]) -> int:
+        self.rows += len(rows)
+        return len(rows)
+
+
+class PostgresSink(Sink):
+    """
+    Upserts rows through a session bound to the worker's pinned connection.
+
+    The same connection is reused for every chunk, so a chunk costs only its
+    data statements plus BEGIN/COMMIT; the pool checkout and its pre-ping happen
+    again only when the connection has to be reopened after an error.
+
+    A chunk is written with app.upsert.upsert_rows: one cached, parameterised
+    statement executed with the whole chunk as its parameter list.
+
+    Args:
+        upsert: Loader specific upsert, called as upsert(session, row) and
+            returning the rows written; used when committing row by row
+        per_row: Commit every row in its own transaction instead of one
+            transaction per chunk (used by the imóvel and pessoa loaders)
+    """
+
+    name = "postgres"
+
+    def __init__(self, upsert: Upsert, per_row: bool = False) -> None:
+        from .database import check_schema, current_schema, get_engine
+
+        self.upsert = upsert
+        self.per_row = per_row
+        self._session: Optional["Session"] = None
+
+        try:
+            # Sanity check for schema
+            check_schema(get_engine(), current_schema())
+        except Exception as e:
+            print(f"Error checking schema: {str(e)}")
+            raise
+
+    @property
+    def session(self) -> "Session":
+        """Session on the pinned connection; rebuilt if the connection was reopened."""
+        from sqlalchemy.orm import Session
+
+        from .database import pinned_connection
+
+        conn = pinned_connection()
+        if self._session is None or self._session.bind is not conn:
+            if self._session is not None:
+                self._session.close()
+            self._session = Session(bind=conn, autoflush=False)
+        return self._session
+
+    def write(self, model, rows: List[Row]) -> int:
+        if self.per_row:
+            return self._write_per_row(model, rows)
+
+        from .maintenance import write_stats
+        from .upsert import upsert_rows
+
+        # Uma única instrução compilada, enviada como executemany
+        sess = self.session
+        try:
+            written = upsert_rows(sess, model, rows)
+            sess.commit()
+            write_stats.record(model.__table__.name, written)
+            return written
+        except Exception as e:
+            sess.rollback()
+            print(f"Error writing {model.__tablename__} chunk: {str(e)}")
+            return 0
+
+    def _write_per_row(self, model, rows: List[Row]) -> int:
+        from .maintenance import write_stats
+
+        ok = 0
+        for data in rows:
+            # Individual transaction for each record
+            sess = self.session
+            try:
+                written = self.upsert(sess, data)
+                sess.commit()
+                ok += written
+            except Exception as e:
+                sess.rollback()
+                print(f"Error processing {model.__tablename__} record {data.get('id', 'unknown')}: {str(e)}")
+        write_stats.record(model.__table__.name, ok)
+        return ok
+
+    def close(self) -> None:
+        # A conexão continua fixa no worker; só a sessão é liberada
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class CsvSink(Sink):
+    """
+    Writes one `<table>.csv` per model into `out_dir`, chunk by chunk.
+
+    On close a `copy.sql` script is written with one block per table, so the
+    files can be bulk loaded with `psql -f copy.sql` from the output directory.
+    The loaders only collapse repeated ids within a chunk, so a key can appear
+    more than once in a file: each block copies the file into a temporary
+    staging table and inserts one row per primary key, the newest dh_operacao
+    (where the table has it) and else the last one in the file, as
+    app.pipeline._supersedes does. The insert does not upsert: load into empty
+    tables (or staging tables) and resolve foreign keys beforehand.
+    """
+
+    name = "csv"
+
+    def __init__(self, out_dir: str | Path) -> None:
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._files: Dict[str, Any] = {}
+        self._writers: Dict[str, Any] = {}
+        self._columns: Dict[str, List[str]] = {}
+        self._models: Dict[str, Any] = {}
+
+    def _writer(self, model, first_row: Row):
+        key = _qualified_name(model)
+        if key not in self._writers:
+            columns = _row_columns(model, first_row)
+            fh = (self.out_dir / f"{model.__tablename__}.csv").open("w", encoding="utf-8", newline="")
+            writer = csv.writer(fh)
+            writer.writerow(columns)
+            self._files[key] = fh
+            self._writers[key] = writer
+            self._columns[key] = columns
+            self._models[key] = model
+        return self._writers[key], self._columns[key]
+
+    def write(self, model, rows: List[Row]) -> int:
+        if not rows:
+            return 0
+        writer, columns = self._writer(model, rows[0])
+        for row in rows:
+            writer.writerow([CSV_NULL if row.get(c) is None else row.get(c) for c in columns])
+        return len(rows)
+
+    @staticmethod
+    def copy_block(key: str, model, columns: List[str]) -> str:
+        """Commands of copy.sql for one table: COPY into staging, then one row per key."""
+        from .pipeline import VERSION_COLUMN
+
+        table = model.__table__
+        stage = f"copy_{table.name}"
+        cols = ", ".join(columns)
+        pk = ", ".join(c.name for c in table.primary_key.columns)
+        order = [pk]
+        if VERSION_COLUMN in columns:
+            order.append(f"{VERSION_COLUMN} DESC NULLS LAST")
+        order.append("copy_ord DESC")
+        return "\n".join([
+            f"-- {key}",
+            f"CREATE TEMP TABLE {stage} AS SELECT {cols} FROM {key} WITH NO DATA;",
+            f"ALTER TABLE {stage} ADD COLUMN copy_ord bigserial;",
+            f"\\copy {stage} ({cols}) FROM '{table.name}.csv' WITH (FORMAT csv, HEADER true, NULL '{CSV_NULL}')",
+            f"INSERT INTO {key} ({cols}) SELECT DISTINCT ON ({pk}) {cols} FROM {stage} ORDER BY {', '.join(order)};",
+            f"DROP TABLE {stage};",
+        ])
+
+    def close(self) -> None:
+        if not self._files:
+            return
+        for fh in self._files.values():
+            fh.close()
+
+        # Mantém os blocos de tabelas gravadas por execuções anteriores
+        script = self.out_dir / "copy.sql"
+        blocks: Dict[str, str] = {}
+        if script.exists():
+            for block in script.read_text(encoding="utf-8").strip().split("\n\n"):
+                if block.startswith("-- "):
+                    blocks[block.splitlines()[0][3:]] = block
+        for key, columns in self._columns.items():
+            blocks[key] = self.copy_block(key, self._models[key], columns)
+        script.write_text("\n\n".join(blocks.values()) + "\n", encoding="utf-8")
+        self._files.clear()
+        self._writers.clear()
+
+
+class ParquetSink(Sink):
+    """
+    Writes one `<table>.parquet` per model into `out_dir` (requires pyarrow),
+    one row group per chunk.
+
+    Repeated ids are collapsed only within a chunk; readers that need one row
+    per key take the newest dh_operacao (or the last row) per primary key.
+    """
+
+    name = "parquet"
+
+    def __init__(self, out_dir: str | Path) -> None:
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("The parquet sink requires pyarrow: pip install pyarrow") from e
+
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._writers: Dict[str, Any] = {}
+        self._schemas: Dict[str, Any] = {}
+
+    @staticmethod
+    def _arrow_type(column):
+        import pyarrow as pa
+        from sqlalchemy import BigInteger, Boolean, DateTime, Integer, Numeric
+
+        if isinstance(column.type, BigInteger):
+            return pa.int64()
+        if isinstance(column.type, Integer):
+            return pa.int32()
+        if isinstance(column.type, Numeric):
+            # Valor exato, como no numeric(p, s) do PostgreSQL
+            if column.type.precision is not None:
+                return pa.decimal128(column.type.precision, column.type.scale or 0)
+            return pa.float64()
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    @staticmethod
+    def _arrow_value(value: Any, type_) -> Any:
+        import pyarrow as pa
+
+        # Converte para o tipo da coluna, como o PostgreSQL faria na gravação
+        if value is None:
+            return None
+        if pa.types.is_decimal(type_):
+            # decimal128 só aceita Decimal/int na escala da coluna (arredondada
+            # como no numeric(p, s))
+            return Decimal(str(value)).quantize(Decimal(1).scaleb(-type_.scale), rounding=ROUND_HALF_UP)
+        if pa.types.is_timestamp(type_):
+            if isinstance(value, datetime):
+                return value
+            if isinstance(value, date):
+                return datetime.combine(value, datetime.min.time())
+            return datetime.fromisoformat(str(value))
+        if pa.types.is_integer(type_):
+            return int(value)
+        if pa.types.is_floating(type_):
+            return float(value)
+        if pa.types.is_boolean(type_):
+            return bool(value)
+        if pa.types.is_string(type_):
+            return str(value)
+        return value
+
+    def _writer(self, model, first_row: Row):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        key = _qualified_name(model)
+        if key not in self._writers:
+            columns = model.__table__.columns
+            schema = pa.schema(
+                [pa.field(c.name, self._arrow_type(c), nullable=True) for c in columns if c.name in first_row]
+            )
+            self._schemas[key] = schema
+            self._writers[key] = pq.ParquetWriter(str(self.out_dir / f"{model.__tablename__}.parquet"), schema)
+        return self._writers[key], self._schemas[key]
+
+    def write(self, model, rows: List[Row]) -> int:
+        import pyarrow as pa
+
+        if not rows:
+            return 0
+        writer, schema = self._writer(model, rows[0])
+        arrays = [
+            pa.array([self._arrow_value(row.get(f.name), f.type) for row in rows], type=f.type) for f in schema
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return len(rows)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def make_sink(kind: str, out_dir: Optional[str | Path] = None) -> Optional[Sink]:
+    """
+    Build a loader-independent sink by name.
+
+    Returns None for "postgres": that sink needs the loader's upsert and is
+    created by each loader (see resolve_sink).
+    """
+    if kind == "postgres":
+        return None
+    if kind == "null":
+        return NullSink()
+    if kind == "csv":
+        return CsvSink(out_dir or "output")
+    if kind == "parquet":
+        return ParquetSink(out_dir or "output")
+    raise ValueError(f"Unknown sink: {kind} (expected one of {', '.join(SINK_KINDS)})")
+
+
+def resolve_sink(sink: Optional[Sink], upsert: Upsert, per_row: bool = False) -> Sink:
+    """Return `sink`, or the loader's PostgresSink when no sink was given."""
+    if sink is not None:
+        return sink
+    return PostgresSink(upsert, per_row=per_row)
@@ -0,0 +1,115 @@
+# app/upsert.py
+"""
+Parameterised upsert statements, built once per entity.
+
+`insert(Model).values(**data).on_conflict_do_update(set_=data)` embeds the row
+in the construct, so SQLAlchemy compiles a new statement for every row. Here the
+statement only references the columns (`set_` points at `excluded`), is cached
+per (table, columns, conflict key) and is executed with bound parameter lists:
+SQLAlchemy compiles it once and psycopg can keep it server-side prepared
+(see `prepare_threshold` in app.database.make_engine).
+
+By default the last row loaded wins, as with any upsert. With `keep_newest`
+(UPSERT_KEEP_NEWEST in the environment) entities versioned by dh_operacao only
+take a conflicting row that is not older than the stored one, the rule
+app.pipeline applies inside a chunk, so the newest version wins whatever the
+chunk boundaries or the load order.
+
+Statements return the conflict key of every row they write, so callers count
+written rows from the result instead of from what they sent.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import Insert, insert
+
+from .pipeline import VERSION_COLUMN
+
+Row = Dict[str, Any]
+
+
+@lru_cache(maxsize=None)
+def upsert_statement(
+    model,
+    columns: Tuple[str, ...],
+    conflict: Optional[Tuple[str, ...]] = None,
+    keep_newest: bool = False,
+) -> Insert:
+    """
+    `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` of `model` for rows with `columns`.
+
+    Args:
+        model: Mapped class (or Table) to upsert into
+        columns: Columns present in the rows, in row order
+        conflict: Conflict target columns (default: the primary key)
+        keep_newest: Skip conflicting rows older (by dh_operacao) than the stored one
+    """
+    table = getattr(model, "__table__", model)
+    keys = conflict or tuple(c.name for c in table.primary_key.columns)
+
+    stmt = insert(table)
+    returning = [table.c[k] for k in keys]
+    set_ = {name: stmt.excluded[name] for name in columns if name not in keys}
+    if not set_:
+        return stmt.on_conflict_do_nothing(index_elements=list(keys)).returning(*returning)
+    where = None
+    if keep_newest and VERSION_COLUMN in columns and VERSION_COLUMN in table.c:
+        # Como app.pipeline._supersedes: sem versão em um dos lados, vale a última
+        new, old = stmt.excluded[VERSION_COLUMN], table.c[VERSION_COLUMN]
+        where = or_(new.is_(None), old.is_(None), new >= old)
+    return stmt.on_conflict_do_update(index_elements=list(keys), set_=set_, where=where).returning(*returning)
+
+
+def group_rows(model, rows: Iterable[Row], conflict: Optional[Sequence[str]] = None) -> Dict[Tuple[str, ...], List[Row]]:
+    """
+    Group `rows` by their set of columns, each group sorted by the conflict key.
+
+    Concurrent upserts that lock the same keys in different orders can deadlock;
+    sorting every batch by key makes all writers take row locks in the same
+    order. The sort is stable, so repeated keys keep their input order.
+    """
+    table = getattr(model, "__table__", model)
+    keys = tuple(conflict) if conflict else tuple(c.name for c in table.primary_key.columns)
+
+    groups: Dict[Tuple[str, ...], List[Row]] = {}
+    for row in rows:
+        if row:
+            groups.setdefault(tuple(row), []).append(row)
+    for group in groups.values():
+        group.sort(key=lambda row: tuple((row.get(k) is None, row.get(k)) for k in keys))
+    return groups
+
+
+def upsert_rows(
+    conn,
+    model,
+    rows: Iterable[Row],
+    conflict: Optional[Sequence[str]] = None,
+    keep_newest: Optional[bool] = None,
+) -> int:
+    """
+    Upsert `rows` through `conn` (Session or Connection) with cached statements.
+
+    Rows are grouped by their set of columns and every group goes out, sorted by
+    key, as a single executemany. Only the columns present in a row are updated
+    on conflict, as with `set_=data`. Returns how many rows were written: rows
+    skipped on conflict (older versions with `keep_newest`, or existing keys
+    when there is nothing to update) are not counted.
+
+    `keep_newest` defaults to the UPSERT_KEEP_NEWEST setting.
+    """
+    if keep_newest is None:
+        from .database import get_settings
+
+        keep_newest = get_settings().keep_newest
+    groups = group_rows(model, rows, conflict)
+    target = tuple(conflict) if conflict else None
+    written = 0
+    for columns, group in groups.items():
+        result = conn.execute(upsert_statement(model, columns, target, keep_newest), group)
+        written += len(result.all())
+    return written
@@ -0,0 +1,168 @@
+# app/validation.py
+"""
+Client-side precheck of rows against the constraints declared in app.models.
+
+Rows that would break a column constraint (a string longer than its String(n),
+NULL in a NOT NULL column, a number that does not fit its Numeric(p, s) or
+integer type) or that take a unique key already used by another row of the
+same chunk fail on the server. That costs a round trip and a rollback, and in
+a batched loader it loses the whole chunk. The validator compiled here from the
+model metadata finds those rows in memory so that they can be rejected before
+the chunk is written.
+
+Only what can be decided from the row alone (or its chunk) is checked: foreign
+keys and unique keys already present in the table still fail on the server.
+"""
+
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Integer, Numeric, SmallInteger, String, UniqueConstraint
+
+Row = Dict[str, Any]
+Check = Callable[[Any], Optional[str]]
+
+_INTEGER_RANGES = (
+    (BigInteger, 2**63),
+    (SmallInteger, 2**15),
+    (Integer, 2**31),
+)
+
+
+def _length_check(length: int) -> Check:
+    def check(value: Any) -> Optional[str]:
+        # O PostgreSQL trunca sem erro quando o excesso é só de espaços
+        text = value if isinstance(value, str) else str(value)
+        if len(text) > length and len(text.rstrip(" ")) > length:
+            return f"longer than {length} characters ({len(text)})"
+        return None
+
+    return check
+
+
+def _integer_check(limit: int) -> Check:
+    def check(value: Any) -> Optional[str]:
+        if isinstance(value, bool):
+            return None
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            return f"not an integer ({value!r})"
+        if not -limit <= number < limit:
+            return f"out of integer range ({number})"
+        return None
+
+    return check
+
+
+def _numeric_check(precision: int, scale: int) -> Check:
+    limit = Decimal(10) ** (precision - scale)
+    quantum = Decimal(1).scaleb(-scale)
+
+    def check(value: Any) -> Optional[str]:
+        try:
+            number = Decimal(str(value))
+        except (InvalidOperation, ValueError):
+            return f"not a number ({value!r})"
+        if not number.is_finite():
+            return None
+        # Mesma ordem do servidor: arredonda na escala e depois confere a precisão
+        if abs(number.quantize(quantum, rounding=ROUND_HALF_UP)) >= limit:
+            return f"does not fit numeric({precision}, {scale}) ({value})"
+        return None
+
+    return check
+
+
+def _column_check(column) -> Optional[Check]:
+    type_ = column.type
+    if isinstance(type_, String) and type_.length:
+        return _length_check(type_.length)
+    if isinstance(type_, Numeric) and type_.precision is not None:
+        return _numeric_check(type_.precision, type_.scale or 0)
+    for integer_type, limit in _INTEGER_RANGES:
+        if isinstance(type_, integer_type):
+            return _integer_check(limit)
+    return None
+
+
+class RowValidator:
+    """Constraint checks of one model, compiled once (see compile_validator)."""
+
+    def __init__(self, model) -> None:
+        table = getattr(model, "__table__", model)
+        self.table = table.name
+        self.key = tuple(c.name for c in table.primary_key.columns)
+        # NOT NULL sem default: a coluna também não pode faltar no INSERT
+        self.not_null = tuple(c.name for c in table.columns if not c.nullable)
+        self.required = tuple(
+            c.name for c in table.columns
+            if not c.nullable and c.default is None and c.server_default is None
+        )
+        self.checks: Tuple[Tuple[str, Check], ...] = tuple(
+            (c.name, check) for c in table.columns if (check := _column_check(c)) is not None
+        )
+        self.unique: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (constraint.name, tuple(c.name for c in constraint.columns))
+            for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint)
+        )
+
+    def check(self, row: Row) -> Optional[str]:
+        """Reason why `row` would be refused by the server, or None."""
+        for name in self.required:
+            if name not in row:
+                return f"{name} is missing"
+        for name in self.not_null:
+            if name in row and row[name] is None:
+                return f"{name} is NULL"
+        for name, check in self.checks:
+            value = row.get(name)
+            if value is not None:
+                problem = check(value)
+                if problem:
+                    return f"{name} {problem}"
+        return None
+
+    def reject(self, rows: Sequence[Row]) -> Dict[int, str]:
+        """
+        Positions of the rows of a chunk that must not be written, with the reason.
+
+        Besides the per-row checks, a row is rejected when one of its unique keys
+        was already taken in the chunk by a row with a different primary key.
+        """
+        rejected: Dict[int, str] = {}
+        owners: Dict[Tuple[str, Tuple[Any, ...]], Tuple[Any, ...]] = {}
+        for i, row in enumerate(rows):
+            problem = self.check(row)
+            if problem:
+                rejected[i] = problem
+                continue
+            pk = tuple(row.get(k) for k in self.key)
+            for name, columns in self.unique:
+                values = tuple(row.get(c) for c in columns)
+                # NULL nunca colide numa constraint UNIQUE
+                if any(v is None for v in values):
+                    continue
+                owner = owners.setdefault((name, values), pk)
+                if owner != pk:
+                    rejected[i] = f"{name} {values} already used by id {owner[0] if len(owner) == 1 else owner}"
+                    break
+        return rejected
+
+
+@lru_cache(maxsize=None)
+def compile_validator(model) -> RowValidator:
+    """RowValidator of `model`, built once per model."""
+    return RowValidator(model)
+
+
+def split_valid(model, rows: List[Row]) -> Tuple[List[Row], Dict[int, str]]:
+    """(rows that pass the precheck, {position: reason} of the rejected ones)."""
+    rejected = compile_validator(model).reject(rows)
+    if not rejected:
+        return rows, rejected
+    return [row for i, row in enumerate(rows) if i not in rejected], rejected
@@ -0,0 +1,484 @@
+# -*- coding: utf-8 -*-
+"""
+worker.py — Fila de cargas distribuída entre várias máquinas (SKIP LOCKED)
+
+As tarefas ficam numa tabela de controle (load_task) no próprio PostgreSQL:
+cada uma é um arquivo (ou um intervalo de bytes de um .ndjson) de uma
+entidade. Com --split, cada .json é lido uma vez no enfileiramento e gravado
+em partes .ndjson de N registros (em <nome>.split/, ao lado do arquivo ou em
+--split-dir), uma tarefa por parte. Os workers pegam tarefas com
+SELECT ... FOR UPDATE SKIP LOCKED, rodam o loader da entidade, mandam
+heartbeat enquanto trabalham e devolvem à fila as tarefas de workers que
+pararam de responder. Uma tarefa só é liberada quando não há tarefas
+pendentes das entidades de que ela depende (FKs dos modelos) no mesmo lote.
+Quando não há tarefa liberada (fim do lote, ou à espera das dependências) e
+ao encerrar, o worker roda ANALYZE (ou VACUUM (ANALYZE)) nas tabelas que
+gravou, por app.maintenance.
+
+Os caminhos dos arquivos precisam ser os mesmos em todos os workers
+(ex.: um diretório compartilhado).
+
+Uso:
+    # enfileira (diretórios são expandidos; .json divididos em partes de 5000 registros)
+    python3 -m app.worker enqueue /dados/export/ --split 5000 --batch recarga-2026-10
+    python3 -m app.worker enqueue /dados/export/ --split 5000 --split-dir /compartilhado/partes
+
+    # um ou mais workers, em uma ou mais máquinas
+    python3 -m app.worker run --exit-when-idle
+
+    # acompanhamento
+    python3 -m app.worker status
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg
+from psycopg import sql
+
+from . import registry
+from .chunking import DEFAULT_CHUNK_SIZE, ChunkSize, parse_chunk_size
+from .database import connect, peek, read_export, target_schema
+from .maintenance import DEFAULT_VACUUM_THRESHOLD
+from .utils import fix_encoding_in_dict
+
+LOG = logging.getLogger("app.worker")
+
+TASK_TABLE = "load_task"
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id            BIGSERIAL PRIMARY KEY,
+    batch         TEXT        NOT NULL,
+    entity        TEXT        NOT NULL,
+    depends_on    TEXT[]      NOT NULL DEFAULT '{{}}',
+    path          TEXT        NOT NULL,
+    range_kind    TEXT        NOT NULL DEFAULT 'records',  -- records | bytes
+    range_start   BIGINT,
+    range_stop    BIGINT,
+    status        TEXT        NOT NULL DEFAULT 'pending',  -- pending | running | done | failed
+    attempts      INTEGER     NOT NULL DEFAULT 0,
+    worker        TEXT,
+    heartbeat_at  TIMESTAMPTZ,
+    started_at    TIMESTAMPTZ,
+    finished_at   TIMESTAMPTZ,
+    ok            INTEGER,
+    skipped       INTEGER,
+    error         TEXT,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS {index} ON {table} (batch, status);
+"""
+
+
+@dataclass
+class Task:
+    id: int
+    batch: str
+    entity: str
+    path: str
+    range_kind: str
+    range_start: Optional[int]
+    range_stop: Optional[int]
+    attempts: int
+
+
+# ==============================
+# Tabela de controle
+# ==============================
+def _table() -> sql.Composed:
+    return sql.SQL("{}.{}").format(sql.Identifier(target_schema()), sql.Identifier(TASK_TABLE))
+
+
+def ensure_task_table(conn: psycopg.Connection) -> None:
+    """Cria a tabela de controle, se não existir. Idempotente."""
+    conn.execute(
+        sql.SQL(_DDL).format(
+            table=_table(), index=sql.Identifier(f"idx_{TASK_TABLE}_batch_status")
+        )
+    )
+
+
+def entity_dependencies() -> Dict[str, List[str]]:
+    """Para cada loader, as entidades (com loader) referenciadas pelas FKs do seu modelo."""
+    by_table = {spec.model_class().__table__.name: spec.name for spec in registry.LOADERS.values()}
+    deps: Dict[str, List[str]] = {}
+    for spec in registry.LOADERS.values():
+        table = spec.model_class().__table__
+        parents = {by_table.get(fk.column.table.name) for fk in table.foreign_keys}
+        deps[spec.name] = sorted(p for p in parents if p and p != spec.name)
+    return deps
+
+
+# ==============================
+# Enfileiramento
+# ==============================
+def _split_json(records: Iterator[Dict[str, Any]], split: int, out_dir: Path) -> List[Path]:
+    """Grava `records` em partes .ndjson de até `split` registros, na ordem; retorna os caminhos."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("part-*.ndjson"):
+        old.unlink()
+    parts: List[Path] = []
+    fh = None
+    try:
+        for i, rec in enumerate(records):
+            if i % split == 0:
+                if fh:
+                    fh.close()
+                parts.append(out_dir / f"part-{len(parts):05d}.ndjson")
+                fh = parts[-1].open("w", encoding="utf-8")
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    finally:
+        if fh:
+            fh.close()
+    return parts
+
+
+def _expand(paths: List[str]) -> Iterator[Path]:
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from sorted(x for x in p.rglob("*") if x.suffix in (".json", ".ndjson"))
+        else:
+            yield p
+
+
+def plan_tasks(
+    paths: List[str], split: int = 0, split_bytes: int = 0, split_dir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Tarefas (ainda não gravadas) para os arquivos informados. Com `split`, os
+    .json são divididos aqui mesmo em partes .ndjson (ver _split_json).
+    """
+    tasks: List[Dict[str, Any]] = []
+    for path in _expand(paths):
+        first, records = peek(read_export(path))
+        spec = registry.detect(first) if first else None
+        if spec is None:
+            LOG.warning("Ignorando %s: entidade não reconhecida.", path)
+            continue
+
+        ranges: List[Tuple[Path, str, Optional[int], Optional[int]]] = [(path, "records", None, None)]
+        if path.suffix == ".ndjson" and split_bytes:
+            size = path.stat().st_size
+            ranges = [(path, "bytes", s, min(s + split_bytes, size)) for s in range(0, size, split_bytes)]
+        elif path.suffix == ".json" and split:
+            out_dir = Path(split_dir) if split_dir else path.parent
+            parts = _split_json(records, split, out_dir / f"{path.stem}.split")
+            LOG.info("%s dividido em %d parte(s) em %s.", path, len(parts), out_dir / f"{path.stem}.split")
+            ranges = [(part, "records", None, None) for part in parts]
+
+        for file, kind, start, stop in ranges:
+            tasks.append(
+                {"entity": spec.name, "path": str(file.resolve()), "range_kind": kind,
+                 "range_start": start, "range_stop": stop}
+            )
+    return tasks
+
+
+def enqueue(conn: psycopg.Connection, batch: str, tasks: List[Dict[str, Any]]) -> int:
+    deps = entity_dependencies()
+    with conn.transaction(), conn.cursor() as cur:
+        cur.executemany(
+            sql.SQL(
+                "INSERT INTO {} (batch, entity, depends_on, path, range_kind, range_start, range_stop) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+            ).format(_table()),
+            [
+                (batch, t["entity"], deps.get(t["entity"], []), t["path"], t["range_kind"],
+                 t["range_start"], t["range_stop"])
+                for t in tasks
+            ],
+        )
+    return len(tasks)
+
+
+# ==============================
+# Claim, heartbeat e requeue
+# ==============================
+def claim(conn: psycopg.Connection, worker: str, batch: Optional[str] = None) -> Optional[Task]:
+    """
+    Pega a próxima tarefa liberada, sem esperar por tarefas travadas por outros
+    workers. Liberada = nenhuma tarefa pendente ou em execução, no mesmo lote,
+    de uma entidade de que ela depende.
+    """
+    row = conn.execute(
+        sql.SQL(
+            """
+            UPDATE {t} AS t
+               SET status = 'running', worker = %(worker)s, attempts = t.attempts + 1,
+                   started_at = now(), heartbeat_at = now(), error = NULL
+             WHERE t.id = (
+                   SELECT c.id FROM {t} AS c
+                    WHERE c.status = 'pending'
+                      AND (%(batch)s::text IS NULL OR c.batch = %(batch)s)
+                      AND NOT EXISTS (
+                          SELECT 1 FROM {t} AS p
+                           WHERE p.batch = c.batch
+                             AND p.status IN ('pending', 'running')
+                             AND p.entity = ANY (c.depends_on))
+                    ORDER BY c.id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED)
+            RETURNING t.id, t.batch, t.entity, t.path, t.range_kind, t.range_start,
+                      t.range_stop, t.attempts
+            """
+        ).format(t=_table()),
+        {"worker": worker, "batch": batch},
+    ).fetchone()
+    return Task(*row) if row else None
+
+
+def requeue_stalled(conn: psycopg.Connection, stale_after: float, max_attempts: int) -> int:
+    """Devolve à fila (ou marca como failed) tarefas sem heartbeat há `stale_after` segundos."""
+    cur = conn.execute(
+        sql.SQL(
+            """
+            UPDATE {t}
+               SET status = CASE WHEN attempts >= %(max)s THEN 'failed' ELSE 'pending' END,
+                   worker = NULL,
+                   error = 'heartbeat perdido (worker ' || coalesce(worker, '?') || ')'
+             WHERE status = 'running'
+               AND heartbeat_at < now() - make_interval(secs => %(stale)s)
+            """
+        ).format(t=_table()),
+        {"stale": stale_after, "max": max_attempts},
+    )
+    return cur.rowcount
+
+
+def finish(conn: psycopg.Connection, task: Task, ok: int, skipped: int) -> None:
+    conn.execute(
+        sql.SQL(
+            "UPDATE {} SET status = 'done', finished_at = now(), ok = %s, skipped = %s "
+            "WHERE id = %s AND worker IS NOT DISTINCT FROM %s"
+        ).format(_table()),
+        (ok, skipped, task.id, _worker_id()),
+    )
+
+
+def fail(conn: psycopg.Connection, task: Task, error: str, max_attempts: int) -> None:
+    status = "failed" if task.attempts >= max_attempts else "pending"
+    conn.execute(
+        sql.SQL(
+            "UPDATE {} SET status = %s, worker = NULL, finished_at = now(), error = %s "
+            "WHERE id = %s AND worker IS NOT DISTINCT FROM %s"
+        ).format(_table()),
+        (status, error[:2000], task.id, _worker_id()),
+    )
+
+
+class _Heartbeat(threading.Thread):
+    """Atualiza heartbeat_at da tarefa numa conexão própria até ser parado."""
+
+    def __init__(self, task_id: int, interval: float) -> None:
+        super().__init__(daemon=True, name=f"heartbeat-{task_id}")
+        self.task_id = task_id
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        with connect() as conn:
+            while not self._stop_event.wait(self.interval):
+                try:
+                    conn.execute(
+                        sql.SQL("UPDATE {} SET heartbeat_at = now() WHERE id = %s").format(_table()),
+                        (self.task_id,),
+                    )
+                except Exception as exc:
+                    LOG.warning("Falha no heartbeat da tarefa %d: %s", self.task_id, exc)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+# ==============================
+# Execução de uma tarefa
+# ==============================
+def _ndjson_range(path: Path, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+    """Linhas que começam em [start, stop); a linha cortada no início é da tarefa anterior."""
+    with path.open("rb") as fh:
+        if start:
+            fh.seek(start - 1)
+            fh.readline()
+        while fh.tell() < stop:
+            line = fh.readline()
+            if not line:
+                break
+            if line.strip():
+                yield fix_encoding_in_dict(json.loads(line))
+
+
+def task_records(task: Task) -> Iterator[Dict[str, Any]]:
+    path = Path(task.path)
+    if task.range_kind == "bytes":
+        return _ndjson_range(path, task.range_start or 0, task.range_stop or path.stat().st_size)
+    # Arquivo inteiro: um .json não dividido ou uma parte .ndjson gerada no enqueue
+    return read_export(path, fix_encoding=True)
+
+
+def run_task(task: Task, chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE) -> Tuple[int, int]:
+    spec = registry.get_loader(task.entity)
+    return spec.load_from_iterable(task_records(task), chunk_size=chunk_size)
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pending(conn: psycopg.Connection, batch: Optional[str]) -> int:
+    return conn.execute(
+        sql.SQL(
+            "SELECT count(*) FROM {} WHERE status IN ('pending', 'running') "
+            "AND (%(batch)s::text IS NULL OR batch = %(batch)s)"
+        ).format(_table()),
+        {"batch": batch},
+    ).fetchone()[0]
+
+
+def run_worker(
+    batch: Optional[str] = None,
+    poll: float = 2.0,
+    heartbeat: float = 10.0,
+    stale_after: float = 60.0,
+    max_attempts: int = 3,
+    exit_when_idle: bool = False,
+    chunk_size: ChunkSize = DEFAULT_CHUNK_SIZE,
+    maintenance: bool = True,
+    vacuum_threshold: float = DEFAULT_VACUUM_THRESHOLD,
+) -> int:
+    """Laço do worker. Retorna quantas tarefas este worker concluiu."""
+    from .database import release_pinned_connections
+    from .maintenance import maintain_tables, write_stats
+
+    def _maintain() -> None:
+        written = write_stats.drain()
+        if maintenance:
+            maintain_tables(written, vacuum_threshold, logger=LOG)
+
+    worker = _worker_id()
+    done = 0
+    with connect() as conn:
+        ensure_task_table(conn)
+        LOG.info("Worker %s aguardando tarefas (lote: %s).", worker, batch or "todos")
+        while True:
+            requeued = requeue_stalled(conn, stale_after, max_attempts)
+            if requeued:
+                LOG.warning("%d tarefa(s) sem heartbeat devolvida(s) à fila.", requeued)
+
+            task = claim(conn, worker, batch)
+            if task is None:
+                _maintain()
+                if exit_when_idle and _pending(conn, batch) == 0:
+                    break
+                time.sleep(poll)
+                continue
+
+            LOG.info(
+                "Tarefa %d: %s de %s [%s %s:%s] (tentativa %d)",
+                task.id, task.entity, task.path, task.range_kind,
+                task.range_start, task.range_stop, task.attempts,
+            )
+            beat = _Heartbeat(task.id, heartbeat)
+            beat.start()
+            try:
+                ok, skipped = run_task(task, chunk_size)
+                finish(conn, task, ok, skipped)
+                done += 1
+                LOG.info("Tarefa %d concluída: ok=%d, skipped=%d.", task.id, ok, skipped)
+            except Exception as exc:
+                LOG.exception("Tarefa %d falhou: %s", task.id, exc)
+                fail(conn, task, str(exc), max_attempts)
+            finally:
+                beat.stop()
+                release_pinned_connections()
+    _maintain()
+    LOG.info("Worker %s encerrado: %d tarefa(s) concluída(s).", worker, done)
+    return done
+
+
+def status(conn: psycopg.Connection, batch: Optional[str] = None) -> List[Tuple]:
+    return conn.execute(
+        sql.SQL(
+            "SELECT batch, entity, status, count(*), sum(ok), sum(skipped) FROM {} "
+            "WHERE (%(batch)s::text IS NULL OR batch = %(batch)s) "
+            "GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        ).format(_table()),
+        {"batch": batch},
+    ).fetchall()
+
+
+# ==============================
+# CLI
+# ==============================
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="app.worker", description="Fila de cargas distribuída (SKIP LOCKED).")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    e = sub.add_parser("enqueue", help="Enfileira arquivos (ou diretórios) de export")
+    e.add_argument("paths", nargs="+")
+    e.add_argument("--batch", default=None, help="Nome do lote (default: data/hora atual)")
+    e.add_argument("--split", type=int, default=0, help="Registros por tarefa em arquivos .json, gravados em partes .ndjson (0 = arquivo inteiro)")
+    e.add_argument("--split-dir", default=None, help="Diretório compartilhado para as partes dos .json divididos (default: ao lado de cada arquivo)")
+    e.add_argument("--split-bytes", type=int, default=0, help="Bytes por tarefa em arquivos .ndjson (0 = arquivo inteiro)")
+
+    r = sub.add_parser("run", help="Executa tarefas até ser interrompido")
+    r.add_argument("--batch", default=None, help="Só pega tarefas deste lote")
+    r.add_argument("--poll", type=float, default=2.0, help="Espera entre buscas sem tarefa, em segundos")
+    r.add_argument("--heartbeat", type=float, default=10.0, help="Intervalo do heartbeat, em segundos")
+    r.add_argument("--stale-after", type=float, default=60.0, help="Segundos sem heartbeat até a tarefa voltar à fila")
+    r.add_argument("--max-attempts", type=int, default=3)
+    r.add_argument("--exit-when-idle", action="store_true", help="Encerra quando não houver tarefas pendentes")
+    r.add_argument("--chunk-size", type=parse_chunk_size, default=DEFAULT_CHUNK_SIZE, help="Registros por lote ou 'auto'")
+    r.add_argument(
+        "--vacuum-threshold", type=float, default=DEFAULT_VACUUM_THRESHOLD,
+        help="Tuplas mortas, como fração das vivas, a partir da qual o ANALYZE vira VACUUM (ANALYZE) (default: %(default)s)",
+    )
+    r.add_argument("--no-maintenance", action="store_true", help="Não roda ANALYZE/VACUUM nas tabelas gravadas")
+
+    s = sub.add_parser("status", help="Resumo das tarefas por lote, entidade e status")
+    s.add_argument("--batch", default=None)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    if args.command == "run":
+        run_worker(
+            batch=args.batch, poll=args.poll, heartbeat=args.heartbeat,
+            stale_after=args.stale_after, max_attempts=args.max_attempts,
+            exit_when_idle=args.exit_when_idle, chunk_size=args.chunk_size,
+            maintenance=not args.no_maintenance, vacuum_threshold=args.vacuum_threshold,
+        )
+        return
+
+    with connect() as conn:
+        ensure_task_table(conn)
+        if args.command == "enqueue":
+            batch = args.batch or datetime.now().strftime("%Y%m%d_%H%M%S")
+            n = enqueue(conn, batch, plan_tasks(args.paths, args.split, args.split_bytes, args.split_dir))
+            LOG.info("%d tarefa(s) enfileirada(s) no lote %s.", n, batch)
+        elif args.command == "status":
+            for batch, entity, st, count, ok, skipped in status(conn, args.batch):
+                print(f"{batch:20} {entity:12} {st:8} {count:6} ok={ok or 0} skipped={skipped or 0}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
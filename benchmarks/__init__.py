@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Performance tooling for the loaders: synthetic fixtures and benchmark harness."""
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador de fixtures sintéticas a partir de data/*.json.
+
+Aprende o formato dos registros de cada export (campos, valores observados e
+taxa de nulos por campo) e gera exports referencialmente consistentes de
+qualquer tamanho, em JSON paginado (mesmo formato da API) e/ou NDJSON.
+A geração é feita em streaming: nenhum arquivo é montado em memória.
+
+Uso:
+    python -m benchmarks.generate_fixtures --imoveis 10000 --out build/fixtures
+    python -m benchmarks.generate_fixtures --imoveis 1000000 --format ndjson
+    python -m benchmarks.generate_fixtures --imoveis 10000 --count pessoas=500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+
+# Entidades na ordem de dependência (pais antes dos filhos)
+ENTITIES = [
+    "bairros",
+    "condominios",
+    "distritos",
+    "logradouros",
+    "loteamentos",
+    "secoes",
+    "pessoas",
+    "planta-valores",
+    "imoveis",
+]
+
+# Quantidade de registros de cada entidade para cada imóvel gerado
+DEFAULT_RATIOS = {
+    "bairros": 0.002,
+    "condominios": 0.001,
+    "distritos": 0.0005,
+    "logradouros": 0.02,
+    "loteamentos": 0.001,
+    "secoes": 0.02,
+    "pessoas": 1.0,
+    "planta-valores": 0.01,
+    "imoveis": 1.0,
+}
+
+# Registros-modelo das entidades cujo export de exemplo em data/ vem vazio
+# (data/planta-valores.json). Trazem só os campos que o loader lê, mais o
+# campo "planta*" pelo qual app.registry.detect reconhece a entidade.
+FALLBACK_SAMPLES: Dict[str, List[Dict[str, Any]]] = {
+    "planta-valores": [
+        {"id": 1, "planta": {"id": 1, "descricao": "PLANTA GENÉRICA DE VALORES"}, "valor": 125.5,
+         "dataReferencia": "2024-01-01T00:00:00"},
+        {"id": 2, "planta": {"id": 1, "descricao": "PLANTA GENÉRICA DE VALORES"}, "valor": 310.0,
+         "dataReferencia": "2024-01-01T00:00:00"},
+        {"id": 3, "planta": {"id": 2, "descricao": "PLANTA GENÉRICA DE VALORES - RURAL"}, "valor": 18.75,
+         "dataReferencia": "2025-01-01T00:00:00"},
+    ],
+}
+
+# Taxa de mojibake usada quando os exports de exemplo não têm nenhum caso
+DEFAULT_MOJIBAKE_RATE = 0.02
+
+
+def _is_mojibake(text: str) -> bool:
+    """True when the text looks like UTF-8 bytes decoded as Latin-1."""
+    if "Ã" not in text and "Â" not in text:
+        return False
+    try:
+        return text.encode("latin-1").decode("utf-8") != text
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return False
+
+
+def _iter_strings(value: Any) -> Iterator[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_strings(item)
+
+
+@dataclass
+class RecordShape:
+    """Observed shape of one export: per-field value pools and string stats."""
+
+    name: str
+    columns: Dict[str, List[Any]] = field(default_factory=dict)
+    mojibake_rate: float = 0.0
+
+    @classmethod
+    def learn(cls, name: str, records: List[Dict[str, Any]]) -> "RecordShape":
+        columns: Dict[str, List[Any]] = {}
+        for rec in records:
+            for key in rec:
+                columns.setdefault(key, [])
+        for rec in records:
+            for key, pool in columns.items():
+                pool.append(rec.get(key))
+
+        strings = [s for rec in records for s in _iter_strings(rec)]
+        broken = sum(1 for s in strings if _is_mojibake(s))
+        rate = broken / len(strings) if strings else 0.0
+        return cls(name=name, columns=columns, mojibake_rate=rate)
+
+    def sample(self, rng: random.Random) -> Dict[str, Any]:
+        """
+        Build a record sampling each field independently from its pool, which
+        reproduces the per-field null rate observed in the export.
+        """
+        return {key: _copy(rng.choice(pool)) for key, pool in self.columns.items()}
+
+
+def _copy(value: Any) -> Any:
+    # Os valores são JSON puro; uma cópia rasa por nível é suficiente
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def load_shapes(data_dir: Path = DATA_DIR) -> Dict[str, RecordShape]:
+    """
+    Learn the record shape of every export available in `data_dir`, falling
+    back to FALLBACK_SAMPLES when an export is missing or empty.
+    """
+    shapes: Dict[str, RecordShape] = {}
+    for name in ENTITIES:
+        path = data_dir / f"{name}.json"
+        records: List[Dict[str, Any]] = []
+        if path.exists():
+            records = json.loads(path.read_text(encoding="utf-8")).get("content") or []
+        records = records or FALLBACK_SAMPLES.get(name, [])
+        if records:
+            shapes[name] = RecordShape.learn(name, records)
+    return shapes
+
+
+# ==============================
+# Reescrita de identidade e FKs
+# ==============================
+class _Context:
+    """Counts and knobs shared by the per-entity rewrite functions."""
+
+    def __init__(self, counts: Dict[str, int], rng: random.Random, orphan_rate: float, unit_rate: float):
+        self.counts = counts
+        self.rng = rng
+        self.orphan_rate = orphan_rate
+        self.unit_rate = unit_rate
+
+    def ref_index(self, entity: str) -> Optional[int]:
+        """Random index of a generated parent, or an index past the end (orphan)."""
+        n = self.counts.get(entity, 0)
+        if n <= 0:
+            return None
+        if self.rng.random() < self.orphan_rate:
+            return n + self.rng.randrange(1, 1000)
+        return self.rng.randrange(n)
+
+
+def _entity_id(index: int) -> int:
+    return index + 1
+
+
+def _ref(obj: Any, ctx: _Context, entity: str) -> Any:
+    """Point a nested {id, codigo, ...} reference at a generated parent."""
+    if not isinstance(obj, dict):
+        return obj
+    idx = ctx.ref_index(entity)
+    if idx is None:
+        return None
+    obj["id"] = _entity_id(idx)
+    if "codigo" in obj:
+        obj["codigo"] = idx + 1
+    return obj
+
+
+def _rewrite_basic(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    rec["id"] = _entity_id(i)
+    if "codigo" in rec:
+        rec["codigo"] = i + 1
+
+
+def _rewrite_logradouro(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    _rewrite_basic(rec, i, ctx)
+    if rec.get("bairros"):
+        rec["bairros"] = [_ref(rec["bairros"][0], ctx, "bairros")]
+
+
+def _rewrite_loteamento(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    _rewrite_basic(rec, i, ctx)
+    rec["bairro"] = _ref(rec.get("bairro"), ctx, "bairros")
+
+
+def _rewrite_secao(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    rec["id"] = _entity_id(i)
+    # (nro_secao, logradouro_id) é único: distribui as seções pelos logradouros
+    n_logradouros = max(ctx.counts.get("logradouros", 0), 1)
+    logradouro = rec.get("logradouro") or {"id": None}
+    logradouro["id"] = _entity_id(i % n_logradouros)
+    if "codigo" in logradouro:
+        logradouro["codigo"] = i % n_logradouros + 1
+    rec["logradouro"] = logradouro
+    rec["nroSecao"] = i // n_logradouros + 1
+
+
+def _rewrite_pessoa(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    _rewrite_basic(rec, i, ctx)
+    if isinstance(rec.get("pessoaFisica"), dict):
+        rec["pessoaFisica"]["id"] = rec["id"]
+
+
+def _rewrite_imovel(rec: Dict[str, Any], i: int, ctx: _Context) -> None:
+    _rewrite_basic(rec, i, ctx)
+    n = ctx.counts["imoveis"]
+
+    if rec.get("idImovelEnglobado") is not None:
+        rec["idImovelEnglobado"] = rec["id"]
+
+    # Unidades apontam para um imóvel principal próximo, às vezes ainda não
+    # emitido, para exercitar a carga fora de ordem das auto-referências.
+    rec["idImovelPrincipal"] = None
+    if n > 1 and ctx.rng.random() < ctx.unit_rate:
+        j = i
+        while j == i:
+            j = ctx.rng.randrange(max(0, i - 1000), min(n, i + 1000))
+        rec["idImovelPrincipal"] = _entity_id(j)
+        rec["codigo"] = j + 1
+        rec["unidade"] = i + 2  # nunca colide com a unidade 0/1 do principal
+
+    rec["bairro"] = _ref(rec.get("bairro"), ctx, "bairros")
+    rec["distrito"] = _ref(rec.get("distrito"), ctx, "distritos")
+    rec["logradouro"] = _ref(rec.get("logradouro"), ctx, "logradouros")
+    rec["condominio"] = _ref(rec.get("condominio"), ctx, "condominios")
+    rec["loteamento"] = _ref(rec.get("loteamento"), ctx, "loteamentos")
+    rec["responsavel"] = _ref(rec.get("responsavel"), ctx, "pessoas")
+
+
+REWRITERS: Dict[str, Callable[[Dict[str, Any], int, _Context], None]] = {
+    "bairros": _rewrite_basic,
+    "condominios": _rewrite_basic,
+    "distritos": _rewrite_basic,
+    "logradouros": _rewrite_logradouro,
+    "loteamentos": _rewrite_loteamento,
+    "secoes": _rewrite_secao,
+    "pessoas": _rewrite_pessoa,
+    "planta-valores": _rewrite_basic,
+    "imoveis": _rewrite_imovel,
+}
+
+
+def _garble(value: Any, rate: float, rng: random.Random) -> Any:
+    """Double-encode non-ASCII strings (UTF-8 read as Latin-1) at `rate`."""
+    if isinstance(value, str):
+        if not value.isascii() and rng.random() < rate:
+            try:
+                return value.encode("utf-8").decode("latin-1")
+            except UnicodeDecodeError:
+                return value
+        return value
+    if isinstance(value, dict):
+        return {k: _garble(v, rate, rng) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_garble(v, rate, rng) for v in value]
+    return value
+
+
+# ==============================
+# Geração
+# ==============================
+@dataclass
+class GeneratorConfig:
+    counts: Dict[str, int]
+    seed: int = 42
+    mojibake_rate: Optional[float] = None
+    orphan_rate: float = 0.001
+    unit_rate: float = 0.05
+
+
+def counts_for(imoveis: int, overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Entity counts for a dataset with `imoveis` properties."""
+    counts = {}
+    for name, ratio in DEFAULT_RATIOS.items():
+        counts[name] = max(1, int(imoveis * ratio)) if ratio else 0
+    counts["imoveis"] = imoveis
+    counts.update(overrides or {})
+    return counts
+
+
+def iter_records(
+    name: str, shape: RecordShape, config: GeneratorConfig
+) -> Iterator[Dict[str, Any]]:
+    """Stream the synthetic records of one entity."""
+    rng = random.Random(f"{config.seed}:{name}")
+    ctx = _Context(config.counts, rng, config.orphan_rate, config.unit_rate)
+    rewrite = REWRITERS[name]
+    rate = config.mojibake_rate
+    if rate is None:
+        rate = shape.mojibake_rate or DEFAULT_MOJIBAKE_RATE
+
+    for i in range(config.counts.get(name, 0)):
+        rec = shape.sample(rng)
+        rewrite(rec, i, ctx)
+        yield _garble(rec, rate, rng)
+
+
+def _dumps(rec: Dict[str, Any]) -> str:
+    return json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_ndjson(path: Path, records: Iterator[Dict[str, Any]]) -> int:
+    written = 0
+    with path.open("w", encoding="utf-8") as fh:
+        for rec in records:
+            fh.write(_dumps(rec))
+            fh.write("\n")
+            written += 1
+    return written
+
+
+def write_pages(
+    directory: Path, name: str, total: int, records: Iterator[Dict[str, Any]], page_size: int
+) -> List[Path]:
+    """Write `records` as API-like pages: {offset, limit, total, hasNext, content}."""
+    directory.mkdir(parents=True, exist_ok=True)
+    pages: List[Path] = []
+    fh = None
+    in_page = 0
+    offset = 0
+
+    def _close_page() -> None:
+        fh.write("]}\n")
+        fh.close()
+
+    for rec in records:
+        if fh is None:
+            path = directory / f"{name}_{len(pages):05d}.json"
+            pages.append(path)
+            fh = path.open("w", encoding="utf-8")
+            has_next = offset + page_size < total
+            fh.write(
+                f'{{"offset":{offset},"limit":{page_size},"total":{total},'
+                f'"hasNext":{"true" if has_next else "false"},"content":['
+            )
+            in_page = 0
+        if in_page:
+            fh.write(",")
+        fh.write(_dumps(rec))
+        in_page += 1
+        if in_page >= page_size:
+            _close_page()
+            fh = None
+            offset += in_page
+
+    if fh is not None:
+        _close_page()
+    return pages
+
+
+def generate(
+    out_dir: Path,
+    config: GeneratorConfig,
+    formats: List[str],
+    page_size: int = 1000,
+    shapes: Optional[Dict[str, RecordShape]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Generate every entity into `out_dir`.
+
+    Returns a manifest {entity: {"count": n, "ndjson": path, "pages": [paths]}}.
+    """
+    shapes = shapes if shapes is not None else load_shapes()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest: Dict[str, Dict[str, Any]] = {}
+
+    for name in ENTITIES:
+        total = config.counts.get(name, 0)
+        shape = shapes.get(name)
+        if not total or shape is None:
+            continue
+
+        entry: Dict[str, Any] = {"count": total}
+        if "ndjson" in formats:
+            path = out_dir / f"{name}.ndjson"
+            write_ndjson(path, iter_records(name, shape, config))
+            entry["ndjson"] = str(path)
+        if "json" in formats:
+            pages = write_pages(out_dir / name, name, total, iter_records(name, shape, config), page_size)
+            entry["pages"] = [str(p) for p in pages]
+        manifest[name] = entry
+        print(f"  {name}: {total} registros")
+
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def _parse_count(value: str) -> tuple[str, int]:
+    name, _, n = value.partition("=")
+    if name not in ENTITIES or not n.isdigit():
+        raise argparse.ArgumentTypeError(f"esperado ENTIDADE=N com ENTIDADE em {ENTITIES}")
+    return name, int(n)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="benchmarks.generate_fixtures",
+        description="Gera exports sintéticos referencialmente consistentes a partir de data/*.json.",
+    )
+    p.add_argument("--imoveis", type=int, default=10_000, help="Quantidade de imóveis (default: 10000)")
+    p.add_argument(
+        "--count",
+        action="append",
+        type=_parse_count,
+        default=[],
+        metavar="ENTIDADE=N",
+        help="Sobrescreve a quantidade de uma entidade (ex.: pessoas=500)",
+    )
+    p.add_argument("--out", default="build/fixtures", help="Diretório de saída (default: build/fixtures)")
+    p.add_argument("--format", choices=["json", "ndjson", "both"], default="both")
+    p.add_argument("--page-size", type=int, default=1000, help="Registros por página JSON (default: 1000)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument(
+        "--mojibake-rate",
+        type=float,
+        default=None,
+        help="Fração de textos com acento gerados com dupla codificação "
+        f"(default: taxa observada em data/, ou {DEFAULT_MOJIBAKE_RATE})",
+    )
+    p.add_argument("--orphan-rate", type=float, default=0.001, help="Fração de FKs apontando para IDs inexistentes")
+    p.add_argument("--unit-rate", type=float, default=0.05, help="Fração de imóveis que são unidades de outro imóvel")
+    p.add_argument("--data-dir", default=str(DATA_DIR), help="Diretório com os exports de exemplo")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    shapes = load_shapes(Path(args.data_dir))
+    if not shapes:
+        print(f"Nenhum export de exemplo encontrado em {args.data_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    config = GeneratorConfig(
+        counts=counts_for(args.imoveis, dict(args.count)),
+        seed=args.seed,
+        mojibake_rate=args.mojibake_rate,
+        orphan_rate=args.orphan_rate,
+        unit_rate=args.unit_rate,
+    )
+    formats = ["json", "ndjson"] if args.format == "both" else [args.format]
+
+    print(f"Gerando fixtures em {args.out} (seed={args.seed})...")
+    generate(Path(args.out), config, formats, page_size=args.page_size, shapes=shapes)
+    print("Concluído.")
+
+
+if __name__ == "__main__":
+    main()
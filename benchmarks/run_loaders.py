@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos loaders (app/loader_*) contra um PostgreSQL local.
+
+Gera datasets sintéticos de tamanhos crescentes (benchmarks.generate_fixtures),
+executa o entry point de cada loader em um subprocesso isolado e registra
+registros/s, pico de memória e round trips ao banco. Os resultados são salvos
+em JSON e comparados com uma baseline: a execução falha (exit 1) quando algum
+loader perde mais throughput do que o limite configurado.
+
+Uso:
+    python -m benchmarks.run_loaders                      # usa benchmarks/config.json
+    python -m benchmarks.run_loaders --sizes 1000 10000 --loaders bairro imovel
+    python -m benchmarks.run_loaders --save-baseline      # grava a baseline atual
+    python -m benchmarks.run_loaders --reset              # TRUNCATE antes de cada tamanho
+    python -m benchmarks.run_loaders --sink null          # só parse/transformação
+
+ATENÇÃO: use uma database dedicada; --reset apaga os dados das tabelas.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing as mp
+import platform
+import queue as queue_mod
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.registry import LOADERS as REGISTRY
+from benchmarks.generate_fixtures import GeneratorConfig, counts_for, generate
+
+BENCH_DIR = Path(__file__).parent
+PROJECT_ROOT = BENCH_DIR.parent
+CONFIG_PATH = BENCH_DIR / "config.json"
+
+# (nome, módulo, função, export de entrada) na ordem de dependência das FKs
+LOADERS = [("municipio", "app.loader_municipio", "processar_cadastros_from_bairros", "bairros")] + [
+    (spec.name, spec.module, "processar_cadastros", spec.export) for spec in REGISTRY.values()
+]
+
+
+@dataclass
+class BenchResult:
+    loader: str
+    size: int
+    rows: int
+    seconds: float
+    rows_per_sec: float
+    peak_rss_mb: Optional[float]
+    statements: int
+    commits: int
+    rollbacks: int
+    checkouts: int
+    round_trips: int
+    error: Optional[str] = None
+
+
+# ==============================
+# Contagem de round trips
+# ==============================
+class RoundTripCounter:
+    """
+    Counts the database round trips issued through a SQLAlchemy engine.
+
+    Statements, COMMIT and ROLLBACK are counted through engine events. With
+    pool_pre_ping every pool checkout also costs a `SELECT 1`, so checkouts are
+    counted as round trips when the engine pings.
+    """
+
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.statements = self.commits = self.rollbacks = self.checkouts = 0
+        self._pings = bool(getattr(engine.pool, "_pre_ping", False))
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+        event.listen(engine, "rollback", self._on_rollback)
+        event.listen(engine.pool, "checkout", self._on_checkout)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.statements += 1
+
+    def _on_commit(self, *args) -> None:
+        self.commits += 1
+
+    def _on_rollback(self, *args) -> None:
+        self.rollbacks += 1
+
+    def _on_checkout(self, *args) -> None:
+        self.checkouts += 1
+
+    @property
+    def round_trips(self) -> int:
+        pings = self.checkouts if self._pings else 0
+        return self.statements + self.commits + self.rollbacks + pings
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KiB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _count_records(path: Path) -> int:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return len(data.get("content") or [])
+
+
+def _run_one(
+    loader: str, module: str, func: str, path: str, size: int, sink_kind: str, verbose: bool, queue
+) -> None:
+    """Child process: run one loader entry point and report its metrics."""
+    try:
+        from app.database import get_engine
+        from app.sinks import make_sink
+
+        counter = RoundTripCounter(get_engine())
+        sink = make_sink(sink_kind, Path(path).parent / f"sink_{sink_kind}")
+        entry = getattr(importlib.import_module(module), func)
+        rows = _count_records(Path(path))
+
+        out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with out:
+            if func == "processar_cadastros_from_bairros":
+                entry(path)
+            elif sink is not None:
+                entry(None, path, sink=sink)
+                sink.close()
+            else:
+                entry(None, path)
+        seconds = time.perf_counter() - start
+
+        queue.put(
+            asdict(
+                BenchResult(
+                    loader=loader,
+                    size=size,
+                    rows=rows,
+                    seconds=round(seconds, 4),
+                    rows_per_sec=round(rows / seconds, 2) if seconds > 0 else 0.0,
+                    peak_rss_mb=_peak_rss_mb(),
+                    statements=counter.statements,
+                    commits=counter.commits,
+                    rollbacks=counter.rollbacks,
+                    checkouts=counter.checkouts,
+                    round_trips=counter.round_trips,
+                )
+            )
+        )
+    except Exception as exc:
+        queue.put({"loader": loader, "size": size, "error": f"{type(exc).__name__}: {exc}"})
+
+
+def run_loader(
+    loader: str, module: str, func: str, path: Path, size: int, sink_kind: str = "postgres", verbose: bool = False
+) -> Dict[str, Any]:
+    """Run one loader in a fresh (spawned) interpreter, isolating memory and caches."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_run_one, args=(loader, module, func, str(path), size, sink_kind, verbose, queue)
+    )
+    proc.start()
+    proc.join()
+    try:
+        return queue.get(timeout=5)
+    except queue_mod.Empty:
+        return {"loader": loader, "size": size, "error": f"processo terminou com código {proc.exitcode}"}
+
+
+# ==============================
+# Datasets
+# ==============================
+def ensure_dataset(root: Path, size: int, seed: int) -> Dict[str, Any]:
+    """Generate (or reuse) the dataset for `size` imóveis as single-page JSON files."""
+    out_dir = root / str(size)
+    manifest_path = out_dir / "manifest.json"
+    counts = counts_for(size)
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if all(manifest.get(k, {}).get("count") == v for k, v in counts.items() if v):
+            return manifest
+
+    print(f"Gerando dataset com {size} imóveis em {out_dir}...")
+    config = GeneratorConfig(counts=counts, seed=seed)
+    page_size = max(counts.values())
+    return generate(out_dir, config, ["json"], page_size=page_size)
+
+
+def reset_tables() -> None:
+    """TRUNCATE every mapped table (dedicated benchmark database only)."""
+    from sqlalchemy import text
+
+    from app.database import get_engine
+    from app.models import Base
+
+    names = ", ".join(f"{t.schema}.{t.name}" for t in Base.metadata.sorted_tables)
+    with get_engine().begin() as conn:
+        conn.execute(text(f"TRUNCATE {names} CASCADE"))
+
+
+# ==============================
+# Resultados e baseline
+# ==============================
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """Return one message per (loader, size) whose throughput regressed beyond `threshold`."""
+    base = {(r["loader"], r["size"]): r for r in baseline if not r.get("error")}
+    regressions = []
+    for r in results:
+        ref = base.get((r["loader"], r["size"]))
+        if not ref or r.get("error") or not ref.get("rows_per_sec"):
+            continue
+        change = r["rows_per_sec"] / ref["rows_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(
+                f"{r['loader']}@{r['size']}: {r['rows_per_sec']:.1f} rows/s "
+                f"vs baseline {ref['rows_per_sec']:.1f} ({change:+.1%}, limite -{threshold:.0%})"
+            )
+    return regressions
+
+
+def _load_config(path: Path) -> Dict[str, Any]:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="benchmarks.run_loaders", description="Benchmark dos loaders.")
+    p.add_argument("--config", default=str(CONFIG_PATH), help="Arquivo de configuração JSON")
+    p.add_argument("--sizes", type=int, nargs="+", help="Quantidades de imóveis por dataset")
+    p.add_argument("--loaders", nargs="+", help="Restringe aos loaders informados (ex.: bairro imovel)")
+    p.add_argument("--threshold", type=float, help="Perda máxima de throughput aceita (ex.: 0.15)")
+    p.add_argument("--baseline", help="Arquivo de baseline")
+    p.add_argument("--save-baseline", action="store_true", help="Grava os resultados como nova baseline")
+    p.add_argument("--reset", action="store_true", help="TRUNCATE das tabelas antes de cada tamanho")
+    p.add_argument(
+        "--sink",
+        choices=["postgres", "null", "csv", "parquet"],
+        default="postgres",
+        help="Destino das linhas (null mede só parse/transformação)",
+    )
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("-v", "--verbose", action="store_true", help="Mostra a saída dos loaders")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    config = _load_config(Path(args.config))
+
+    sizes = args.sizes or config.get("sizes", [1000, 10000])
+    threshold = args.threshold if args.threshold is not None else config.get("threshold", 0.15)
+    baseline_path = PROJECT_ROOT / (args.baseline or config.get("baseline", "benchmarks/baseline.json"))
+    results_dir = PROJECT_ROOT / config.get("results_dir", "benchmarks/results")
+    datasets_dir = PROJECT_ROOT / config.get("datasets_dir", "build/bench")
+    selected = set(args.loaders or config.get("loaders") or [name for name, *_ in LOADERS])
+
+    results: List[Dict[str, Any]] = []
+    for size in sizes:
+        manifest = ensure_dataset(datasets_dir, size, args.seed)
+        if args.reset and args.sink == "postgres":
+            reset_tables()
+        for loader, module, func, entity in LOADERS:
+            if loader not in selected:
+                continue
+            if args.sink != "postgres" and module == "app.loader_municipio":
+                continue
+            pages = manifest.get(entity, {}).get("pages") or []
+            if not pages:
+                print(f"  {loader}@{size}: sem dados de entrada, ignorado")
+                continue
+            result = run_loader(loader, module, func, Path(pages[0]), size, args.sink, args.verbose)
+            results.append(result)
+            if result.get("error"):
+                print(f"  {loader}@{size}: ERRO {result['error']}")
+            else:
+                rss = result["peak_rss_mb"]
+                print(
+                    f"  {loader}@{size}: {result['rows']} rows em {result['seconds']:.2f}s "
+                    f"({result['rows_per_sec']:.1f} rows/s, "
+                    f"pico {'n/d' if rss is None else f'{rss:.0f} MiB'}, "
+                    f"{result['round_trips']} round trips)"
+                )
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "sink": args.sink,
+        "results": results,
+    }
+    results_dir.mkdir(parents=True, exist_ok=True)
+    out_path = results_dir / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Resultados salvos em {out_path}")
+
+    failed = [r for r in results if r.get("error")]
+    if failed:
+        print(f"{len(failed)} execução(ões) com erro; baseline não comparada.")
+        sys.exit(1)
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline atualizada em {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print("Sem baseline para comparar (use --save-baseline).")
+        return
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("sink", "postgres") != args.sink:
+        print(f"Baseline gravada com sink '{baseline.get('sink', 'postgres')}'; comparação ignorada.")
+        return
+    regressions = compare(results, baseline.get("results", []), threshold)
+    if regressions:
+        print("Regressões de throughput:")
+        for msg in regressions:
+            print(f"  - {msg}")
+        sys.exit(1)
+    print(f"Nenhuma regressão acima de {threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
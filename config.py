@@ -1,37 +1,30 @@
 """
 Configurações centralizadas do projeto.
+
+As configurações vêm de app.database.get_settings(): o .env é lido e as
+variáveis são validadas apenas no primeiro acesso, e não na importação.
 """
-import os
-from dataclasses import dataclass
-from dotenv import load_dotenv
+from app.database import Settings, get_settings
 
-load_dotenv()
+DatabaseConfig = Settings
 
-@dataclass(frozen=True)
-class DatabaseConfig:
-    host: str = os.getenv("PGHOST")
-    port: int = int(os.getenv("PGPORT"))
-    user: str = os.getenv("PGUSER")
-    password: str = os.getenv("PGPASSWORD")
-    dbname: str = os.getenv("PGDATABASE")
-    schema: str = os.getenv("PGSCHEMA")
+_ALIASES = {
+    "DB_HOST": "host",
+    "DB_PORT": "port",
+    "DB_USER": "user",
+    "DB_PASSWORD": "password",
+    "DB_NAME": "dbname",
+    "DB_SCHEMA": "schema",
+}
 
-    @property
-    def url(self) -> str:
-        return f"postgresql+psycopg://{self.user}:{self.password}@{self.host}:{self.port}/{self.dbname}"
-    
-    def conn_str(self, dbname: str = None) -> str:
-        db = dbname or self.dbname
-        return f"dbname={db} user={self.user} password={self.password} host={self.host} port={self.port}"
 
-DB_CONFIG = DatabaseConfig()
+def __getattr__(name: str):
+    if name == "DB_CONFIG":
+        return get_settings()
+    if name in _ALIASES:
+        return getattr(get_settings(), _ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-DB_HOST = DB_CONFIG.host
-DB_PORT = DB_CONFIG.port
-DB_USER = DB_CONFIG.user
-DB_PASSWORD = DB_CONFIG.password
-DB_NAME = DB_CONFIG.dbname
-DB_SCHEMA = DB_CONFIG.schema
 
 def _conn_str(dbname: str) -> str:
-    return DB_CONFIG.conn_str(dbname)
+    return get_settings().conn_str(dbname)
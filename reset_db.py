@@ -0,0 +1,236 @@
+"""
+reset_db.py — Reset rápido da database a partir de uma database template
+
+Substitui recreate_db.py, recreate_tables.py e fix_schema.py. Em vez de
+reaplicar DDL a cada reset, uma database template é montada uma vez a partir
+do schema canônico (sql/schema_auxiliar.sql, mais as tabelas de app.models
+que o arquivo não cria) e, opcionalmente, dos dados de referência. O reset
+da database alvo é então um CREATE DATABASE ... TEMPLATE, que copia os
+arquivos da template e leva de milissegundos a poucos segundos, seja qual
+for o tamanho do schema.
+
+A template é uma só por database configurada (TEMPLATE_DB, ou
+<PGDATABASE>_template), qualquer que seja o --target: databases de CI
+compartilham a mesma. Ela guarda no seu COMMENT o hash do arquivo SQL e das
+referências, e a lista das referências; um reset sem --reference reaproveita
+essa lista, e a template só é remontada quando o schema ou o conteúdo das
+referências muda (ou quando outras referências são pedidas).
+
+Uso:
+    # reset da database do .env (monta a template se preciso)
+    python reset_db.py
+
+    # template com municípios e bairros já carregados
+    python reset_db.py --reference data/bairros.json --rebuild-template
+
+    # outra database alvo (ex.: uma por job de CI), a partir da mesma template
+    python reset_db.py --target aux_ci_1234
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import psycopg
+from psycopg import sql
+
+from config import DB_CONFIG
+
+PROJECT_ROOT = Path(__file__).parent
+ADMIN_DB = os.getenv("ADMIN_DB", "postgres")
+SQL_SCHEMA_PATH = PROJECT_ROOT / os.getenv("SQL_SCHEMA_PATH", "sql/schema_auxiliar.sql")
+
+# Comando que carrega os municípios a partir de um export de bairros
+_MUNICIPIOS = (
+    "import sys; from app.loader_municipio import processar_cadastros_from_bairros as p; p(sys.argv[1])"
+)
+
+
+def template_name() -> str:
+    """Template da database configurada; não depende do --target."""
+    return os.getenv("TEMPLATE_DB") or f"{DB_CONFIG.dbname}_template"
+
+
+def _admin() -> psycopg.Connection:
+    return psycopg.connect(DB_CONFIG.conn_str(ADMIN_DB), autocommit=True)
+
+
+def _reference_name(path: Path) -> str:
+    """Caminho guardado no COMMENT: relativo ao projeto, quando dentro dele."""
+    path = path.resolve()
+    return str(path.relative_to(PROJECT_ROOT.resolve())) if path.is_relative_to(PROJECT_ROOT.resolve()) else str(path)
+
+
+def fingerprint(reference: Sequence[Path]) -> str:
+    """COMMENT da template: hash do schema canônico e das referências, mais a lista delas."""
+    digest = hashlib.sha256(SQL_SCHEMA_PATH.read_bytes())
+    for path in reference:
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    comment = f"schema sha256={digest.hexdigest()[:16]}"
+    if reference:
+        comment += f"; reference={json.dumps([_reference_name(p) for p in reference])}"
+    return comment
+
+
+def stored_reference(comment: str) -> List[Path]:
+    """Referências registradas no COMMENT de uma template (ver fingerprint)."""
+    _, sep, names = comment.partition("; reference=")
+    if not sep:
+        return []
+    return [PROJECT_ROOT / name for name in json.loads(names)]
+
+
+def template_fingerprint(conn: psycopg.Connection, template: str) -> Optional[str]:
+    """COMMENT da template, ou None se ela não existir."""
+    row = conn.execute(
+        "SELECT coalesce(shobj_description(oid, 'pg_database'), '') FROM pg_database WHERE datname = %s",
+        (template,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _resolve_reference(current: Optional[str], reference: Sequence[Path]) -> Tuple[Path, ...]:
+    """`reference`, ou, sem --reference, as referências com que a template foi montada."""
+    if reference or not current:
+        return tuple(reference)
+    stored = stored_reference(current)
+    missing = [str(p) for p in stored if not p.exists()]
+    if missing:
+        raise SystemExit(
+            f"Referências da template não encontradas: {', '.join(missing)}. "
+            "Informe --reference ou use --rebuild-template."
+        )
+    return tuple(stored)
+
+
+def _drop_database(conn: psycopg.Connection, name: str) -> None:
+    # Uma template não pode ser removida enquanto estiver marcada como tal
+    exists = conn.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,)).fetchone()
+    if exists:
+        conn.execute(sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE false").format(sql.Identifier(name)))
+        conn.execute(sql.SQL("DROP DATABASE {} WITH (FORCE)").format(sql.Identifier(name)))
+
+
+def _load_reference(template: str, reference: Sequence[Path]) -> None:
+    """Carrega os exports de referência na template, pelos loaders de sempre."""
+    from app import registry
+
+    env = dict(os.environ, PGDATABASE=template)
+    for path in registry.sort_exports(reference):
+        if registry.get_loader("bairro").export == Path(path).stem:
+            # bairro depende de municipio, que vem do próprio export de bairros
+            print(f"  🏙️  Municípios de {path}")
+            subprocess.run([sys.executable, "-c", _MUNICIPIOS, str(path)], env=env, cwd=PROJECT_ROOT, check=True)
+        print(f"  📄 {path}")
+        subprocess.run(
+            [sys.executable, "-m", "app.main", "--json", str(path), "--no-maintenance"],
+            env=env, cwd=PROJECT_ROOT, check=True,
+        )
+
+
+def build_template(template: str, reference: Sequence[Path] = ()) -> None:
+    """Monta a template do zero: DDL canônico, tabelas dos modelos, referências."""
+    from sqlalchemy import create_engine
+
+    from app.models import Base
+
+    start = time.time()
+    print(f"📦 Montando template '{template}' a partir de {SQL_SCHEMA_PATH.name}…")
+    with _admin() as conn:
+        _drop_database(conn, template)
+        conn.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(template)))
+
+    with psycopg.connect(DB_CONFIG.conn_str(template), autocommit=True) as conn:
+        conn.execute(SQL_SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    # Tabelas dos modelos que o arquivo SQL não cria (ex.: planta_valores)
+    engine = create_engine(dataclasses.replace(DB_CONFIG, dbname=template).url)
+    try:
+        Base.metadata.create_all(engine, checkfirst=True)
+    finally:
+        engine.dispose()
+
+    if reference:
+        print("📑 Carregando dados de referência…")
+        _load_reference(template, reference)
+
+    with _admin() as conn:
+        conn.execute(
+            sql.SQL("COMMENT ON DATABASE {} IS {}").format(
+                sql.Identifier(template), sql.Literal(fingerprint(reference))
+            )
+        )
+        # Sem conexões na template: o CREATE DATABASE ... TEMPLATE exige isso
+        conn.execute(
+            sql.SQL("ALTER DATABASE {} WITH IS_TEMPLATE true ALLOW_CONNECTIONS false").format(
+                sql.Identifier(template)
+            )
+        )
+    print(f"✅ Template '{template}' pronta em {time.time() - start:.2f}s.")
+
+
+def reset(target: str, reference: Sequence[Path] = (), rebuild_template: bool = False) -> None:
+    """
+    Recria `target` como cópia da template (montando-a antes, se preciso).
+    Sem `reference`, vale a lista guardada na template.
+    """
+    template = template_name()
+    if target in (template, ADMIN_DB):
+        raise SystemExit(f"Database alvo inválida: {target}")
+
+    with _admin() as conn:
+        current = template_fingerprint(conn, template)
+    reference = _resolve_reference(current, reference)
+    if rebuild_template or current is None or current != fingerprint(reference):
+        if current is not None and not rebuild_template:
+            print(f"♻️  Template '{template}' desatualizada ({current}).")
+        build_template(template, reference)
+
+    start = time.time()
+    with _admin() as conn:
+        _drop_database(conn, target)
+        conn.execute(
+            sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(sql.Identifier(target), sql.Identifier(template))
+        )
+    print(f"✅ Database '{target}' recriada a partir de '{template}' em {time.time() - start:.2f}s.")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Reset da database a partir de uma database template.")
+    p.add_argument("--target", default=None, help="Database a recriar (default: PGDATABASE)")
+    p.add_argument(
+        "--reference",
+        action="append",
+        default=[],
+        help="Export carregado na template (ex.: data/bairros.json, que também traz os "
+        "municípios). Pode ser repetido. Sem ele, valem as referências da template atual.",
+    )
+    p.add_argument("--rebuild-template", action="store_true", help="Remonta a template mesmo se estiver em dia")
+    p.add_argument("--template-only", action="store_true", help="Só monta a template, sem recriar a database alvo")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    target = args.target or DB_CONFIG.dbname
+    reference = [Path(r) for r in args.reference]
+    if args.template_only:
+        with _admin() as conn:
+            current = template_fingerprint(conn, template_name())
+        build_template(template_name(), _resolve_reference(current, reference))
+    else:
+        reset(target, reference, rebuild_template=args.rebuild_template)
+
+
+if __name__ == "__main__":
+    main()